@@ -6,9 +6,9 @@ import thiscovery_dev_tools.aws_deployer as ad
 import thiscovery_dev_tools.testing_tools as test_tools
 import thiscovery_lib.utilities as utils
 from http import HTTPStatus
+from thiscovery_dev_tools.template_pipeline import TemplatePipeline
 from pprint import pprint
 
-
 TEST_DATA_FOLDER = os.path.join(
     os.path.dirname(__file__), "../../thiscovery_dev_tools/test_data"
 )
@@ -37,3 +37,19 @@ class AwsDeployerTestCase(test_tools.BaseTestCase):
         )
         response = aws_deployer.log_deployment()
         self.assertEqual(HTTPStatus.OK, response["ResponseMetadata"]["HTTPStatusCode"])
+
+    def test_template_pipeline_ok(self):
+        with open(os.path.join(TEST_DATA_FOLDER, "raw_template_02.yaml")) as f:
+            template = f.read()
+        pipeline = TemplatePipeline(
+            template,
+            transforms=[
+                ("strip_provisioned_concurrency", ad.strip_provisioned_concurrency)
+            ],
+        )
+        pipeline.run()
+        self.assertNotIn("ProvisionedConcurrencyConfig", pipeline.to_yaml())
+        self.assertEqual(
+            ["parse", "strip_provisioned_concurrency", "serialise"],
+            list(pipeline.timings.keys()),
+        )
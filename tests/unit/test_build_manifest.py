@@ -0,0 +1,129 @@
+import os
+import tempfile
+
+try:
+    from local import dev_config  # sets env variable 'TEST_ON_AWS'
+    from local import secrets  # sets AWS profile as env variable
+except ImportError:
+    pass
+
+import thiscovery_dev_tools.build_manifest as bm
+import thiscovery_dev_tools.testing_tools as test_tools
+from thiscovery_dev_tools.template_pipeline import template_to_dict
+
+TEST_TEMPLATE = {
+    "Globals": {"Function": {"Runtime": "python3.9"}},
+    "Resources": {
+        "FunctionA": {
+            "Type": "AWS::Serverless::Function",
+            "Properties": {"CodeUri": "src_a", "Handler": "a.handler"},
+        },
+        "FunctionB": {
+            "Type": "AWS::Serverless::Function",
+            "Properties": {"CodeUri": "src_b", "Handler": "b.handler"},
+        },
+        "Api": {
+            "Type": "AWS::Serverless::Api",
+            "Properties": {"DefinitionUri": "api.yaml"},
+        },
+    },
+}
+
+
+class BuildManifestTestCase(test_tools.BaseTestCase):
+    def setUp(self):
+        self.base_dir = tempfile.TemporaryDirectory()
+        for folder in ["src_a", "src_b"]:
+            os.makedirs(os.path.join(self.base_dir.name, folder, "__pycache__"))
+            self.write_file(os.path.join(folder, "main.py"), "print('hello')")
+            self.write_file(os.path.join(folder, "requirements.txt"), "requests")
+        self.write_file("api.yaml", "openapi: 3.0.1")
+        self.build_dir = os.path.join(self.base_dir.name, ".aws-sam", "build")
+        for folder in ["FunctionA", "FunctionB", "RemovedFunction"]:
+            os.makedirs(os.path.join(self.build_dir, folder))
+        self.write_file(os.path.join(".aws-sam", "build", "template.yaml"), "")
+        self.manifest = bm.BuildManifest(
+            path=os.path.join(self.base_dir.name, "build_manifest.json"),
+            build_dir=self.build_dir,
+        )
+
+    def tearDown(self):
+        self.base_dir.cleanup()
+
+    def write_file(self, relative_path, content):
+        with open(os.path.join(self.base_dir.name, relative_path), "w") as f:
+            f.write(content)
+
+    def digests(self):
+        return bm.resource_digests(TEST_TEMPLATE, base_dir=self.base_dir.name)
+
+    def test_only_changed_functions_are_rebuilt(self):
+        settings = bm.build_settings(build_in_container=True)
+        self.assertIsNone(self.manifest.changed_resources(self.digests(), settings))
+        self.manifest.update(self.digests(), settings)
+        self.assertEqual([], self.manifest.changed_resources(self.digests(), settings))
+
+        self.write_file(os.path.join("src_a", "__pycache__", "main.pyc"), "ignored")
+        self.assertEqual([], self.manifest.changed_resources(self.digests(), settings))
+
+        self.write_file(os.path.join("src_b", "requirements.txt"), "requests\nboto3")
+        self.assertEqual(
+            ["FunctionB"], self.manifest.changed_resources(self.digests(), settings)
+        )
+
+    def test_changed_build_settings_require_full_build(self):
+        self.manifest.update(self.digests(), bm.build_settings(True))
+        self.assertIsNone(
+            self.manifest.changed_resources(self.digests(), bm.build_settings(False))
+        )
+
+    def test_without_local_layers(self):
+        template = {
+            "Globals": {"Function": {"Layers": [{"Ref": "LocalLayer"}]}},
+            "Resources": {
+                "LocalLayer": {
+                    "Type": "AWS::Serverless::LayerVersion",
+                    "Properties": {"ContentUri": "layer"},
+                    "Metadata": {"BuildMethod": "python3.9"},
+                },
+                "Function": {
+                    "Type": "AWS::Serverless::Function",
+                    "Properties": {
+                        "CodeUri": "src_a",
+                        "Layers": [
+                            {"Ref": "LocalLayer"},
+                            "arn:aws:lambda:eu-west-1:123456789012:layer:sentry:1",
+                        ],
+                    },
+                },
+            },
+        }
+        result = bm.without_local_layers(template)
+        self.assertNotIn("Layers", result["Globals"]["Function"])
+        self.assertEqual(
+            ["arn:aws:lambda:eu-west-1:123456789012:layer:sentry:1"],
+            result["Resources"]["Function"]["Properties"]["Layers"],
+        )
+        self.assertEqual(
+            2, len(template["Resources"]["Function"]["Properties"]["Layers"])
+        )
+
+    def test_write_build_template(self):
+        bm.remove_stale_artifacts(self.digests().keys(), build_dir=self.build_dir)
+        self.assertEqual(
+            ["FunctionA", "FunctionB", "template.yaml"],
+            sorted(os.listdir(self.build_dir)),
+        )
+        template_path = bm.write_build_template(
+            TEST_TEMPLATE,
+            built_resource_ids=self.digests().keys(),
+            build_dir=self.build_dir,
+            base_dir=self.base_dir.name,
+        )
+        with open(template_path) as f:
+            resources = template_to_dict(f.read())["Resources"]
+        self.assertEqual("FunctionA", resources["FunctionA"]["Properties"]["CodeUri"])
+        self.assertEqual(
+            os.path.join("..", "..", "api.yaml"),
+            resources["Api"]["Properties"]["DefinitionUri"],
+        )
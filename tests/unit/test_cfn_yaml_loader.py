@@ -0,0 +1,99 @@
+import os
+import tempfile
+import time
+
+try:
+    from local import dev_config  # sets env variable 'TEST_ON_AWS'
+    from local import secrets  # sets AWS profile as env variable
+except ImportError:
+    pass
+
+import thiscovery_dev_tools.testing_tools as test_tools
+
+TEST_DATA_FOLDER = os.path.join(
+    os.path.dirname(__file__), "../../thiscovery_dev_tools/test_data"
+)
+
+TEMPLATE = """
+Conditions:
+  IsProd: !Equals [!Ref Environment, prod]
+  IsNotProd: !Not [!Condition IsProd]
+  IsEither: !Or [!Condition IsProd, !Condition IsNotProd]
+  IsBoth: !And [!Condition IsProd, !Condition IsNotProd]
+Resources:
+  MyFunction:
+    Type: AWS::Serverless::Function
+    Properties:
+      Role: !ImportValue shared-role-arn
+      Handler: !FindInMap [Handlers, !Ref Environment, main]
+      Layers: !Split [",", !Sub "${LayerArns}"]
+      UserData: !Base64 hello
+      AvailabilityZone: !Select [0, !GetAZs ""]
+      Subnets: !Cidr [10.0.0.0/16, 4, 8]
+      Arn: !GetAtt MyTable.Arn
+      Name: !If [IsProd, !Join ["-", [a, b]], c]
+      Definition: !Transform {Name: AWS::Include, Parameters: {Location: s3://x}}
+"""
+
+
+class CloudFormationLoaderTestCase(test_tools.BaseTestCase):
+    def setUp(self):
+        test_tools.clear_template_cache()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.template_path = os.path.join(self.tmp.name, "template.yaml")
+        with open(self.template_path, "w") as f:
+            f.write(TEMPLATE)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_all_intrinsic_tags(self):
+        t_dict = test_tools.load_template(self.template_path)
+        properties = t_dict["Resources"]["MyFunction"]["Properties"]
+        self.assertEqual(test_tools.ImportValue("shared-role-arn"), properties["Role"])
+        self.assertEqual(
+            test_tools.FindInMap(["Handlers", test_tools.Ref("Environment"), "main"]),
+            properties["Handler"],
+        )
+        self.assertEqual(
+            test_tools.Split([",", test_tools.Sub("${LayerArns}")]),
+            properties["Layers"],
+        )
+        self.assertEqual(
+            test_tools.Select([0, test_tools.GetAZs("")]),
+            properties["AvailabilityZone"],
+        )
+        self.assertEqual(
+            test_tools.Transform(
+                {"Name": "AWS::Include", "Parameters": {"Location": "s3://x"}}
+            ),
+            properties["Definition"],
+        )
+        self.assertEqual(
+            test_tools.And(
+                [test_tools.Condition("IsProd"), test_tools.Condition("IsNotProd")]
+            ),
+            t_dict["Conditions"]["IsBoth"],
+        )
+
+    def test_test_data_templates_load(self):
+        for name in ["raw_template_01.yaml", "raw_template_02.yaml"]:
+            t_dict = test_tools.load_template(os.path.join(TEST_DATA_FOLDER, name))
+            self.assertIn("Resources", t_dict)
+
+    def test_parsed_templates_are_cached_and_copied(self):
+        first = test_tools.load_template(self.template_path)
+        first["Resources"].clear()
+        second = test_tools.load_template(self.template_path)
+        self.assertIn("MyFunction", second["Resources"])
+        self.assertEqual(1, len(test_tools._parsed_templates))
+
+    def test_cache_invalidated_when_file_changes(self):
+        test_tools.load_template(self.template_path)
+        with open(self.template_path, "w") as f:
+            f.write("Resources: {}\n")
+        stat = os.stat(self.template_path)
+        os.utime(self.template_path, ns=(stat.st_atime_ns, time.time_ns() + 10**9))
+        self.assertEqual(
+            {"Resources": {}}, test_tools.load_template(self.template_path)
+        )
@@ -0,0 +1,81 @@
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
+
+try:
+    from local import dev_config  # sets env variable 'TEST_ON_AWS'
+    from local import secrets  # sets AWS profile as env variable
+except ImportError:
+    pass
+
+import thiscovery_lib.utilities as utils
+
+import thiscovery_dev_tools.testing_tools as test_tools
+from thiscovery_dev_tools.client_registry import ClientRegistry
+
+
+class FakeWrapper:
+    instances = 0
+
+    def __init__(self, stack_name=None):
+        FakeWrapper.instances += 1
+        self.stack_name = stack_name
+
+
+class ClientRegistryTestCase(test_tools.BaseTestCase):
+    def setUp(self):
+        self.registry = ClientRegistry()
+        FakeWrapper.instances = 0
+        self.created = list()
+
+        def fake_base_client(service_name, profile_name=None):
+            self.created.append((service_name, profile_name))
+            return SimpleNamespace(client=object())
+
+        patcher = patch.object(utils, "BaseClient", fake_base_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_clients_are_shared_by_key(self):
+        ddb = self.registry.get_client("dynamodb")
+        self.assertIs(ddb, self.registry.get_client("dynamodb"))
+        self.assertIsNot(ddb, self.registry.get_client("dynamodb", "other-profile"))
+        self.assertIsNot(ddb, self.registry.get_client("lambda"))
+        self.assertEqual(
+            [("dynamodb", None), ("dynamodb", "other-profile"), ("lambda", None)],
+            self.created,
+        )
+        self.assertEqual({"hits": 1, "misses": 3, "clients": 3}, self.registry.stats())
+
+    def test_instances_are_keyed_by_arguments(self):
+        core = self.registry.get_instance(FakeWrapper, stack_name="thiscovery-core")
+        self.assertIs(
+            core, self.registry.get_instance(FakeWrapper, stack_name="thiscovery-core")
+        )
+        crm = self.registry.get_instance(FakeWrapper, stack_name="thiscovery-crm")
+        self.assertEqual("thiscovery-crm", crm.stack_name)
+        self.assertEqual(2, FakeWrapper.instances)
+
+    def test_reset(self):
+        self.registry.get_instance(FakeWrapper)
+        self.registry.reset()
+        self.assertEqual({"hits": 0, "misses": 0, "clients": 0}, self.registry.stats())
+        self.registry.get_instance(FakeWrapper)
+        self.assertEqual(2, FakeWrapper.instances)
+
+    def test_concurrent_access_creates_one_client(self):
+        barrier = threading.Barrier(8)
+        results = list()
+
+        def get():
+            barrier.wait()
+            results.append(self.registry.get_instance(FakeWrapper))
+
+        threads = [threading.Thread(target=get) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(1, FakeWrapper.instances)
+        self.assertEqual(1, len({id(x) for x in results}))
+        self.assertEqual({"hits": 7, "misses": 1, "clients": 1}, self.registry.stats())
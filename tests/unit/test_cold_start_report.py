@@ -0,0 +1,151 @@
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+try:
+    from local import dev_config  # sets env variable 'TEST_ON_AWS'
+    from local import secrets  # sets AWS profile as env variable
+except ImportError:
+    pass
+
+import thiscovery_dev_tools.cold_start_report as csr
+import thiscovery_dev_tools.testing_tools as test_tools
+
+SENTRY_LAYER_ARN = (
+    "arn:aws:lambda:eu-west-1:943013980633:layer:SentryPythonServerlessSDK:119"
+)
+
+TEST_TEMPLATE = {
+    "Globals": {"Function": {"Runtime": "python3.12", "Layers": [SENTRY_LAYER_ARN]}},
+    "Resources": {
+        "SmallFunction": {
+            "Type": "AWS::Serverless::Function",
+            "Properties": {"CodeUri": "src_small", "Handler": "a.handler"},
+        },
+        "LargeFunction": {
+            "Type": "AWS::Serverless::Function",
+            "Properties": {
+                "CodeUri": "src_large",
+                "Handler": "b.handler",
+                "Layers": [{"Ref": "LocalLayer"}],
+            },
+        },
+        "LocalLayer": {
+            "Type": "AWS::Serverless::LayerVersion",
+            "Properties": {"ContentUri": "layer"},
+        },
+    },
+}
+
+
+class FakeLambdaClient:
+    def __init__(self):
+        self.calls = 0
+
+    def get_layer_version_by_arn(self, Arn):
+        self.calls += 1
+        return {"Content": {"CodeSize": 2 * csr.MB}}
+
+
+class ColdStartReportTestCase(test_tools.BaseTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.build_dir = os.path.join(self.tmp.name, "build")
+        self.write_file("SmallFunction/app.py", b"print('hello')\n" * 100)
+        self.write_file("LargeFunction/app.py", os.urandom(3 * csr.MB))
+        self.write_file("LocalLayer/python/lib.py", os.urandom(csr.MB))
+        self.lambda_client = FakeLambdaClient()
+        self.layer_sizes = csr.LayerSizeCache(
+            path=os.path.join(self.tmp.name, "layer_sizes.json"),
+            lambda_client=self.lambda_client,
+        )
+        self.zipped_sizes = csr.ZippedSizeCache(
+            path=os.path.join(self.tmp.name, "zipped_sizes.json")
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_file(self, relative_path, content: bytes):
+        path = os.path.join(self.build_dir, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+
+    def report(self, budget_mb=csr.DEFAULT_BUDGET_MB):
+        return csr.ColdStartReport(
+            TEST_TEMPLATE,
+            build_dir=self.build_dir,
+            budget_mb=budget_mb,
+            layer_sizes=self.layer_sizes,
+            zipped_sizes=self.zipped_sizes,
+        )
+
+    def test_sizes_and_layers(self):
+        rows = {x["function"]: x for x in self.report(50).rows()}
+        self.assertEqual({"SmallFunction", "LargeFunction"}, set(rows))
+        small = rows["SmallFunction"]
+        self.assertEqual("python3.12", small["runtime"])
+        self.assertEqual(1500, small["unzipped_size"])
+        self.assertLess(small["zipped_size"], small["unzipped_size"])
+        self.assertEqual(
+            [
+                {
+                    "name": "SentryPythonServerlessSDK:119",
+                    "arn": SENTRY_LAYER_ARN,
+                    "zipped_size": 2 * csr.MB,
+                }
+            ],
+            small["layers"],
+        )
+        large = rows["LargeFunction"]
+        self.assertEqual(
+            ["SentryPythonServerlessSDK:119", "LocalLayer"],
+            [x["name"] for x in large["layers"]],
+        )
+        self.assertGreater(large["total_zipped_size"], 6 * csr.MB)
+        self.assertFalse(large["over_budget"])
+
+    def test_layer_sizes_are_cached(self):
+        self.report(50).rows()
+        self.assertEqual(1, self.lambda_client.calls)
+        layer_sizes = csr.LayerSizeCache(
+            path=self.layer_sizes.path, lambda_client=self.lambda_client
+        )
+        self.assertEqual(2 * csr.MB, layer_sizes.get(SENTRY_LAYER_ARN))
+        self.assertEqual(1, self.lambda_client.calls)
+
+    def test_budget_exceeded(self):
+        report = self.report(5)
+        self.assertEqual(
+            ["LargeFunction"], [x["function"] for x in report.over_budget()]
+        )
+        with self.assertRaises(csr.SizeBudgetExceededError):
+            report.check_budget()
+        self.assertIn("LargeFunction [OVER BUDGET]", report.table().get_string())
+
+    def test_no_budget_by_default(self):
+        report = self.report()
+        self.assertEqual([], report.over_budget())
+        self.assertIsNone(report.rows()[0]["budget_mb"])
+
+    def test_zipped_sizes_of_unchanged_artifacts_are_cached(self):
+        with patch.object(csr, "zipped_size", wraps=csr.zipped_size) as mock_zip:
+            sizes = {x["function"]: x["zipped_size"] for x in self.report().rows()}
+            self.assertEqual(3, mock_zip.call_count)  # 2 functions and 1 layer
+            self.zipped_sizes = csr.ZippedSizeCache(path=self.zipped_sizes.path)
+            self.assertEqual(
+                sizes,
+                {x["function"]: x["zipped_size"] for x in self.report().rows()},
+            )
+            self.assertEqual(3, mock_zip.call_count)
+            self.write_file("SmallFunction/app.py", b"print('changed')\n")
+            self.report().rows()
+            self.assertEqual(4, mock_zip.call_count)
+
+    def test_write_report(self):
+        path = self.report(50).write(os.path.join(self.tmp.name, "report.json"))
+        with open(path) as f:
+            report = json.load(f)
+        self.assertEqual(2, len(report["functions"]))
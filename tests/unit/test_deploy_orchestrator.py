@@ -0,0 +1,130 @@
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+try:
+    from local import dev_config  # sets env variable 'TEST_ON_AWS'
+    from local import secrets  # sets AWS profile as env variable
+except ImportError:
+    pass
+
+import thiscovery_dev_tools.aws_deployer as ad
+import thiscovery_dev_tools.deploy_orchestrator as do
+import thiscovery_dev_tools.testing_tools as test_tools
+from thiscovery_dev_tools.deploy_orchestrator import (
+    MultiStackDeployer,
+    StackSpec,
+    parse_stack_spec,
+)
+
+
+class DeployOrchestratorTestCase(test_tools.BaseTestCase):
+    stacks = [
+        parse_stack_spec("thiscovery-core=../thiscovery-core"),
+        parse_stack_spec("thiscovery-crm:thiscovery-core"),
+        parse_stack_spec("thiscovery-interviews:thiscovery-core"),
+        parse_stack_spec("thiscovery-devops"),
+    ]
+
+    def test_parse_stack_spec(self):
+        self.assertEqual(
+            StackSpec(
+                name="thiscovery-crm",
+                path="../crm",
+                depends_on=["thiscovery-core", "thiscovery-events"],
+            ),
+            parse_stack_spec("thiscovery-crm=../crm:thiscovery-core,thiscovery-events"),
+        )
+        self.assertEqual(
+            StackSpec(name="thiscovery-core", path="thiscovery-core", depends_on=[]),
+            parse_stack_spec("thiscovery-core"),
+        )
+
+    @patch("thiscovery_dev_tools.deploy_orchestrator.MultiStackDeployer.deploy_stack")
+    def test_dependencies_are_deployed_first(self, mocked_deploy_stack):
+        deployed = list()
+
+        def deploy_stack(stack):
+            time.sleep(0.05)
+            deployed.append(stack.name)
+
+        mocked_deploy_stack.side_effect = deploy_stack
+        deployer = MultiStackDeployer(self.stacks, max_concurrency=4)
+        self.assertTrue(deployer.main())
+        self.assertEqual(4, len(deployed))
+        self.assertLess(
+            deployed.index("thiscovery-core"), deployed.index("thiscovery-crm")
+        )
+        self.assertLess(
+            deployed.index("thiscovery-core"),
+            deployed.index("thiscovery-interviews"),
+        )
+
+    @patch("thiscovery_dev_tools.deploy_orchestrator.MultiStackDeployer.deploy_stack")
+    def test_failure_stops_dependent_stacks(self, mocked_deploy_stack):
+        def deploy_stack(stack):
+            if stack.name == "thiscovery-core":
+                raise subprocess.CalledProcessError(1, "thiscovery deploy")
+
+        mocked_deploy_stack.side_effect = deploy_stack
+        deployer = MultiStackDeployer(self.stacks, max_concurrency=1)
+        self.assertFalse(deployer.main())
+        self.assertEqual(
+            {
+                "thiscovery-core": "failed",
+                "thiscovery-crm": "not started",
+                "thiscovery-interviews": "not started",
+                "thiscovery-devops": "not started",
+            },
+            deployer.scheduler.statuses,
+        )
+
+    def test_stacks_are_deployed_non_interactively(self):
+        with patch.object(do, "run_with_prefixed_output") as mock_run:
+            MultiStackDeployer.deploy_stack(self.stacks[0])
+        kwargs = mock_run.call_args.kwargs
+        self.assertEqual("thiscovery-core", kwargs["prefix"])
+        self.assertEqual("../thiscovery-core", kwargs["cwd"])
+        self.assertEqual("true", kwargs["env"][ad.NON_INTERACTIVE_ENV_VAR])
+
+    def test_out_of_sync_branch_aborts_non_interactive_deployment(self):
+        repository = SimpleNamespace(out_of_sync=True, branch="master")
+        with patch.object(
+            ad.git_metadata, "get_repository_metadata", return_value=repository
+        ), patch.object(ad.utils, "running_unit_tests", return_value=False), patch(
+            "builtins.input"
+        ) as mock_input, patch.dict(
+            os.environ, {ad.NON_INTERACTIVE_ENV_VAR: "true"}
+        ):
+            with self.assertRaises(SystemExit) as context:
+                ad.AwsDeployer.get_git_branch()
+        mock_input.assert_not_called()
+        self.assertIn("out of sync", str(context.exception.code))
+
+
+class RunWithPrefixedOutputTestCase(test_tools.BaseTestCase):
+    def test_output_lines_are_prefixed(self):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            do.run_with_prefixed_output(
+                [sys.executable, "-c", "print('one')\nprint('two')"],
+                prefix="thiscovery-core",
+            )
+        self.assertEqual(
+            "[thiscovery-core] one\n[thiscovery-core] two\n", stdout.getvalue()
+        )
+
+    def test_failure_raises_error(self):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            with self.assertRaises(subprocess.CalledProcessError):
+                do.run_with_prefixed_output(
+                    [sys.executable, "-c", "import sys; sys.exit('failed')"],
+                    prefix="thiscovery-crm",
+                )
+        self.assertEqual("[thiscovery-crm] failed\n", stdout.getvalue())
@@ -0,0 +1,50 @@
+import json
+import os
+import tempfile
+import time
+
+try:
+    from local import dev_config  # sets env variable 'TEST_ON_AWS'
+    from local import secrets  # sets AWS profile as env variable
+except ImportError:
+    pass
+
+import thiscovery_dev_tools.testing_tools as test_tools
+from thiscovery_dev_tools.deployment_timings import DeploymentTimings, timed_phase
+
+
+class Deployer:
+    def __init__(self):
+        self.timings = DeploymentTimings()
+
+    @timed_phase("build")
+    def build(self, fail=False):
+        with self.timings.subprocess("sam build all resources"):
+            time.sleep(0.05)
+            if fail:
+                raise RuntimeError("sam build failed")
+
+
+class DeploymentTimingsTestCase(test_tools.BaseTestCase):
+    def test_phases_and_subprocesses_are_timed(self):
+        deployer = Deployer()
+        deployer.build()
+        with self.assertRaises(RuntimeError):
+            deployer.build(fail=True)
+        summary = deployer.timings.summary()
+        self.assertGreaterEqual(summary["phases"]["build"], 0.1)
+        self.assertEqual(
+            [True, False], [x["succeeded"] for x in summary["subprocesses"]]
+        )
+
+    def test_write_report(self):
+        timings = DeploymentTimings()
+        timings.record_detail("template_pipeline", {"parse": 0.12345})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            report_path = timings.write_report(
+                path=os.path.join(tmp_dir, "report.json"), extra={"stack": "unittest"}
+            )
+            with open(report_path) as f:
+                report = json.load(f)
+        self.assertEqual("unittest", report["stack"])
+        self.assertEqual({"parse": 0.123}, report["details"]["template_pipeline"])
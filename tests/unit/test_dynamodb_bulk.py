@@ -0,0 +1,327 @@
+try:
+    from local import dev_config  # sets env variable 'TEST_ON_AWS'
+    from local import secrets  # sets AWS profile as env variable
+except ImportError:
+    pass
+
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+import thiscovery_lib.utilities as utils
+
+import thiscovery_dev_tools.dynamodb_bulk as bulk
+import thiscovery_dev_tools.testing_tools as test_tools
+from thiscovery_dev_tools.dynamodb_stub import InMemoryDynamodbClient
+from thiscovery_dev_tools.item_transforms import filter_items
+
+TABLE = "thiscovery-crm-test-notifications"
+SORT_KEY_TABLE = "thiscovery-core-test-lookups"
+
+
+def populate(client, table_name, n, **attributes):
+    key_names = client.key_schemas[table_name]
+    for i in range(n):
+        item = {k: f"{k}-{i:04}" for k in key_names}
+        client.put_item(
+            TableName=table_name, Item=bulk.serialize_item({**item, **attributes})
+        )
+
+
+class NotificationsStandIn(test_tools.BaseDdbMixin):
+    env_name = "test"
+    client = None
+
+    @classmethod
+    def _get_notifications_ddb_low_level_client(cls):
+        return cls.client
+
+
+class ResetTableTestCase(test_tools.BaseTestCase):
+    def setUp(self):
+        self.client = InMemoryDynamodbClient(
+            {TABLE: ["id"], SORT_KEY_TABLE: ["key", "sort"]}, page_size=10
+        )
+
+    def test_scan_keys_projects_key_attributes_of_all_segments(self):
+        populate(self.client, SORT_KEY_TABLE, 57, details="x" * 100)
+        keys = bulk.scan_keys(self.client, SORT_KEY_TABLE, total_segments=4)
+        self.assertEqual(57, len(keys))
+        self.assertEqual({"key", "sort"}, set(keys[0]))
+        self.assertEqual(57, len({json.dumps(k, sort_keys=True) for k in keys}))
+
+    def test_reset_table_empties_table_in_batches(self):
+        populate(self.client, TABLE, 120)
+        result = bulk.reset_table(self.client, TABLE)
+        self.assertEqual({"deleted": 120, "restored": 0}, result)
+        self.assertEqual([], self.client.items(TABLE))
+        self.assertEqual(5, self.client.calls["batch_write_item"])  # ceil(120 / 25)
+
+    def test_reset_table_retries_unprocessed_items(self):
+        populate(self.client, TABLE, 30)
+        self.client.unprocessed_rate = 0.5
+        result = bulk.reset_table(self.client, TABLE)
+        self.assertEqual(30, result["deleted"])
+        self.assertEqual([], self.client.items(TABLE))
+        self.assertGreater(self.client.calls["batch_write_item"], 2)
+
+    def test_batch_write_raises_error_if_items_are_never_processed(self):
+        populate(self.client, TABLE, 3)
+        self.client.unprocessed_rate = 1
+        with patch.object(bulk, "BACKOFF_BASE_SECONDS", 0):
+            with self.assertRaises(bulk.BatchWriteError) as context:
+                bulk.reset_table(self.client, TABLE)
+        self.assertEqual(3, len(context.exception.details["unprocessed"]))
+
+    def test_reset_table_restores_baseline(self):
+        populate(self.client, TABLE, 40, status="processed")
+        baseline = [
+            {"id": "id-0001", "status": "new", "score": 1.5},
+            {"id": "baseline-01", "status": "new"},
+        ]
+        result = bulk.reset_table(self.client, TABLE, baseline=baseline)
+        self.assertEqual({"deleted": 39, "restored": 2}, result)
+        items = sorted(self.client.items(TABLE), key=lambda x: x["id"]["S"])
+        self.assertEqual(
+            [
+                {"id": {"S": "baseline-01"}, "status": {"S": "new"}},
+                {"id": {"S": "id-0001"}, "status": {"S": "new"}, "score": {"N": "1.5"}},
+            ],
+            items,
+        )
+
+    def test_load_baseline(self):
+        baseline = [{"id": "baseline-01", "count": 2}]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "baseline.json")
+            with open(path, "w") as f:
+                json.dump(baseline, f)
+            self.assertEqual(baseline, bulk.load_baseline(path))
+
+    def test_clear_notifications_table_uses_bulk_reset(self):
+        NotificationsStandIn.client = self.client
+        populate(self.client, TABLE, 12)
+        result = NotificationsStandIn.clear_notifications_table(
+            baseline=[{"id": "baseline-01"}]
+        )
+        self.assertEqual({"deleted": 12, "restored": 1}, result)
+        self.assertEqual([{"id": {"S": "baseline-01"}}], self.client.items(TABLE))
+
+
+class ParallelScanTestCase(test_tools.BaseTestCase):
+    def setUp(self):
+        self.client = InMemoryDynamodbClient(
+            {TABLE: ["id"], "target": ["id"]}, page_size=7
+        )
+        populate(self.client, TABLE, 100, details="notification")
+
+    def test_parallel_scan_streams_pages_of_all_segments(self):
+        pages = list(bulk.parallel_scan(self.client, TABLE, total_segments=5))
+        self.assertEqual({0, 1, 2, 3, 4}, {segment for segment, _ in pages})
+        self.assertEqual(100, sum(len(page["Items"]) for _, page in pages))
+
+    def test_parallel_scan_stops_workers_when_closed_early(self):
+        pages = bulk.parallel_scan(self.client, TABLE, total_segments=4)
+        next(pages)
+        pages.close()
+        self.assertLess(self.client.calls["scan"], 100 // 7 + 4)
+
+    def test_parallel_scan_raises_segment_errors(self):
+        def scan(**kwargs):
+            raise RuntimeError("ProvisionedThroughputExceededException")
+
+        self.client.scan = scan
+        with self.assertRaises(RuntimeError):
+            list(bulk.parallel_scan(self.client, TABLE, total_segments=3))
+
+    def test_copy_table(self):
+        result = bulk.copy_table(self.client, self.client, TABLE, "target", workers=3)
+        self.assertEqual(100, result["items_copied"])
+        self.assertEqual(100, result["items_scanned"])
+        self.assertEqual(3, len(result["segments"]))
+        self.assertEqual(100, result["writer"]["items_written"])
+        self.assertEqual(4, result["writer"]["batches"])
+        self.assertEqual(100, self.client.calls["put_item"])  # only by populate
+        self.assertCountEqual(self.client.items(TABLE), self.client.items("target"))
+
+
+class BatchWriterTestCase(test_tools.BaseTestCase):
+    def setUp(self):
+        self.client = InMemoryDynamodbClient({TABLE: ["id"]})
+        self.items = [bulk.serialize_item({"id": f"id-{i:03}"}) for i in range(60)]
+
+    def test_items_are_written_in_batches_of_25(self):
+        with bulk.BatchWriter(self.client, TABLE) as writer:
+            for item in self.items:
+                writer.put(item)
+            self.assertEqual(50, len(self.client.items(TABLE)))
+        self.assertEqual(60, len(self.client.items(TABLE)))
+        metrics = writer.metrics()
+        self.assertEqual(60, metrics["items_written"])
+        self.assertEqual(3, metrics["batches"])
+        self.assertEqual(0, metrics["retries"])
+        self.assertGreater(metrics["items_per_second"], 0)
+
+    def test_unprocessed_items_are_retried_with_jittered_backoff(self):
+        self.client.unprocessed_rate = 0.5
+        with patch.object(bulk.time, "sleep") as mock_sleep:
+            with bulk.BatchWriter(
+                self.client, TABLE, backoff_base=0.1, backoff_max=0.3
+            ) as writer:
+                for item in self.items:
+                    writer.put(item)
+        self.assertEqual(60, len(self.client.items(TABLE)))
+        self.assertEqual(60, writer.items_written)
+        self.assertEqual(writer.retries, mock_sleep.call_count)
+        self.assertGreater(writer.retries, 3)
+        delays = [c.args[0] for c in mock_sleep.call_args_list]
+        self.assertTrue(all(0 <= d <= 0.3 for d in delays))
+        self.assertAlmostEqual(sum(delays), writer.backoff_seconds)
+
+    def test_duplicate_keys_are_written_in_separate_batches(self):
+        first = bulk.serialize_item({"id": "id-000", "version": 1})
+        second = bulk.serialize_item({"id": "id-000", "version": 2})
+        with self.assertRaises(ValueError):
+            with bulk.BatchWriter(self.client, TABLE) as writer:
+                writer.put(first)
+                writer.put(second)
+        with bulk.BatchWriter(self.client, TABLE, key_names=["id"]) as writer:
+            for item in [first, *self.items[1:10], second, *self.items[10:]]:
+                writer.put(item)
+        self.assertEqual(60, len(self.client.items(TABLE)))
+        self.assertIn(second, self.client.items(TABLE))
+        self.assertEqual(61, writer.items_written)
+        self.assertEqual(4, writer.batches)  # 10, 25, 25, 1
+
+    def test_error_raised_after_max_attempts(self):
+        self.client.unprocessed_rate = 1
+        writer = bulk.BatchWriter(self.client, TABLE, max_attempts=3, backoff_base=0)
+        writer.delete({"id": {"S": "id-000"}})
+        with self.assertRaises(bulk.BatchWriteError) as context:
+            writer.flush()
+        self.assertEqual(3, context.exception.details["attempts"])
+        self.assertEqual(2, writer.retries)
+
+
+class FailingDynamodbClient(InMemoryDynamodbClient):
+    """
+    Stand-in that fails after a number of batch_write_item calls
+    """
+
+    def __init__(self, *args, fail_after, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fail_after = fail_after
+
+    def batch_write_item(self, RequestItems, **kwargs):
+        if self.calls.get("batch_write_item", 0) >= self.fail_after:
+            raise ConnectionError("Connection reset by peer")
+        return super().batch_write_item(RequestItems, **kwargs)
+
+
+class CopyCheckpointTestCase(test_tools.BaseTestCase):
+    def setUp(self):
+        self.source = InMemoryDynamodbClient({TABLE: ["id"]}, page_size=5)
+        populate(self.source, TABLE, 200)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "checkpoint.json")
+
+    def checkpoint(self, load=False, workers=4):
+        args = (self.path, TABLE, "target", workers)
+        if load:
+            return bulk.CopyCheckpoint.load(*args, save_interval=0)
+        return bulk.CopyCheckpoint(*args, save_interval=0)
+
+    def test_completed_copy_is_recorded(self):
+        target = InMemoryDynamodbClient({"target": ["id"]})
+        bulk.copy_table(
+            self.source, target, TABLE, "target", checkpoint=self.checkpoint()
+        )
+        checkpoint = self.checkpoint(load=True)
+        self.assertEqual(200, checkpoint.items_copied)
+        self.assertEqual([], checkpoint.pending_segments())
+
+    def test_items_dropped_by_transforms_are_not_counted_as_copied(self):
+        target = InMemoryDynamodbClient({"target": ["id"]})
+        result = bulk.copy_table(
+            self.source,
+            target,
+            TABLE,
+            "target",
+            checkpoint=self.checkpoint(),
+            transforms=[filter_items(lambda x: int(x["id"][-1]) % 2 == 0)],
+        )
+        self.assertEqual(100, result["items_copied"])
+        self.assertEqual(200, result["items_scanned"])
+        checkpoint = self.checkpoint(load=True)
+        self.assertEqual(100, checkpoint.items_copied)
+        self.assertEqual(200, checkpoint.items_scanned)
+        self.assertEqual(100, len(target.items("target")))
+
+    def test_interrupted_copy_resumes_from_checkpoint(self):
+        target = FailingDynamodbClient({"target": ["id"]}, fail_after=3)
+        with self.assertRaises(ConnectionError):
+            bulk.copy_table(
+                self.source, target, TABLE, "target", checkpoint=self.checkpoint()
+            )
+        interrupted = self.checkpoint(load=True)
+        self.assertGreater(interrupted.items_copied, 0)
+        self.assertLessEqual(interrupted.items_copied, 3 * bulk.BATCH_WRITE_MAX_ITEMS)
+        # every item recorded in the checkpoint was written
+        self.assertLessEqual(interrupted.items_copied, len(target.items("target")))
+
+        target.fail_after = float("inf")
+        result = bulk.copy_table(
+            self.source,
+            target,
+            TABLE,
+            "target",
+            checkpoint=self.checkpoint(load=True),
+        )
+        self.assertEqual(200 - interrupted.items_copied, result["items_copied"])
+        self.assertEqual(200, len(target.items("target")))
+        self.assertEqual(200, self.checkpoint(load=True).items_copied)
+
+    def test_completed_segments_are_not_scanned_again(self):
+        target = InMemoryDynamodbClient({"target": ["id"]})
+        checkpoint = self.checkpoint()
+        checkpoint.segment(0)["done"] = True
+        checkpoint.segment(1)["done"] = True
+        result = bulk.copy_table(
+            self.source, target, TABLE, "target", checkpoint=checkpoint
+        )
+        self.assertEqual({2, 3}, set(result["segments"]))
+        self.assertEqual([], checkpoint.pending_segments())
+
+    def test_binary_keys_are_saved(self):
+        source = InMemoryDynamodbClient({"binary": ["id"]}, page_size=5)
+        for i in range(20):
+            source.put_item(TableName="binary", Item={"id": {"B": bytes([i, 255])}})
+        target = InMemoryDynamodbClient({"target": ["id"]})
+        checkpoint = bulk.CopyCheckpoint(
+            self.path, "binary", "target", total_segments=2, save_interval=0
+        )
+        key = {"id": {"B": b"\x00\xff"}, "tags": {"BS": [b"\x01", b"\x02"]}}
+        checkpoint.record_page(0, {"Items": [], "LastEvaluatedKey": key}, 0)
+        checkpoint.commit()
+        with open(self.path) as f:
+            saved = json.load(f)
+        self.assertEqual(
+            {"id": {"B": "AP8="}, "tags": {"BS": ["AQ==", "Ag=="]}},
+            saved["segments"]["0"]["last_evaluated_key"],
+        )
+        loaded = bulk.CopyCheckpoint.load(self.path, "binary", "target", 2)
+        self.assertEqual({0: key, 1: None}, loaded.start_keys())
+
+        checkpoint = bulk.CopyCheckpoint(
+            self.path, "binary", "target", total_segments=2, save_interval=0
+        )
+        bulk.copy_table(source, target, "binary", "target", 2, checkpoint=checkpoint)
+        self.assertEqual(20, len(target.items("target")))
+        self.assertEqual(20, checkpoint.items_copied)
+
+    def test_checkpoint_of_different_migration_is_rejected(self):
+        self.checkpoint().save()
+        with self.assertRaises(utils.DetailedValueError):
+            self.checkpoint(load=True, workers=8)
@@ -0,0 +1,138 @@
+import json
+import os
+import threading
+from http import HTTPStatus
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+try:
+    from local import dev_config  # sets env variable 'TEST_ON_AWS'
+    from local import secrets  # sets AWS profile as env variable
+except ImportError:
+    pass
+
+import thiscovery_lib.utilities as utils
+
+import thiscovery_dev_tools.client_registry as client_registry
+import thiscovery_dev_tools.testing_tools as test_tools
+
+
+def eb_request(n, lambda_name="PersistEvent"):
+    return test_tools.EbTestRequest(
+        local_method=lambda event, context: {"n": event["detail"]["n"]},
+        aws_eb_event={"detail-type": "test_event", "detail": {"n": n}},
+        lambda_name=lambda_name,
+        stack_name="thiscovery-events",
+    )
+
+
+class FakeAws:
+    """
+    Fake ThiscoveryEvent and logs client; posted events are "processed"
+    immediately, except for those whose detail n is in self.unprocessed
+    """
+
+    def __init__(self):
+        self.put_event_calls = list()
+        self.filter_calls = list()
+        self.log_messages = list()
+        self.unprocessed = set()
+        self.logs = MagicMock()
+        self.logs.get_paginator.return_value.paginate.side_effect = self.paginate
+        self.lock = threading.Lock()
+
+    def thiscovery_event(self, event):
+        fake_aws = self
+
+        class FakeThiscoveryEvent:
+            def put_event(self, event_bus_name):
+                fake_aws.put_event(event, event_bus_name)
+                return {"ResponseMetadata": {"HTTPStatusCode": HTTPStatus.OK}}
+
+        return FakeThiscoveryEvent()
+
+    def put_event(self, event, event_bus_name):
+        with self.lock:
+            self.put_event_calls.append((event, event_bus_name))
+            detail = event["detail"]
+            if detail["n"] in self.unprocessed:
+                return
+            record = {"event": {"detail": detail}, "result": {"n": detail["n"]}}
+            self.log_messages.append(
+                f"INFO {utils.FUNCTION_RESULT_STR} {json.dumps(record)}"
+            )
+
+    def paginate(self, logGroupName, startTime, filterPattern):
+        self.filter_calls.append((logGroupName, filterPattern))
+        terms = [x.strip('?"') for x in filterPattern.split()]
+        yield {
+            "events": [
+                {"message": m} for m in self.log_messages if any(t in m for t in terms)
+            ]
+        }
+
+
+class BatchEbRequestsTestCase(test_tools.BaseTestCase):
+    def setUp(self):
+        self.aws = FakeAws()
+        client_registry.reset()
+        self.addCleanup(client_registry.reset)
+        for patcher in [
+            patch.object(
+                utils,
+                "BaseClient",
+                lambda service_name, *args, **kwargs: SimpleNamespace(
+                    client=self.aws.logs
+                ),
+            ),
+            patch.object(test_tools, "ThiscoveryEvent", self.aws.thiscovery_event),
+            patch.dict(os.environ, {"TEST_ON_AWS": "true"}),
+            patch.object(test_tools.time, "sleep"),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_events_are_posted_through_thiscovery_event(self):
+        eb_requests = [eb_request(n) for n in range(25)]
+        results = test_tools.test_eb_requests_batch(
+            eb_requests, event_bus_name="auth0-event-bus"
+        )
+        self.assertCountEqual(
+            [(r.aws_eb_event, "auth0-event-bus") for r in eb_requests],
+            self.aws.put_event_calls,
+        )
+        self.assertEqual(
+            [r.aws_eb_event["detail"]["debug_test_run_id"] for r in eb_requests],
+            list(results.keys()),
+        )
+        self.assertEqual([{"n": n} for n in range(25)], list(results.values()))
+
+    def test_one_log_search_per_log_group(self):
+        eb_requests = [eb_request(n) for n in range(4)] + [
+            eb_request(n, lambda_name="PersistAuth0Event") for n in range(4, 6)
+        ]
+        test_tools.test_eb_requests_batch(eb_requests)
+        env = utils.get_environment_name()
+        self.assertEqual(
+            [
+                f"/aws/lambda/thiscovery-events-{env}-PersistEvent",
+                f"/aws/lambda/thiscovery-events-{env}-PersistAuth0Event",
+            ],
+            [x[0] for x in self.aws.filter_calls],
+        )
+
+    def test_missing_results_raise_error(self):
+        self.aws.unprocessed = {1}
+        eb_requests = [eb_request(n) for n in range(3)]
+        with self.assertRaises(utils.ObjectDoesNotExistError) as context:
+            test_tools.test_eb_requests_batch(eb_requests, timeout=0)
+        missing_id = eb_requests[1].aws_eb_event["detail"]["debug_test_run_id"]
+        self.assertIn(missing_id, json.dumps(context.exception.details))
+
+    def test_local_methods(self):
+        with patch.dict(os.environ, {"TEST_ON_AWS": "false"}):
+            results = test_tools.test_eb_requests_batch(
+                [eb_request(n) for n in range(3)]
+            )
+        self.assertEqual([{"n": 0}, {"n": 1}, {"n": 2}], list(results.values()))
+        self.assertEqual([], self.aws.put_event_calls)
@@ -0,0 +1,84 @@
+import io
+import json
+import os
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+try:
+    from local import dev_config  # sets env variable 'TEST_ON_AWS'
+    from local import secrets  # sets AWS profile as env variable
+except ImportError:
+    pass
+
+import thiscovery_lib.utilities as utils
+
+import thiscovery_dev_tools.client_registry as client_registry
+import thiscovery_dev_tools.testing_tools as test_tools
+
+TEST_EVENT = {
+    "detail-type": "test_event",
+    "detail": {"appointment_id": 123456},
+}
+
+
+def invoke_response(payload, function_error=None):
+    response = {"StatusCode": 200, "Payload": io.BytesIO(json.dumps(payload).encode())}
+    if function_error:
+        response["FunctionError"] = function_error
+    return response
+
+
+@patch.dict(os.environ, {"TEST_ON_AWS": "true"})
+class DirectInvokeTestCase(test_tools.BaseTestCase):
+    def setUp(self):
+        test_tools._aws_account_id.cache_clear()
+        client_registry.reset()
+        self.addCleanup(client_registry.reset)
+        self.clients = {"lambda": MagicMock(), "sts": MagicMock()}
+        self.clients["lambda"].meta.region_name = "eu-west-1"
+        self.clients["sts"].get_caller_identity.return_value = {
+            "Account": "123456789012"
+        }
+        patcher = patch.object(
+            utils,
+            "BaseClient",
+            lambda service_name, *args, **kwargs: SimpleNamespace(
+                client=self.clients[service_name]
+            ),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_direct_invoke_returns_lambda_result(self):
+        self.clients["lambda"].invoke.return_value = invoke_response(
+            {"statusCode": 200}
+        )
+        result = test_tools.test_eb_request_v2(
+            local_method=None,
+            aws_eb_event=json.loads(json.dumps(TEST_EVENT)),
+            lambda_name="PersistEvent",
+            stack_name="thiscovery-events",
+            direct_invoke=True,
+        )
+        self.assertEqual({"statusCode": 200}, result)
+        invoke_kwargs = self.clients["lambda"].invoke.call_args.kwargs
+        self.assertEqual(
+            f"thiscovery-events-{utils.get_environment_name()}-PersistEvent",
+            invoke_kwargs["FunctionName"],
+        )
+        self.assertEqual("RequestResponse", invoke_kwargs["InvocationType"])
+        event = json.loads(invoke_kwargs["Payload"])
+        self.assertEqual("test_event", event["detail-type"])
+        self.assertEqual("123456789012", event["account"])
+        self.assertEqual("eu-west-1", event["region"])
+        self.assertEqual(123456, event["detail"]["appointment_id"])
+        self.assertIn("debug_test_run_id", event["detail"])
+
+    def test_function_error_is_raised(self):
+        self.clients["lambda"].invoke.return_value = invoke_response(
+            {"errorMessage": "boom"}, function_error="Unhandled"
+        )
+        with self.assertRaises(utils.DetailedValueError):
+            test_tools.invoke_lambda_with_eb_event(
+                json.loads(json.dumps(TEST_EVENT)), "PersistEvent", "thiscovery-events"
+            )
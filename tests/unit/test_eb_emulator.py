@@ -0,0 +1,164 @@
+import os
+import time
+from unittest.mock import patch
+
+try:
+    from local import dev_config  # sets env variable 'TEST_ON_AWS'
+    from local import secrets  # sets AWS profile as env variable
+except ImportError:
+    pass
+
+import thiscovery_lib.utilities as utils
+
+import thiscovery_dev_tools.testing_tools as test_tools
+from thiscovery_dev_tools.eb_emulator import EventBusEmulator
+
+TEST_DATA_FOLDER = os.path.join(
+    os.path.dirname(__file__), "../../thiscovery_dev_tools/test_data"
+)
+TEMPLATE_02 = os.path.join(TEST_DATA_FOLDER, "raw_template_02.yaml")
+
+
+def function_with_pattern(pattern):
+    return {
+        "Type": "AWS::Serverless::Function",
+        "Properties": {
+            "Events": {
+                "EventRule": {
+                    "Type": "EventBridgeRule",
+                    "Properties": {"Pattern": pattern},
+                }
+            }
+        },
+    }
+
+
+TEMPLATE = {
+    "Resources": {
+        "Exact": function_with_pattern(
+            {"source": ["qualtrics"], "detail-type": ["user_interview_task"]}
+        ),
+        "Nested": function_with_pattern(
+            {
+                "detail-type": ["appointment"],
+                "detail": {
+                    "status": [{"anything-but": ["cancelled"]}],
+                    "duration": [{"numeric": [">", 0, "<=", 60]}],
+                    "user": {"email": [{"suffix": "@thiscovery.org"}]},
+                },
+            }
+        ),
+        "Prefix": function_with_pattern({"detail-type": [{"prefix": "auth0_"}]}),
+        "Missing": function_with_pattern(
+            {"detail-type": ["appointment"], "detail": {"test": [{"exists": False}]}}
+        ),
+        "Rule": {
+            "Type": "AWS::Events::Rule",
+            "Properties": {
+                "EventPattern": {"detail-type": ["appointment"]},
+                "Targets": [{"Arn": {"Fn::GetAtt": ["Target", "Arn"]}, "Id": "t"}],
+            },
+        },
+        "Target": {"Type": "AWS::Serverless::Function", "Properties": dict()},
+    }
+}
+
+
+def appointment(**detail):
+    return {"detail-type": "appointment", "detail": detail}
+
+
+class EventBusEmulatorTestCase(test_tools.BaseTestCase):
+    def setUp(self):
+        self.bus = EventBusEmulator(TEMPLATE)
+
+    def routed_to(self, event):
+        return sorted(r.function for r in self.bus.matching_rules(event))
+
+    def test_exact_match(self):
+        event = {
+            "source": "qualtrics",
+            "detail-type": "user_interview_task",
+            "detail": {},
+        }
+        self.assertEqual(["Exact"], self.routed_to(event))
+        event["source"] = "thiscovery"
+        self.assertEqual([], self.routed_to(event))
+
+    def test_nested_detail_fields(self):
+        user = {"email": "a@thiscovery.org"}
+        self.assertEqual(
+            ["Missing", "Nested", "Target"],
+            self.routed_to(appointment(status="booked", duration=30, user=user)),
+        )
+        self.assertEqual(
+            ["Missing", "Target"],
+            self.routed_to(appointment(status="cancelled", duration=30, user=user)),
+        )
+        self.assertEqual(
+            ["Missing", "Target"],
+            self.routed_to(appointment(status="booked", duration=90, user=user)),
+        )
+        self.assertEqual(
+            ["Nested", "Target"],
+            self.routed_to(
+                appointment(status="booked", duration=30, user=user, test=True)
+            ),
+        )
+        self.assertEqual(
+            ["Missing", "Target"],
+            self.routed_to(appointment(status="booked", duration=30)),
+        )
+
+    def test_prefix(self):
+        self.assertEqual(
+            ["Prefix"], self.routed_to({"detail-type": "auth0_login", "detail": {}})
+        )
+
+    def test_dispatch_to_registered_handlers(self):
+        self.bus.register_handler("Target", lambda event, context: event["id"])
+        self.bus.register_handler("Missing", lambda event, context: "missing")
+        results = self.bus.put_event(appointment(status="booked"))
+        self.assertEqual({"Missing", "Target"}, set(results.keys()))
+        self.assertEqual("missing", results["Missing"])
+
+    def test_template_rules(self):
+        bus = EventBusEmulator.from_template_file(TEMPLATE_02)
+        self.assertEqual(
+            ["UserTaskCompleted"],
+            [
+                r.function
+                for r in bus.matching_rules(
+                    {"detail-type": "user_task_completed", "detail": {}}
+                )
+            ],
+        )
+
+    def test_throughput(self):
+        events = [appointment(status="booked", duration=n % 100) for n in range(5000)]
+        start = time.perf_counter()
+        self.bus.put_events(events)
+        self.assertLess(time.perf_counter() - start, 5)
+
+
+@patch.dict(os.environ, {"TEST_ON_AWS": "false"})
+class EbRequestV2EmulatorTestCase(test_tools.BaseTestCase):
+    def test_routed_event(self):
+        result = test_tools.test_eb_request_v2(
+            local_method=lambda event, context: event["detail"]["status"],
+            aws_eb_event=appointment(status="booked"),
+            lambda_name="Target",
+            stack_name="thiscovery-test",
+            eb_emulator=EventBusEmulator(TEMPLATE),
+        )
+        self.assertEqual("booked", result)
+
+    def test_event_not_routed(self):
+        with self.assertRaises(utils.DetailedValueError):
+            test_tools.test_eb_request_v2(
+                local_method=lambda event, context: None,
+                aws_eb_event={"detail-type": "other", "detail": {}},
+                lambda_name="Target",
+                stack_name="thiscovery-test",
+                eb_emulator=EventBusEmulator(TEMPLATE),
+            )
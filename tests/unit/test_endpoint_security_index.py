@@ -0,0 +1,137 @@
+import copy
+import os
+from unittest.mock import patch
+
+try:
+    from local import dev_config  # sets env variable 'TEST_ON_AWS'
+    from local import secrets  # sets AWS profile as env variable
+except ImportError:
+    pass
+
+import thiscovery_dev_tools.testing_tools as test_tools
+
+TEST_DATA_FOLDER = os.path.join(
+    os.path.dirname(__file__), "../../thiscovery_dev_tools/test_data"
+)
+TEMPLATE_02 = os.path.join(TEST_DATA_FOLDER, "raw_template_02.yaml")
+
+API_KEY_SCHEME = {"api_key": {"in": "header", "name": "x-api-key", "type": "apiKey"}}
+
+MULTI_API_TEMPLATE = {
+    "Resources": {
+        "SwaggerApi": {
+            "Type": "AWS::Serverless::Api",
+            "Properties": {
+                "DefinitionBody": {
+                    "swagger": "2.0",
+                    "securityDefinitions": API_KEY_SCHEME,
+                    "paths": {
+                        "/v1/users": {
+                            "get": {"security": [{"api_key": []}]},
+                            "options": {},
+                        },
+                        "/v1/ping": {"get": {}},
+                    },
+                }
+            },
+        },
+        "OpenApi": {
+            "Type": "AWS::Serverless::HttpApi",
+            "Properties": {
+                "DefinitionBody": {
+                    "openapi": "3.0.1",
+                    "components": {
+                        "securitySchemes": {"jwt": {"type": "oauth2", "flows": dict()}}
+                    },
+                    "security": [{"jwt": []}],
+                    "paths": {
+                        "/v1/items": {"post": {}},
+                        "/v1/other": {"get": {"security": [{"missing": []}]}},
+                    },
+                }
+            },
+        },
+        "ImplicitApi": {
+            "Type": "AWS::Serverless::Api",
+            "Properties": {"DefinitionUri": "api.yaml"},
+        },
+    }
+}
+
+
+class EndpointSecurityIndexTestCase(test_tools.BaseTestCase):
+    def setUp(self):
+        self.index = test_tools.EndpointSecurityIndex(MULTI_API_TEMPLATE)
+
+    def test_index_covers_all_apis(self):
+        self.assertEqual(
+            [
+                ("SwaggerApi", "/v1/users", "get"),
+                ("SwaggerApi", "/v1/users", "options"),
+                ("SwaggerApi", "/v1/ping", "get"),
+                ("OpenApi", "/v1/items", "post"),
+                ("OpenApi", "/v1/other", "get"),
+            ],
+            list(self.index.endpoints.keys()),
+        )
+        self.assertEqual(["ImplicitApi"], self.index.apis_without_definition_body)
+
+    def test_security_schemes(self):
+        self.assertEqual(API_KEY_SCHEME, self.index.security_schemes["SwaggerApi"])
+        self.assertEqual(["jwt"], list(self.index.security_schemes["OpenApi"]))
+
+    def test_effective_security(self):
+        endpoint = self.index.endpoints[("OpenApi", "/v1/items", "post")]
+        self.assertIsNone(endpoint.security)
+        self.assertEqual([{"jwt": []}], endpoint.effective_security)
+        self.assertEqual(
+            ["missing"],
+            self.index.undefined_schemes(
+                self.index.endpoints[("OpenApi", "/v1/other", "get")]
+            ),
+        )
+
+    def test_index_is_cached_per_template(self):
+        self.assertIs(
+            test_tools.load_endpoint_security_index(TEMPLATE_02),
+            test_tools.load_endpoint_security_index(TEMPLATE_02),
+        )
+
+
+class TemplateSecurityTestCase(test_tools.TestSecurityOfEndpointsDefinedInTemplateYaml):
+    public_endpoints = [
+        ("/v1/raise-error", "post"),
+        ("/v1/ping", "get"),
+        ("CoreAPI", "/v1/log-request", "post"),
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass(TEMPLATE_02)
+
+    def test_core_api_endpoints_are_secure(self):
+        self.check_defined_endpoints_are_secure()
+
+    def test_all_endpoints_are_secure(self):
+        self.check_all_defined_endpoints_are_secure(expected_security=[{"api_key": []}])
+
+    def test_any_method_routes_and_apis_without_definition_body_are_reported(self):
+        template = copy.deepcopy(MULTI_API_TEMPLATE)
+        properties = template["Resources"]["SwaggerApi"]["Properties"]
+        properties["DefinitionBody"]["paths"]["/v1/proxy"] = {
+            test_tools.ANY_METHOD_VERB: {}
+        }
+        index = test_tools.EndpointSecurityIndex(template)
+        self.assertEqual(
+            "ANY",
+            index.endpoints[
+                ("SwaggerApi", "/v1/proxy", test_tools.ANY_METHOD_VERB)
+            ].method,
+        )
+        with patch.object(self, "security_index", index):
+            with self.assertRaises(AssertionError) as context:
+                self.check_all_defined_endpoints_are_secure(
+                    expected_security=[{"api_key": []}]
+                )
+        self.assertIn("SwaggerApi ANY /v1/proxy: security None", str(context.exception))
+        self.assertIn("ImplicitApi: no inline DefinitionBody", str(context.exception))
@@ -0,0 +1,174 @@
+import os
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+try:
+    from local import dev_config  # sets env variable 'TEST_ON_AWS'
+    from local import secrets  # sets AWS profile as env variable
+except ImportError:
+    pass
+
+import thiscovery_dev_tools.testing_tools as test_tools
+import thiscovery_lib.utilities as utils
+from thiscovery_dev_tools.endpoint_sweeper import EndpointSweeper
+
+TEMPLATE_02 = os.path.join(
+    os.path.dirname(__file__),
+    "../../thiscovery_dev_tools/test_data/raw_template_02.yaml",
+)
+VALID_API_KEY = "valid-key"
+# path served without checking the API key, to simulate a misconfigured endpoint
+UNPROTECTED_PATH = "/v1/unprotected"
+
+
+class StubApiHandler(BaseHTTPRequestHandler):
+    requests_received = list()
+
+    def _respond(self):
+        self.requests_received.append((self.command, self.path))
+        if self.path == UNPROTECTED_PATH or (
+            self.headers.get("x-api-key") == VALID_API_KEY
+        ):
+            status = HTTPStatus.OK
+        else:
+            status = HTTPStatus.FORBIDDEN
+        body = b'{"message": "stub"}'
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+def template(paths):
+    return {
+        "Resources": {
+            "CoreAPI": {
+                "Type": "AWS::Serverless::Api",
+                "Properties": {
+                    "DefinitionBody": {
+                        "swagger": "2.0",
+                        "securityDefinitions": {
+                            "api_key": {
+                                "in": "header",
+                                "name": "x-api-key",
+                                "type": "apiKey",
+                            }
+                        },
+                        "paths": paths,
+                    }
+                },
+            }
+        }
+    }
+
+
+SECURED = {"security": [{"api_key": []}]}
+
+
+class EndpointSweeperTestCase(test_tools.BaseTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubApiHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        cls.server_thread = threading.Thread(
+            target=cls.server.serve_forever, daemon=True
+        )
+        cls.server_thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        StubApiHandler.requests_received.clear()
+
+    def sweeper(self, paths, **kwargs):
+        index = test_tools.EndpointSecurityIndex(template(paths))
+        return EndpointSweeper(
+            self.base_url, list(index.endpoints.values()), max_concurrency=4, **kwargs
+        )
+
+    def test_secured_endpoints_are_probed_with_all_keys(self):
+        sweeper = self.sweeper(
+            {
+                "/v1/user/{id}": {"get": SECURED, "patch": SECURED},
+                "/v1/user": {"post": SECURED},
+                "/v1/ping": {"get": dict()},
+            },
+            path_parameters={"id": "1234"},
+        )
+        results = sweeper.run()
+        self.assertEqual(
+            [
+                ("CoreAPI GET /v1/user/{id}", "blank", HTTPStatus.FORBIDDEN),
+                ("CoreAPI GET /v1/user/{id}", "invalid", HTTPStatus.FORBIDDEN),
+                ("CoreAPI PATCH /v1/user/{id}", "blank", HTTPStatus.FORBIDDEN),
+                ("CoreAPI PATCH /v1/user/{id}", "invalid", HTTPStatus.FORBIDDEN),
+                ("CoreAPI POST /v1/user", "blank", HTTPStatus.FORBIDDEN),
+                ("CoreAPI POST /v1/user", "invalid", HTTPStatus.FORBIDDEN),
+            ],
+            [(x.endpoint, x.key_name, x.status) for x in results],
+        )
+        self.assertEqual([], sweeper.failures())
+        # public endpoints are not probed
+        self.assertNotIn(("GET", "/v1/ping"), StubApiHandler.requests_received)
+        self.assertIn(("GET", "/v1/user/1234"), StubApiHandler.requests_received)
+        self.assertIn("CoreAPI POST /v1/user", sweeper.table().get_string())
+
+    def test_any_method_routes_are_probed(self):
+        sweeper = self.sweeper({"/v1/proxy": {test_tools.ANY_METHOD_VERB: SECURED}})
+        results = sweeper.run()
+        self.assertEqual(
+            [("CoreAPI ANY /v1/proxy", "blank"), ("CoreAPI ANY /v1/proxy", "invalid")],
+            [(x.endpoint, x.key_name) for x in results],
+        )
+        self.assertEqual([], sweeper.failures())
+        self.assertIn(("GET", "/v1/proxy"), StubApiHandler.requests_received)
+
+    def test_misconfigured_endpoint_is_reported(self):
+        sweeper = self.sweeper(
+            {UNPROTECTED_PATH: {"get": SECURED}, "/v1/user": {"get": SECURED}}
+        )
+        sweeper.run()
+        self.assertEqual(
+            [
+                ("CoreAPI GET /v1/unprotected", "blank"),
+                ("CoreAPI GET /v1/unprotected", "invalid"),
+            ],
+            [(x.endpoint, x.key_name) for x in sweeper.failures()],
+        )
+        self.assertIn("(expected 403)", sweeper.table().get_string())
+
+    def test_connection_errors_are_reported(self):
+        sweeper = EndpointSweeper(
+            "http://127.0.0.1:1",
+            list(
+                test_tools.EndpointSecurityIndex(
+                    template({"/v1/user": {"get": SECURED}})
+                ).endpoints.values()
+            ),
+            timeout=2,
+        )
+        results = sweeper.run()
+        self.assertEqual([None, None], [x.status for x in results])
+        self.assertEqual(2, len(sweeper.failures()))
+
+    def test_missing_base_url_raises_error(self):
+        # TestApiEndpoints is skipped unless tests run on AWS
+        with patch.dict(os.environ):
+            os.environ.pop("AWS_TEST_API", None)
+            with self.assertRaises(utils.DetailedValueError) as context:
+                test_tools.TestApiEndpoints.check_template_endpoints_are_restricted(
+                    self, TEMPLATE_02
+                )
+        self.assertIn("AWS_TEST_API", str(context.exception))
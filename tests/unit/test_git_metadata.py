@@ -0,0 +1,53 @@
+try:
+    from local import dev_config  # sets env variable 'TEST_ON_AWS'
+    from local import secrets  # sets AWS profile as env variable
+except ImportError:
+    pass
+
+import thiscovery_dev_tools.git_metadata as gm
+import thiscovery_dev_tools.testing_tools as test_tools
+
+PORCELAIN_OUTPUT = """# branch.oid 6d7108b8e3a1b1f1a4c1d2e3f4a5b6c7d8e9f0a1
+# branch.head feature/faster-builds
+# branch.upstream origin/feature/faster-builds
+# branch.ab +2 -1
+1 .M N... 100644 100644 100644 3f1a 3f1a thiscovery_dev_tools/aws_deployer.py
+1 M. N... 100644 100644 100644 3f1a 4b2c README.md
+2 R. N... 100644 100644 100644 3f1a 3f1a R100 new_name.py\told_name.py
+u UU N... 100644 100644 100644 100644 1a 2b 3c setup.py
+"""
+
+
+class GitMetadataTestCase(test_tools.BaseTestCase):
+    def test_parse_porcelain_v2(self):
+        metadata = gm.parse_porcelain_v2(PORCELAIN_OUTPUT)
+        self.assertEqual(
+            gm.RepositoryMetadata(
+                revision="6d7108b8e3a1b1f1a4c1d2e3f4a5b6c7d8e9f0a1",
+                branch="feature/faster-builds",
+                upstream="origin/feature/faster-builds",
+                ahead=2,
+                behind=1,
+                staged_changes=2,
+                unstaged_changes=1,
+                unmerged_changes=1,
+            ),
+            metadata,
+        )
+        self.assertTrue(metadata.is_dirty)
+        self.assertTrue(metadata.out_of_sync)
+
+    def test_parse_porcelain_v2_detached_clean(self):
+        metadata = gm.parse_porcelain_v2(
+            "# branch.oid 6d7108b8e3a1b1f1a4c1d2e3f4a5b6c7d8e9f0a1\n"
+            "# branch.head (detached)\n"
+        )
+        self.assertEqual("HEAD", metadata.branch)
+        self.assertFalse(metadata.is_dirty)
+        self.assertFalse(metadata.out_of_sync)
+
+    def test_repository_metadata_is_memoized(self):
+        gm.clear_cache()
+        first = gm.get_repository_metadata()
+        self.assertIs(first, gm.get_repository_metadata())
+        self.assertEqual(1, gm._get_repository_metadata.cache_info().misses)
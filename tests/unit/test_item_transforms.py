@@ -0,0 +1,142 @@
+try:
+    from local import dev_config  # sets env variable 'TEST_ON_AWS'
+    from local import secrets  # sets AWS profile as env variable
+except ImportError:
+    pass
+
+from decimal import Decimal
+
+import thiscovery_dev_tools.dynamodb_bulk as bulk
+import thiscovery_dev_tools.item_transforms as it
+import thiscovery_dev_tools.testing_tools as test_tools
+from thiscovery_dev_tools.dynamodb_stub import InMemoryDynamodbClient
+
+SOURCE_TABLE = "thiscovery-core-test-afs25-lookups"
+TARGET_TABLE = "thiscovery-crm-dev-afs25-lookups"
+
+
+class ItemTransformsTestCase(test_tools.BaseTestCase):
+    def test_serialization_round_trip(self):
+        item = {
+            "id": "1",
+            "score": 2.5,
+            "count": 3,
+            "details": {"tags": ["a", 1.25], "flag": True},
+            "names": {"x", "y"},
+        }
+        result = it.deserialize_item(it.serialize_item(item))
+        self.assertEqual(Decimal("2.5"), result["score"])
+        self.assertEqual(
+            [["a", Decimal("1.25")], True], list(result["details"].values())
+        )
+        self.assertEqual({"x", "y"}, result["names"])
+
+    def test_transform_factories(self):
+        item = {
+            "id": "test-afs25-1",
+            "details": {"url": "https://test-afs25.thiscovery.org", "n": 1},
+            "envs": {"test-afs25", "prod"},
+            "obsolete": "x",
+        }
+        transformed = it.drop_attributes("obsolete")(
+            it.substitute_in_values("test-afs25", "dev-afs25")(
+                it.rename_attributes({"details": "item_details"})(item)
+            )
+        )
+        self.assertEqual(
+            {
+                "id": "dev-afs25-1",
+                "item_details": {"url": "https://dev-afs25.thiscovery.org", "n": 1},
+                "envs": {"dev-afs25", "prod"},
+            },
+            transformed,
+        )
+        keep_new = it.filter_items(lambda x: x.get("status") == "new")
+        self.assertIsNone(keep_new(item))
+        self.assertEqual({"status": "new"}, keep_new({"status": "new"}))
+
+    def test_stage_is_lazy_and_counts_items(self):
+        calls = list()
+
+        def record(item):
+            calls.append(item["id"])
+            return item
+
+        stage = it.TransformStage([record, it.filter_items(lambda x: x["id"] != "2")])
+        items = (it.serialize_item({"id": str(i)}) for i in range(4))
+        output = stage.apply(items)
+        self.assertEqual([], calls)
+        self.assertEqual({"id": {"S": "0"}}, next(output))
+        self.assertEqual(["0"], calls)
+        self.assertEqual([{"id": {"S": "1"}}, {"id": {"S": "3"}}], list(output))
+        metrics = stage.metrics()
+        self.assertEqual(4, metrics["items_in"])
+        self.assertEqual(3, metrics["items_out"])
+        self.assertEqual(1, metrics["dropped"])
+
+    def test_copy_table_applies_transforms(self):
+        client = InMemoryDynamodbClient(
+            {SOURCE_TABLE: ["id"], TARGET_TABLE: ["id"]}, page_size=10
+        )
+        for i in range(50):
+            client.put_item(
+                TableName=SOURCE_TABLE,
+                Item=it.serialize_item(
+                    {
+                        "id": f"lookup-{i:02}",
+                        "item_type": "test data" if i % 5 == 0 else "country",
+                        "details": {"env": "test-afs25"},
+                        "legacy": True,
+                    }
+                ),
+            )
+        result = bulk.copy_table(
+            client,
+            client,
+            SOURCE_TABLE,
+            TARGET_TABLE,
+            transforms=[
+                it.filter_items(lambda x: x["item_type"] != "test data"),
+                it.rename_attributes({"details": "item_details"}),
+                it.substitute_in_values("test-afs25", "dev-afs25"),
+                it.drop_attributes("legacy"),
+            ],
+        )
+        self.assertEqual(50, result["items_scanned"])
+        self.assertEqual(40, result["items_copied"])
+        self.assertEqual(40, result["transforms"]["items_out"])
+        self.assertEqual(10, result["transforms"]["dropped"])
+        self.assertEqual(40, result["writer"]["items_written"])
+        target_items = [it.deserialize_item(x) for x in client.items(TARGET_TABLE)]
+        self.assertEqual(40, len(target_items))
+        self.assertEqual(
+            {"id", "item_type", "item_details"},
+            set().union(*(x.keys() for x in target_items)),
+        )
+        self.assertTrue(
+            all(x["item_details"] == {"env": "dev-afs25"} for x in target_items)
+        )
+
+    def test_copy_table_writes_colliding_keys_in_separate_batches(self):
+        client = InMemoryDynamodbClient(
+            {SOURCE_TABLE: ["id"], TARGET_TABLE: ["id"]}, page_size=50
+        )
+        for env in ["test-afs25", "dev-afs25"]:
+            for i in range(5):
+                client.put_item(
+                    TableName=SOURCE_TABLE,
+                    Item=it.serialize_item({"id": f"{env}-{i}", "source": env}),
+                )
+        result = bulk.copy_table(
+            client,
+            client,
+            SOURCE_TABLE,
+            TARGET_TABLE,
+            workers=1,
+            transforms=[it.substitute_in_values("test-afs25", "dev-afs25")],
+        )
+        self.assertEqual(10, result["items_copied"])
+        self.assertEqual(
+            [f"dev-afs25-{i}" for i in range(5)],
+            sorted(x["id"]["S"] for x in client.items(TARGET_TABLE)),
+        )
@@ -0,0 +1,222 @@
+import concurrent.futures
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+try:
+    from local import dev_config  # sets env variable 'TEST_ON_AWS'
+    from local import secrets  # sets AWS profile as env variable
+except ImportError:
+    pass
+
+import thiscovery_dev_tools.aws_deployer as ad
+import thiscovery_dev_tools.build_manifest as bm
+import thiscovery_dev_tools.testing_tools as test_tools
+import thiscovery_lib.utilities as utils
+from thiscovery_dev_tools.deployment_timings import DeploymentTimings
+from thiscovery_dev_tools.template_pipeline import template_to_dict, template_to_yaml
+
+TEST_TEMPLATE = {
+    "Resources": {
+        f"Function{x}": {
+            "Type": "AWS::Serverless::Function",
+            "Properties": {"CodeUri": f"src_{x.lower()}", "Handler": "main.handler"},
+        }
+        for x in ["A", "B", "C"]
+    },
+}
+
+
+def make_deployer():
+    """
+    AwsDeployer with just the attributes used by builds (its constructor
+    reads git metadata and creates AWS clients)
+    """
+    deployer = ad.AwsDeployer.__new__(ad.AwsDeployer)
+    deployer.logger = utils.get_logger()
+    deployer.timings = DeploymentTimings()
+    deployer.parsed_template = os.path.join(".thiscovery", "template.yaml")
+    return deployer
+
+
+def fake_build_resource(resource_id, *args, **kwargs):
+    os.makedirs(os.path.join(bm.BUILD_DIR, resource_id), exist_ok=True)
+
+
+class BuildResourcesTestCase(test_tools.BaseTestCase):
+    def setUp(self):
+        self.deployer = make_deployer()
+
+    def test_failed_build_cancels_pending_builds(self):
+        failing_started = threading.Event()
+        built = list()
+
+        def build_resource(resource_id, *args):
+            if resource_id == "Failing":
+                failing_started.set()
+                raise subprocess.CalledProcessError(1, ["sam", "build", resource_id])
+            if resource_id == "Slow":
+                failing_started.wait(5)
+                time.sleep(0.1)
+            built.append(resource_id)
+
+        with patch.object(self.deployer, "build_resource", side_effect=build_resource):
+            with self.assertRaises(subprocess.CalledProcessError) as context:
+                self.deployer.build_resources(
+                    ["Slow", "Failing", "Pending1", "Pending2"],
+                    build_in_container=False,
+                    workers=2,
+                )
+        self.assertEqual(["sam", "build", "Failing"], context.exception.cmd)
+        # the build already running when the failure happened was completed
+        self.assertEqual(["Slow"], built)
+
+    def test_builds_capture_output_when_parallel(self):
+        with patch.object(self.deployer, "build_resource") as mock_build:
+            self.deployer.build_resources(["A", "B"], False, {"K": "V"}, workers=2)
+        self.assertCountEqual(
+            [
+                ("A", False, {"K": "V"}, True, None),
+                ("B", False, {"K": "V"}, True, None),
+            ],
+            [c.args for c in mock_build.call_args_list],
+        )
+        with patch.object(self.deployer, "build_resource") as mock_build:
+            self.deployer.build_resources(["A"], False, workers=1)
+        mock_build.assert_called_once_with("A", False, None, template_path=None)
+
+    def test_parallel_sam_builds_use_buffered_output(self):
+        with patch.object(ad, "run_with_buffered_output") as mock_run, patch.object(
+            ad.subprocess, "run"
+        ) as mock_subprocess_run, patch.object(ad.shutil, "move"):
+            self.deployer.build_resources(["A", "B"], False, workers=2)
+        mock_subprocess_run.assert_not_called()
+        self.assertCountEqual(
+            ["sam build A", "sam build B"],
+            [c.kwargs["label"] for c in mock_run.call_args_list],
+        )
+
+
+class RunWithBufferedOutputTestCase(test_tools.BaseTestCase):
+    @staticmethod
+    def python_command(code):
+        return [sys.executable, "-c", code]
+
+    def test_concurrent_output_is_not_interleaved(self):
+        slow = self.python_command(
+            "import time\n"
+            "for i in range(3):\n"
+            "    print(f'slow {i}', flush=True)\n"
+            "    time.sleep(0.1)"
+        )
+        fast = self.python_command(
+            "import time\n"
+            "time.sleep(0.05)\n"
+            "for i in range(3):\n"
+            "    print(f'fast {i}', flush=True)"
+        )
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+                futures = [
+                    executor.submit(ad.run_with_buffered_output, slow, "slow"),
+                    executor.submit(ad.run_with_buffered_output, fast, "fast"),
+                ]
+                for future in futures:
+                    future.result()
+        output = stdout.getvalue()
+        self.assertIn("---------- fast ----------\nfast 0\nfast 1\nfast 2\n", output)
+        self.assertIn("---------- slow ----------\nslow 0\nslow 1\nslow 2\n", output)
+        self.assertLess(output.index("fast"), output.index("slow"))
+
+    def test_output_of_failed_command_is_printed(self):
+        command = self.python_command(
+            "import sys\nprint('building')\nsys.exit('build failed')"
+        )
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            with self.assertRaises(subprocess.CalledProcessError):
+                ad.run_with_buffered_output(command, label="failing")
+        self.assertIn("---------- failing ----------\n", stdout.getvalue())
+        self.assertIn("building\n", stdout.getvalue())
+        self.assertIn("build failed\n", stdout.getvalue())
+
+
+class BuildPerResourceTestCase(test_tools.BaseTestCase):
+    def setUp(self):
+        self.base_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.base_dir.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.base_dir.name)
+        for resource in TEST_TEMPLATE["Resources"].values():
+            source_dir = resource["Properties"]["CodeUri"]
+            os.makedirs(source_dir)
+            self.write_file(os.path.join(source_dir, "main.py"), "print('hello')")
+        os.makedirs(".thiscovery")
+        self.write_file(
+            os.path.join(".thiscovery", "template.yaml"),
+            template_to_yaml(TEST_TEMPLATE),
+        )
+        self.deployer = make_deployer()
+
+    @staticmethod
+    def write_file(path, content):
+        with open(path, "w") as f:
+            f.write(content)
+
+    def build_per_resource(self, **kwargs):
+        with patch.object(
+            self.deployer, "build_resource", side_effect=fake_build_resource
+        ) as mock_build, patch.object(self.deployer, "run_sam_build") as mock_sam:
+            built = self.deployer.build_per_resource(False, **kwargs)
+        mock_sam.assert_not_called()
+        return built, sorted(c.args[0] for c in mock_build.call_args_list)
+
+    def test_workers_are_passed_to_executor(self):
+        with patch.object(
+            ad.concurrent.futures,
+            "ThreadPoolExecutor",
+            wraps=concurrent.futures.ThreadPoolExecutor,
+        ) as mock_executor:
+            built, build_calls = self.build_per_resource(workers=3)
+        mock_executor.assert_called_once_with(max_workers=3)
+        self.assertEqual(["FunctionA", "FunctionB", "FunctionC"], build_calls)
+        self.assertCountEqual(build_calls, built)
+
+    def test_unchanged_resources_are_skipped(self):
+        self.build_per_resource(workers=2)
+        self.write_file(os.path.join("src_b", "main.py"), "print('changed')")
+        built, build_calls = self.build_per_resource(incremental=True, workers=2)
+        self.assertEqual(["FunctionB"], built)
+        self.assertEqual(["FunctionB"], build_calls)
+        built, build_calls = self.build_per_resource(incremental=True, workers=2)
+        self.assertEqual([], built)
+        self.assertEqual([], build_calls)
+
+    def test_functions_are_built_without_local_layers(self):
+        template = template_to_dict(template_to_yaml(TEST_TEMPLATE))
+        template["Resources"]["Layer"] = {
+            "Type": "AWS::Serverless::LayerVersion",
+            "Properties": {"ContentUri": "src_layer"},
+            "Metadata": {"BuildMethod": "python3.9"},
+        }
+        template["Resources"]["FunctionA"]["Properties"]["Layers"] = [{"Ref": "Layer"}]
+        os.makedirs("src_layer")
+        self.write_file(
+            os.path.join(".thiscovery", "template.yaml"), template_to_yaml(template)
+        )
+        built, build_calls = self.build_per_resource(workers=2)
+        self.assertEqual(["FunctionA", "FunctionB", "FunctionC", "Layer"], build_calls)
+        staging_template = os.path.join(bm.STAGING_DIR, "template.yaml")
+        with open(staging_template) as f:
+            function_a = template_to_dict(f.read())["Resources"]["FunctionA"]
+        self.assertNotIn("Layers", function_a["Properties"])
+        with open(os.path.join(bm.BUILD_DIR, "template.yaml")) as f:
+            function_a = template_to_dict(f.read())["Resources"]["FunctionA"]
+        self.assertEqual([{"Ref": "Layer"}], function_a["Properties"]["Layers"])
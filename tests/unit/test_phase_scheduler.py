@@ -0,0 +1,91 @@
+import time
+
+try:
+    from local import dev_config  # sets env variable 'TEST_ON_AWS'
+    from local import secrets  # sets AWS profile as env variable
+except ImportError:
+    pass
+
+import thiscovery_dev_tools.aws_deployer as ad
+import thiscovery_dev_tools.testing_tools as test_tools
+import thiscovery_lib.utilities as utils
+from thiscovery_dev_tools.phase_scheduler import (
+    Phase,
+    PhaseScheduler,
+    PhaseTimeoutError,
+)
+
+
+class PhaseSchedulerTestCase(test_tools.BaseTestCase):
+    def setUp(self):
+        self.calls = list()
+
+    def phase_func(self, name, duration=0.0, result=None):
+        def func():
+            self.calls.append(f"start {name}")
+            time.sleep(duration)
+            self.calls.append(f"end {name}")
+            return result
+
+        return func
+
+    def test_independent_phases_run_concurrently(self):
+        scheduler = PhaseScheduler(
+            [
+                Phase("parse", self.phase_func("parse")),
+                Phase("validate", self.phase_func("validate", 0.3), ["parse"]),
+                Phase("build", self.phase_func("build", 0.3), ["parse"]),
+                Phase(
+                    "deploy", self.phase_func("deploy", 0, "ok"), ["validate", "build"]
+                ),
+            ]
+        )
+        start = time.perf_counter()
+        results = scheduler.run()
+        self.assertLess(time.perf_counter() - start, 0.55)
+        self.assertEqual("ok", results["deploy"])
+        self.assertEqual(["start parse", "end parse"], self.calls[:2])
+        self.assertEqual(["start deploy", "end deploy"], self.calls[-2:])
+
+    def test_failed_phase_stops_dependents_and_is_retried(self):
+        attempts = list()
+
+        def failing():
+            attempts.append(1)
+            raise ValueError("build failed")
+
+        scheduler = PhaseScheduler(
+            [
+                Phase("build", failing, retries=2),
+                Phase("deploy", self.phase_func("deploy"), ["build"]),
+            ]
+        )
+        with self.assertRaises(ValueError):
+            scheduler.run()
+        self.assertEqual(3, len(attempts))
+        self.assertEqual([], self.calls)
+
+    def test_timeout(self):
+        scheduler = PhaseScheduler(
+            [Phase("slack_message", self.phase_func("slack_message", 1), timeout=0.1)]
+        )
+        with self.assertRaises(PhaseTimeoutError):
+            scheduler.run()
+
+    def test_cycle_is_rejected(self):
+        with self.assertRaises(utils.DetailedValueError):
+            PhaseScheduler(
+                [
+                    Phase("a", self.phase_func("a"), ["b"]),
+                    Phase("b", self.phase_func("b"), ["a"]),
+                ]
+            )
+
+
+class DeploymentPhasesTestCase(test_tools.BaseTestCase):
+    def test_deployment_event_is_not_retried(self):
+        # AwsDeployer's constructor reads git metadata and creates AWS clients
+        deployer = ad.AwsDeployer.__new__(ad.AwsDeployer)
+        deployer.stack_name = "thiscovery-crm"
+        phases = {x.name: x for x in deployer.get_deployment_phases()}
+        self.assertEqual(0, phases["log_deployment"].retries)
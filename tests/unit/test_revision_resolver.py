@@ -0,0 +1,65 @@
+import os
+import shutil
+import subprocess
+import tempfile
+
+try:
+    from local import dev_config  # sets env variable 'TEST_ON_AWS'
+    from local import secrets  # sets AWS profile as env variable
+except ImportError:
+    pass
+
+import thiscovery_dev_tools.testing_tools as test_tools
+from thiscovery_dev_tools.revision_resolver import RevisionResolver
+
+
+class RevisionResolverTestCase(test_tools.BaseTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        work_tree = os.path.join(self.tmp_dir.name, "work")
+        self.remote = os.path.join(self.tmp_dir.name, "remote.git")
+        self.cache_path = os.path.join(self.tmp_dir.name, "revisions.json")
+        git = ["git", "-c", "user.name=test", "-c", "user.email=test@test"]
+        subprocess.run(["git", "init", "-q", work_tree], check=True)
+        subprocess.run(
+            git + ["-C", work_tree, "commit", "-q", "--allow-empty", "-m", "init"],
+            check=True,
+        )
+        subprocess.run(
+            ["git", "clone", "-q", "--bare", work_tree, self.remote], check=True
+        )
+        self.expected_revision = subprocess.run(
+            ["git", "-C", work_tree, "rev-parse", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def resolver(self, ttl):
+        return RevisionResolver(remote=self.remote, ttl=ttl, cache_path=self.cache_path)
+
+    def test_resolve_from_remote_then_cache(self):
+        resolver = self.resolver(ttl=3600)
+        self.assertEqual(self.expected_revision, resolver.resolve())
+        self.assertEqual("remote", resolver.source)
+        shutil.rmtree(self.remote)
+        resolver = self.resolver(ttl=3600)
+        self.assertEqual(self.expected_revision, resolver.resolve())
+        self.assertEqual("cache", resolver.source)
+
+    def test_stale_cache_used_when_remote_unreachable(self):
+        self.resolver(ttl=0).resolve()
+        shutil.rmtree(self.remote)
+        resolver = self.resolver(ttl=0)
+        self.assertEqual(self.expected_revision, resolver.resolve())
+        self.assertEqual("stale_cache", resolver.source)
+
+    def test_installed_package_fallback(self):
+        shutil.rmtree(self.remote)
+        resolver = self.resolver(ttl=3600)
+        resolver.package_name = "package-that-is-not-installed"
+        self.assertIsNone(resolver.resolve())
+        self.assertEqual("installed_package", resolver.source)
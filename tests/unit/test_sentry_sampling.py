@@ -0,0 +1,105 @@
+try:
+    from local import dev_config  # sets env variable 'TEST_ON_AWS'
+    from local import secrets  # sets AWS profile as env variable
+except ImportError:
+    pass
+
+import thiscovery_lib.utilities as utils
+
+import thiscovery_dev_tools.testing_tools as test_tools
+from thiscovery_dev_tools.sentry_integration import SentryIntegration
+from thiscovery_dev_tools.sentry_sampling import SamplingPolicy
+
+
+def lambda_definition(metadata=None):
+    definition = {
+        "Type": "AWS::Serverless::Function",
+        "Properties": {"Handler": "test.handler", "Runtime": "python3.12"},
+    }
+    if metadata is not None:
+        definition["Metadata"] = metadata
+    return definition
+
+
+class SamplingPolicyTestCase(test_tools.BaseTestCase):
+    def test_default_rate(self):
+        policy = SamplingPolicy("prod")
+        self.assertEqual(1, policy.sample_rate("MyFunction", lambda_definition()))
+
+    def test_function_metadata(self):
+        policy = SamplingPolicy("prod")
+        self.assertEqual(
+            0.1,
+            policy.sample_rate(
+                "MyFunction", lambda_definition({"SentryTracesSampleRate": 0.1})
+            ),
+        )
+
+    def test_per_environment_metadata(self):
+        metadata = {"SentryTracesSampleRate": {"prod": 0.05, "default": 0.5}}
+        self.assertEqual(
+            0.05,
+            SamplingPolicy("prod").sample_rate("F", lambda_definition(metadata)),
+        )
+        self.assertEqual(
+            0.5,
+            SamplingPolicy("test-afs25").sample_rate("F", lambda_definition(metadata)),
+        )
+
+    def test_template_metadata(self):
+        policy = SamplingPolicy(
+            "prod", template_metadata={"SentryTracesSampleRate": {"prod": 0.2}}
+        )
+        self.assertEqual(0.2, policy.sample_rate("F", lambda_definition()))
+        self.assertEqual(
+            0.3,
+            policy.sample_rate("F", lambda_definition({"SentryTracesSampleRate": 0.3})),
+        )
+
+    def test_per_environment_template_defaults(self):
+        template_metadata = {"SentryTracesSampleRate": {"prod": 0.1, "default": 1}}
+        self.assertEqual(
+            0.1,
+            SamplingPolicy("prod", template_metadata).sample_rate(
+                "F", lambda_definition()
+            ),
+        )
+        self.assertEqual(
+            1,
+            SamplingPolicy("test-afs25", template_metadata).sample_rate(
+                "F", lambda_definition()
+            ),
+        )
+
+    def test_overrides_take_precedence(self):
+        policy = SamplingPolicy("prod", overrides={"HotFunction": 0, "*": 0.25})
+        metadata = {"SentryTracesSampleRate": 0.1}
+        self.assertEqual(
+            0, policy.sample_rate("HotFunction", lambda_definition(metadata))
+        )
+        self.assertEqual(
+            0.25, policy.sample_rate("OtherFunction", lambda_definition(metadata))
+        )
+
+    def test_invalid_rate(self):
+        policy = SamplingPolicy("prod")
+        with self.assertRaises(utils.DetailedValueError):
+            policy.sample_rate("F", lambda_definition({"SentryTracesSampleRate": 1.5}))
+
+    def test_trace_lambdas_uses_policy(self):
+        template = {
+            "Metadata": {"SentryTracesSampleRate": 0.5},
+            "Resources": {
+                "HotFunction": lambda_definition({"SentryTracesSampleRate": 0.01}),
+                "ColdFunction": lambda_definition(),
+            },
+        }
+        sentry_integration = SentryIntegration(
+            template_as_dict=template, environment="prod"
+        )
+        sentry_integration.trace_lambdas()
+        rates = {
+            k: v["Properties"]["Environment"]["Variables"]["SENTRY_TRACES_SAMPLE_RATE"]
+            for k, v in template["Resources"].items()
+        }
+        self.assertEqual({"HotFunction": 0.01, "ColdFunction": 0.5}, rates)
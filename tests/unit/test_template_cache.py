@@ -0,0 +1,72 @@
+import os
+import tempfile
+
+try:
+    from local import dev_config  # sets env variable 'TEST_ON_AWS'
+    from local import secrets  # sets AWS profile as env variable
+except ImportError:
+    pass
+
+import thiscovery_dev_tools.testing_tools as test_tools
+from thiscovery_dev_tools.template_cache import TemplateCache
+
+TEST_DATA_FOLDER = os.path.join(
+    os.path.dirname(__file__), "../../thiscovery_dev_tools/test_data"
+)
+TEMPLATE_01 = os.path.join(TEST_DATA_FOLDER, "raw_template_01.yaml")
+TEMPLATE_02 = os.path.join(TEST_DATA_FOLDER, "raw_template_02.yaml")
+
+
+class TemplateCacheTestCase(test_tools.BaseTestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.cache = TemplateCache(cache_dir=self.cache_dir.name, max_entries=2)
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def test_hit_after_put(self):
+        components = self.cache.key_components(TEMPLATE_01, "test-env", 0)
+        self.assertIsNone(self.cache.get(components))
+        self.cache.put(components, "parsed template")
+        self.assertEqual("parsed template", self.cache.get(components))
+
+    def test_miss_reasons_are_recorded(self):
+        components = self.cache.key_components(TEMPLATE_01, "test-env", 0)
+        self.cache.get(components)
+        self.cache.put(components, "parsed template")
+        self.cache.get(self.cache.key_components(TEMPLATE_01, "other-env", 1))
+        self.assertEqual(
+            [
+                "cache empty",
+                "changed since last cached template: environment, provisioned_concurrency",
+            ],
+            [x["reason"] for x in TemplateCache(self.cache_dir.name).index["misses"]],
+        )
+
+    def test_least_recently_used_entry_is_evicted(self):
+        components_01 = self.cache.key_components(TEMPLATE_01, "test-env", 0)
+        components_02 = self.cache.key_components(TEMPLATE_02, "test-env", 0)
+        components_03 = self.cache.key_components(TEMPLATE_02, "other-env", 0)
+        self.cache.put(components_01, "template 01")
+        self.cache.put(components_02, "template 02")
+        self.cache.get(components_01)
+        self.cache.put(components_03, "template 03")
+        self.assertEqual("template 01", self.cache.get(components_01))
+        self.assertIsNone(self.cache.get(components_02))
+        self.assertEqual("template 03", self.cache.get(components_03))
+
+    def test_lost_index_is_treated_as_miss(self):
+        components = self.cache.key_components(TEMPLATE_01, "test-env", 0)
+        self.cache.put(components, "parsed template")
+        for corrupt in [False, True]:
+            with self.subTest(corrupt=corrupt):
+                if corrupt:
+                    with open(self.cache.index_path, "w") as f:
+                        f.write("{not json")
+                else:
+                    os.remove(self.cache.index_path)
+                cache = TemplateCache(cache_dir=self.cache_dir.name)
+                self.assertIsNone(cache.get(components))
+                cache.put(components, "rebuilt template")
+                self.assertEqual("rebuilt template", cache.get(components))
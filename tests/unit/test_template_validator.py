@@ -0,0 +1,203 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+try:
+    from local import dev_config  # sets env variable 'TEST_ON_AWS'
+    from local import secrets  # sets AWS profile as env variable
+except ImportError:
+    pass
+
+import thiscovery_dev_tools.aws_deployer as ad
+import thiscovery_dev_tools.testing_tools as test_tools
+import thiscovery_lib.utilities as utils
+from thiscovery_dev_tools.deployment_timings import DeploymentTimings
+from thiscovery_dev_tools.template_pipeline import template_to_dict
+from thiscovery_dev_tools.template_validator import (
+    TemplateValidator,
+    validate_template_body,
+)
+
+TEST_DATA_FOLDER = os.path.join(
+    os.path.dirname(__file__), "../../thiscovery_dev_tools/test_data"
+)
+
+
+def base_template():
+    return {
+        "Transform": "AWS::Serverless-2016-10-31",
+        "Parameters": {"Environment": {"Type": "String"}},
+        "Resources": {
+            "MyFunction": {
+                "Type": "AWS::Serverless::Function",
+                "Properties": {
+                    "FunctionName": {"Fn::Sub": "${AWS::StackName}-${Environment}"},
+                    "Role": {"Fn::GetAtt": ["MyFunctionRole", "Arn"]},
+                },
+            },
+            "MyTable": {"Type": "AWS::DynamoDB::Table", "Properties": dict()},
+        },
+        "Outputs": {"TableName": {"Value": {"Ref": "MyTable"}}},
+    }
+
+
+class TemplateValidatorTestCase(test_tools.BaseTestCase):
+    def validate(self, template):
+        return [str(x) for x in TemplateValidator(template).validate()]
+
+    def test_test_data_templates_are_valid(self):
+        for name in ["raw_template_01.yaml", "raw_template_02.yaml"]:
+            with open(os.path.join(TEST_DATA_FOLDER, name)) as f:
+                template = template_to_dict(f.read())
+            self.assertEqual([], self.validate(template), name)
+
+    def test_valid_template(self):
+        self.assertEqual([], self.validate(base_template()))
+
+    def test_missing_resources(self):
+        self.assertEqual(
+            ["/Resources: template must define at least one resource"],
+            self.validate({"Resources": dict()}),
+        )
+
+    def test_unknown_ref_and_get_att_targets(self):
+        template = base_template()
+        template["Outputs"]["TableName"]["Value"] = {"Ref": "MyTabel"}
+        template["Outputs"]["TableArn"] = {
+            "Value": {"Fn::GetAtt": ["OtherTable", "Arn"]}
+        }
+        self.assertEqual(
+            [
+                "/Outputs/TableName/Value: Ref target MyTabel not found",
+                "/Outputs/TableArn/Value: Fn::GetAtt target OtherTable not found",
+            ],
+            self.validate(template),
+        )
+
+    def test_sub_variables(self):
+        template = base_template()
+        properties = template["Resources"]["MyFunction"]["Properties"]
+        properties["Description"] = {"Fn::Sub": "${!Literal} ${Stage}"}
+        properties["Handler"] = {
+            "Fn::Sub": ["${Stage}", {"Stage": {"Ref": "Environment"}}]
+        }
+        self.assertEqual(
+            [
+                "/Resources/MyFunction/Properties/Description: "
+                "Fn::Sub variable Stage not found"
+            ],
+            self.validate(template),
+        )
+
+    def test_intrinsic_function_shape(self):
+        template = base_template()
+        template["Outputs"]["Joined"] = {"Value": {"Fn::Join": [",", "a", "b"]}}
+        template["Outputs"]["Conditional"] = {"Value": {"Fn::If": ["IsProd", "a", "b"]}}
+        self.assertEqual(
+            [
+                "/Outputs/Joined/Value: Fn::Join takes a list of 2 arguments",
+                "/Outputs/Conditional/Value: condition IsProd not found",
+            ],
+            self.validate(template),
+        )
+
+    def test_resource_structure(self):
+        template = base_template()
+        template["Resources"]["MyTable"]["DependsOn"] = "Missing"
+        template["Resources"]["MyTable"]["Propertes"] = dict()
+        del template["Parameters"]["Environment"]["Type"]
+        self.assertEqual(
+            [
+                "/Parameters/Environment: parameter must declare a Type",
+                "/Resources/MyTable/Propertes: unknown resource attribute",
+                "/Resources/MyTable/DependsOn: DependsOn target Missing not found",
+            ],
+            self.validate(template),
+        )
+
+    def test_sam_generated_depends_on_targets(self):
+        template = base_template()
+        template["Resources"]["MyApi"] = {
+            "Type": "AWS::Serverless::Api",
+            "Properties": {"StageName": "Prod"},
+        }
+        template["Resources"]["MyTable"]["DependsOn"] = [
+            "MyApiProdStage",
+            "MyFunctionRole",
+            "ServerlessRestApi",
+        ]
+        self.assertEqual([], self.validate(template))
+
+    def test_connectors(self):
+        template = base_template()
+        template["Resources"]["MyFunction"]["Connectors"] = {
+            "TableConnector": {
+                "Properties": {
+                    "Destination": {"Id": "MyTable"},
+                    "Permissions": ["Read", "Write"],
+                }
+            }
+        }
+        self.assertEqual([], self.validate(template))
+
+    def test_results_are_cached(self):
+        template_body = (
+            "Resources:\n  MyTable:\n    Type: AWS::DynamoDB::Table\n"
+            "Outputs:\n  Name:\n    Value: !Ref Missing\n"
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_path = os.path.join(tmp, "validation.json")
+            expected = ["/Outputs/Name/Value: Ref target Missing not found"]
+            self.assertEqual(
+                expected, validate_template_body(template_body, cache_path)
+            )
+            self.assertTrue(os.path.exists(cache_path))
+            with open(cache_path) as f:
+                self.assertIn("Missing", f.read())
+            self.assertEqual(
+                expected, validate_template_body(template_body, cache_path)
+            )
+
+
+class AwsDeployerValidationTestCase(test_tools.BaseTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        # AwsDeployer's constructor reads git metadata and creates AWS clients
+        self.deployer = ad.AwsDeployer.__new__(ad.AwsDeployer)
+        self.deployer.stack_name = "thiscovery-crm"
+        self.deployer.logger = utils.get_logger()
+        self.deployer.timings = DeploymentTimings()
+        self.deployer.parsed_template = os.path.join(tmp.name, "template.yaml")
+        with open(self.deployer.parsed_template, "w") as f:
+            f.write(
+                "Resources:\n  MyTable:\n    Type: AWS::DynamoDB::Table\n"
+                "    DependsOn: Missing\n"
+            )
+        # keep cached validation results out of the working directory
+        cache_path = os.path.join(tmp.name, "validation.json")
+        patcher = patch.object(
+            ad,
+            "validate_template_body",
+            side_effect=lambda body: validate_template_body(body, cache_path),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_issues_are_warnings_unless_strict(self):
+        with patch.object(self.deployer.logger, "warning") as mock_warning:
+            self.deployer.validate_template()
+        mock_warning.assert_called_once_with(
+            "Template validation issue: "
+            "/Resources/MyTable/DependsOn: DependsOn target Missing not found"
+        )
+        with self.assertRaises(utils.DetailedValueError):
+            self.deployer.validate_template(strict=True)
+
+    def test_thiscovery_core_is_not_validated(self):
+        def phase_names():
+            return [x.name for x in self.deployer.get_deployment_phases()]
+
+        self.assertIn("validate", phase_names())
+        self.deployer.stack_name = "thiscovery-core"
+        self.assertNotIn("validate", phase_names())
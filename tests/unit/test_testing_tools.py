@@ -35,6 +35,16 @@ class EbRequestTestCase(test_tools.BaseTestCase):
         )
         self.assertEqual(HTTPStatus.OK, result["statusCode"])
 
+    def test_eb_request_v2_direct_invoke_ok(self):
+        result = test_tools.test_eb_request_v2(
+            local_method="Not applicable",
+            aws_eb_event=self.test_event,
+            lambda_name="PersistEvent",
+            stack_name="thiscovery-events",
+            direct_invoke=True,
+        )
+        self.assertEqual(HTTPStatus.OK, result["statusCode"])
+
     def test_eb_request_v2_query_fallback_ok(self):
         """
         This test takes a long time to complete.
@@ -0,0 +1,189 @@
+try:
+    from local import dev_config  # sets env variable 'TEST_ON_AWS'
+    from local import secrets  # sets AWS profile as env variable
+except ImportError:
+    pass
+
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from botocore.exceptions import ClientError
+
+import thiscovery_dev_tools.dynamodb_bulk as bulk
+import thiscovery_dev_tools.testing_tools as test_tools
+import thiscovery_dev_tools.throughput_governor as tg
+from thiscovery_dev_tools import client_registry
+from thiscovery_dev_tools.dynamodb_restore import DynamodbRestore
+from thiscovery_dev_tools.dynamodb_stub import InMemoryDynamodbClient
+
+TABLE = "thiscovery-crm-test-notifications"
+
+
+class FakeClock:
+    """
+    Virtual time shared by all threads; sleeping advances it
+    """
+
+    def __init__(self):
+        self.now = 0
+        self.slept = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            return self.now
+
+    def sleep(self, seconds):
+        with self._lock:
+            self.now += seconds
+            self.slept += seconds
+
+
+def populate(client, table_name, n):
+    for i in range(n):
+        client.put_item(
+            TableName=table_name, Item=bulk.serialize_item({"id": f"id-{i:04}"})
+        )
+
+
+def throttling_error():
+    return ClientError(
+        {"Error": {"Code": "ProvisionedThroughputExceededException"}}, "Scan"
+    )
+
+
+class TokenBucketTestCase(test_tools.BaseTestCase):
+    def test_wait_pays_off_debt(self):
+        clock = FakeClock()
+        bucket = tg.TokenBucket(5, clock=clock, sleep=clock.sleep)
+        bucket.wait()
+        self.assertEqual(0, clock.slept)
+        bucket.consume(15)
+        bucket.wait()
+        self.assertAlmostEqual(2, clock.slept)
+        self.assertAlmostEqual(2, bucket.waited_seconds)
+
+    def test_tokens_do_not_exceed_capacity(self):
+        clock = FakeClock()
+        bucket = tg.TokenBucket(5, capacity=10, clock=clock, sleep=clock.sleep)
+        clock.sleep(60)
+        bucket.consume(12)
+        self.assertAlmostEqual(-2, bucket.tokens)
+
+    def test_debt_is_measured_in_seconds(self):
+        clock = FakeClock()
+        bucket = tg.TokenBucket(5, clock=clock, sleep=clock.sleep)
+        self.assertEqual(0, bucket.debt())
+        bucket.consume(15)
+        self.assertAlmostEqual(2, bucket.debt())
+        clock.sleep(1)
+        self.assertAlmostEqual(1, bucket.debt())
+        clock.sleep(5)
+        self.assertEqual(0, bucket.debt())
+
+
+class ThroughputGovernorTestCase(test_tools.BaseTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.client = InMemoryDynamodbClient(
+            {TABLE: ["id"], "target": ["id"]}, page_size=10
+        )
+        populate(self.client, TABLE, 200)
+
+    def governor(self, **kwargs):
+        return tg.ThroughputGovernor(clock=self.clock, sleep=self.clock.sleep, **kwargs)
+
+    def test_copy_is_kept_within_budget(self):
+        governor = self.governor(read_capacity_units=10, write_capacity_units=20)
+        result = bulk.copy_table(
+            self.client, self.client, TABLE, "target", governor=governor
+        )
+        self.assertEqual(200, len(self.client.items("target")))
+        metrics = result["governor"]
+        self.assertEqual(100, metrics["read"]["consumed_units"])  # 0.5 per item
+        self.assertEqual(200, metrics["write"]["consumed_units"])
+        # reads consumed beyond the initial burst (except for the last page,
+        # whose debt is never waited for) were paid off at the budgeted rate
+        self.assertGreaterEqual(self.clock(), (100 - 10 - 5) / 10)
+
+    def test_throttled_requests_are_retried_at_lower_rate_and_concurrency(self):
+        governor = self.governor(read_capacity_units=100, max_concurrency=8)
+        responses = [throttling_error(), throttling_error(), {"Items": []}]
+
+        def scan(**kwargs):
+            self.assertEqual("TOTAL", kwargs["ReturnConsumedCapacity"])
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        client = governor.wrap(SimpleNamespace(scan=scan))
+        self.assertEqual({"Items": []}, client.scan(TableName=TABLE))
+        self.assertEqual(2, governor.throttles["read"])
+        self.assertEqual(3, governor.requests["read"])
+        self.assertEqual(3, governor.concurrency)  # 8 -> 4 -> 2 -> 3
+        self.assertAlmostEqual(30, governor.buckets["read"].rate)  # 100/4 + 5
+
+    def test_other_errors_are_not_retried(self):
+        governor = self.governor(read_capacity_units=100)
+        error = ClientError({"Error": {"Code": "ResourceNotFoundException"}}, "Scan")
+
+        def scan(**kwargs):
+            raise error
+
+        client = governor.wrap(SimpleNamespace(scan=scan))
+        with self.assertRaises(ClientError):
+            client.scan(TableName=TABLE)
+        self.assertEqual(1, governor.requests["read"])
+
+    def test_unprocessed_items_lower_write_rate(self):
+        governor = self.governor(write_capacity_units=50)
+        self.client.unprocessed_rate = 0.5
+        with patch.object(bulk.time, "sleep"):
+            bulk.reset_table(self.client, TABLE, governor=governor)
+        self.assertEqual([], self.client.items(TABLE))
+        self.assertGreater(governor.throttles["write"], 0)
+        self.assertLess(governor.buckets["write"].rate, 50)
+
+    def test_rate_recovers_towards_budget(self):
+        governor = self.governor(write_capacity_units=100)
+        governor.buckets["write"].set_rate(10)
+        client = governor.wrap(self.client)
+        for _ in range(30):
+            client.batch_write_item(RequestItems={"target": []})
+        self.assertEqual(100, governor.buckets["write"].rate)
+
+    def test_non_data_operations_are_not_governed(self):
+        governor = self.governor(read_capacity_units=1)
+        client = governor.wrap(self.client)
+        client.describe_table(TableName=TABLE)
+        self.assertEqual({"read": 0, "write": 0}, governor.requests)
+
+
+class DynamodbRestoreGovernorTestCase(test_tools.BaseTestCase):
+    def setUp(self):
+        self.client = InMemoryDynamodbClient(page_size=10)
+        patcher = patch.object(client_registry, "get_instance")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_restored_data_is_copied_within_budget(self):
+        clock = FakeClock()
+        governor = tg.ThroughputGovernor(
+            read_capacity_units=5,
+            write_capacity_units=5,
+            clock=clock,
+            sleep=clock.sleep,
+        )
+        restore = DynamodbRestore("thiscovery-core", "lookups", governor=governor)
+        restore.ddb_low_level = SimpleNamespace(client=self.client)
+        self.client.create_table(restore.aws_restored_table, ["id"])
+        self.client.create_table(restore.full_table_name, ["id"])
+        populate(self.client, restore.aws_restored_table, 30)
+        with patch("subprocess.run") as mock_run:
+            result = restore.update_original_table_with_restored_data()
+        mock_run.assert_not_called()
+        self.assertEqual(30, result["items_copied"])
+        self.assertEqual(30, len(self.client.items(restore.full_table_name)))
+        self.assertGreater(clock.slept, 0)
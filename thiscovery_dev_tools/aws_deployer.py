@@ -1,18 +1,45 @@
-import cfn_flip
+import concurrent.futures
+import functools
 import json
 import os
+import shutil
 import subprocess
 import sys
+import threading
 import requests
 import thiscovery_lib.eb_utilities as eb_utils
 import thiscovery_lib.ssm_utilities as ssm_utils
 import thiscovery_lib.utilities as utils
+from botocore.exceptions import ClientError
 
+from thiscovery_dev_tools import build_manifest as bm
+from thiscovery_dev_tools import client_registry
+from thiscovery_dev_tools import cold_start_report as csr
+from thiscovery_dev_tools import git_metadata
 from thiscovery_dev_tools import sentry_integration as si
+from thiscovery_dev_tools import sentry_sampling
 from thiscovery_dev_tools.constants import SENTRY_PYTHON_LAYER, SENTRY_NODE_LAYER
+from thiscovery_dev_tools.template_cache import TemplateCache
+from thiscovery_dev_tools.template_validator import validate_template_body
 from thiscovery_dev_tools.cloudformation_utilities import CloudFormationClient
+from thiscovery_dev_tools.deployment_timings import DeploymentTimings, timed_phase
+from thiscovery_dev_tools.phase_scheduler import Phase, PhaseScheduler
+from thiscovery_dev_tools.revision_resolver import RevisionResolver
+from thiscovery_dev_tools.template_pipeline import (
+    TemplatePipeline,
+    template_to_dict,
+    template_to_yaml,
+)
 from typing import Optional, Union
 
+# set (e.g. by deploy_orchestrator) when deployments run without a terminal,
+# so that deployers fail instead of prompting for confirmation
+NON_INTERACTIVE_ENV_VAR = "THISCOVERY_NON_INTERACTIVE"
+
+
+def running_non_interactively() -> bool:
+    return os.environ.get(NON_INTERACTIVE_ENV_VAR, "").lower() in ["1", "true", "yes"]
+
 
 class AwsDeployer:
     def __init__(
@@ -27,55 +54,49 @@ class AwsDeployer:
             param_overrides: extra parameters to inject at deployment time;
                     used by get_parameter_overrides method
         """
+        self.timings = DeploymentTimings()
         self.stack_name = stack_name
         self.param_overrides = param_overrides
-        self.branch = self.get_git_branch()
-        self.revision = self.get_git_revision()
+        with self.timings.phase("git_metadata"):
+            self.branch = self.get_git_branch()
+            self.revision = self.get_git_revision()
         self.environment = self.get_environment()
         self.sam_template = sam_template_path
         self.parsed_template = os.path.join(".thiscovery", "template.yaml")
         self._template_yaml = self.resolve_environment_name()
         self.logger = utils.get_logger()
-        self.ssm_client = ssm_utils.SsmClient()
-        self.cf_client = CloudFormationClient()
+        self.ssm_client = client_registry.get_instance(ssm_utils.SsmClient)
+        self.cf_client = client_registry.get_instance(CloudFormationClient)
         self.thiscovery_lib_revision = None
+        self._provisioned_concurrency = None
+        self._sentry_sample_rate_overrides = None
 
     @staticmethod
     def get_git_revision():
-        return subprocess.run(
-            ["git", "rev-parse", "HEAD"],
-            capture_output=True,
-            check=True,
-            text=True,
-        ).stdout.strip()
+        return git_metadata.get_repository_metadata().revision
 
     @staticmethod
     def get_git_branch():
-        branch = subprocess.run(
-            ["git", "rev-parse", "--abbrev-ref", "HEAD"],
-            capture_output=True,
-            check=True,
-            text=True,
-        ).stdout.strip()
-        status = subprocess.run(
-            ["git", "status"], capture_output=True, check=True, text=True
-        ).stdout.strip()
-        if not utils.running_unit_tests() and (
-            ("Your branch is ahead" in status)
-            or ("Changes not staged for commit" in status)
-        ):
+        repository = git_metadata.get_repository_metadata()
+        if not utils.running_unit_tests() and repository.out_of_sync:
+            if running_non_interactively():
+                sys.exit(
+                    "Deployment aborted: local branch is out of sync with remote "
+                    "and confirmation cannot be requested in a non-interactive "
+                    "deployment"
+                )
             while True:
                 proceed = input(
                     'It looks like your local branch is out of sync with remote. Continue anyway? [y/N] (or "s" to show "git status")'
                 )
                 if proceed.lower() == "s":
-                    print(status)
+                    print(git_metadata.human_readable_status())
                     print("--------------------------")
                 elif proceed.lower() not in ["y", "yes"]:
                     sys.exit("Deployment aborted")
                 else:
                     break
-        return branch
+        return repository.branch
 
     @staticmethod
     def get_environment():
@@ -88,20 +109,17 @@ class AwsDeployer:
         environment = utils.namespace2name(secrets_namespace)
         return environment
 
+    @timed_phase("resolve_thiscovery_lib_revision")
     def thiscovery_lib_master_revision(self):
-        lib_ls = subprocess.run(
-            [
-                "git",
-                "ls-remote",
-                "https://github.com/THIS-Labs/thiscovery-lib",
-            ],
-            capture_output=True,
-            check=True,
-            text=True,
-        ).stdout.strip()
-        self.thiscovery_lib_revision = lib_ls.split()[0]
+        resolver = RevisionResolver()
+        self.thiscovery_lib_revision = resolver.resolve()
+        self.logger.debug(
+            f"Resolved thiscovery-lib revision from {resolver.source}",
+            extra={"revision": self.thiscovery_lib_revision},
+        )
         return self.thiscovery_lib_revision
 
+    @timed_phase("slack_message")
     def slack_message(self, message=None):
         env_var_name = "SLACK_DEPLOYMENT_NOTIFIER_WEBHOOKS"
         try:
@@ -127,6 +145,7 @@ class AwsDeployer:
             headers=header,
         )
 
+    @timed_phase("confirmation")
     def deployment_confirmation(self):
         proceed = input(
             f"About to deploy branch {self.branch} of {self.stack_name} to {self.environment}. Continue? [y/N]"
@@ -134,35 +153,37 @@ class AwsDeployer:
         if not proceed.lower() in ["y", "yes"]:
             sys.exit("Deployment aborted")
 
-    def build(
-        self, build_in_container: bool, container_env_vars: Optional[dict] = None
-    ):
+    def get_sam_build_command(
+        self,
+        build_in_container: bool,
+        container_env_vars: Optional[dict] = None,
+        resource_id: Optional[str] = None,
+        build_dir: Optional[str] = None,
+        template_path: Optional[str] = None,
+    ) -> list:
         """
-        Calls "sam build"
-        (https://docs.aws.amazon.com/serverless-application-model/latest/developerguide/sam-cli-command-reference-sam-build.html)
         Args:
             build_in_container: invokes sam build with the --use-container option
             container_env_vars: environment variables to pass to the build container
+            resource_id: logical id of single function or layer to build
+            build_dir: build directory to use instead of sam's default (.aws-sam/build)
+            template_path: template to build instead of the parsed template
         """
-
-        def run_build(build_command):
-            subprocess.run(
-                build_command,
-                check=True,
-                stderr=sys.stderr,
-                stdout=sys.stdout,
-            )
-
-        self.logger.info("Starting building phase")
         command = [
             "sam",
             "build",
+        ]
+        if resource_id:
+            command.append(resource_id)
+        command += [
             "--debug",
             "-t",
-            self.parsed_template,
+            template_path or self.parsed_template,
             "--base-dir",
             ".",
         ]
+        if build_dir:
+            command += ["--build-dir", build_dir]
         if build_in_container:
             command.append("--use-container")
             if (
@@ -189,19 +210,279 @@ class AwsDeployer:
         if container_env_vars:
             for k, v in container_env_vars.items():
                 command += ["--container-env-var", f"{k}={v}"]
+        return command
 
+    def run_sam_build(
+        self,
+        build_in_container: bool,
+        container_env_vars: Optional[dict] = None,
+        resource_id: Optional[str] = None,
+        build_dir: Optional[str] = None,
+        capture_output: bool = False,
+        template_path: Optional[str] = None,
+    ) -> None:
+        """
+        Runs sam build, falling back to a build in a Docker container if the
+        standard build strategy fails
+
+        Args:
+            capture_output: buffer sam's output and print it in one block when
+                the build finishes, so that output of concurrent builds is not
+                interleaved
+            template_path: template to build instead of the parsed template
+        """
+        command = self.get_sam_build_command(
+            build_in_container,
+            container_env_vars,
+            resource_id,
+            build_dir,
+            template_path,
+        )
+        label = f"sam build {resource_id or 'all resources'}"
+        if build_in_container:
+            label += " (container)"
         try:
-            run_build(command)
+            with self.timings.subprocess(label):
+                if capture_output:
+                    run_with_buffered_output(command, label=label)
+                else:
+                    subprocess.run(
+                        command,
+                        check=True,
+                        stderr=sys.stderr,
+                        stdout=sys.stdout,
+                    )
         except subprocess.CalledProcessError:
             if not build_in_container:
                 self.logger.warning(
                     "Standard build strategy failed; attempting to build in Docker container"
                 )
-                self.build(build_in_container=True)
+                self.run_sam_build(
+                    build_in_container=True,
+                    resource_id=resource_id,
+                    build_dir=build_dir,
+                    capture_output=capture_output,
+                    template_path=template_path,
+                )
             else:
                 raise
+
+    def build_resource(
+        self,
+        resource_id: str,
+        build_in_container: bool,
+        container_env_vars: Optional[dict] = None,
+        capture_output: bool = False,
+        template_path: Optional[str] = None,
+    ) -> None:
+        """
+        Builds a single function or layer in a staging directory and moves
+        its artifacts to .aws-sam/build
+        """
+        staging_dir = os.path.join(bm.STAGING_DIR, resource_id)
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        self.run_sam_build(
+            build_in_container,
+            container_env_vars,
+            resource_id=resource_id,
+            build_dir=staging_dir,
+            capture_output=capture_output,
+            template_path=template_path,
+        )
+        artifacts_dir = os.path.join(bm.BUILD_DIR, resource_id)
+        shutil.rmtree(artifacts_dir, ignore_errors=True)
+        os.makedirs(bm.BUILD_DIR, exist_ok=True)
+        shutil.move(os.path.join(staging_dir, resource_id), artifacts_dir)
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    def build_resources(
+        self,
+        resource_ids: list,
+        build_in_container: bool,
+        container_env_vars: Optional[dict] = None,
+        workers: int = 1,
+        template_path: Optional[str] = None,
+    ) -> None:
+        """
+        Builds each resource in resource_ids with its own sam build process,
+        running up to "workers" of those processes at the same time. If any
+        build fails, no further builds are started and the error is raised
+        once running builds finish.
+
+        Args:
+            template_path: template to build instead of the parsed template
+        """
+        if not resource_ids:
+            return
+        if workers <= 1:
+            for resource_id in resource_ids:
+                self.build_resource(
+                    resource_id,
+                    build_in_container,
+                    container_env_vars,
+                    template_path=template_path,
+                )
+            return
+        self.logger.info(
+            f"Building {len(resource_ids)} resources using {workers} parallel workers"
+        )
+        failed = threading.Event()
+
+        def build_unless_failed(resource_id):
+            # a worker freed by a failed build may pick up a queued build
+            # before the failure is seen below and pending builds cancelled
+            if failed.is_set():
+                return
+            try:
+                self.build_resource(
+                    resource_id,
+                    build_in_container,
+                    container_env_vars,
+                    True,
+                    template_path,
+                )
+            except Exception:
+                failed.set()
+                raise
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(build_unless_failed, resource_id): resource_id
+                for resource_id in resource_ids
+            }
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    future.result()
+                    self.logger.info(f"Finished building {futures[future]}")
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    def build_per_resource(
+        self,
+        build_in_container: bool,
+        container_env_vars: Optional[dict] = None,
+        incremental: bool = False,
+        workers: int = 1,
+    ) -> list:
+        """
+        Builds functions and layers with one sam build process each, merging
+        their artifacts into the standard .aws-sam/build layout and recording
+        them in .thiscovery/build_manifest.json
+
+        Args:
+            incremental: only rebuild resources whose sources or build-relevant
+                template properties changed since the last recorded build
+            workers: maximum number of concurrent sam build processes
+
+        Returns: logical ids of resources that were built
+        """
+        with open(self.parsed_template) as f:
+            template_dict = template_to_dict(f.read())
+        manifest = bm.BuildManifest()
+        digests = bm.resource_digests(template_dict)
+        settings = bm.build_settings(build_in_container, container_env_vars)
+        if bm.requires_full_build(template_dict):
+            self.logger.info("Template requires a full sam build")
+            self.run_sam_build(build_in_container, container_env_vars)
+            manifest.update(digests, settings)
+            return list(digests.keys())
+
+        changed = manifest.changed_resources(digests, settings) if incremental else None
+        if changed is None or len(changed) == len(digests):
+            changed = list(digests.keys())
+            if workers <= 1:
+                self.logger.info("Building all resources")
+                self.run_sam_build(build_in_container, container_env_vars)
+                manifest.update(digests, settings)
+                return changed
+
+        self.logger.info(
+            f"Building {len(changed)} of {len(digests)} resources",
+            extra={"resources": changed},
+        )
+        # functions are built without their local layers, which are built
+        # (once) by their own sam build processes
+        staging_template = os.path.join(bm.STAGING_DIR, "template.yaml")
+        os.makedirs(bm.STAGING_DIR, exist_ok=True)
+        with open(staging_template, "w") as f:
+            f.write(template_to_yaml(bm.without_local_layers(template_dict)))
+        self.build_resources(
+            changed,
+            build_in_container,
+            container_env_vars,
+            workers,
+            template_path=staging_template,
+        )
+        os.makedirs(bm.BUILD_DIR, exist_ok=True)
+        bm.remove_stale_artifacts(digests.keys())
+        bm.write_build_template(template_dict, built_resource_ids=digests.keys())
+        manifest.update(digests, settings)
+        return changed
+
+    @timed_phase("build")
+    def build(
+        self,
+        build_in_container: bool,
+        container_env_vars: Optional[dict] = None,
+        incremental: bool = False,
+        workers: int = 1,
+        size_budget_mb: Optional[float] = csr.DEFAULT_BUDGET_MB,
+    ):
+        """
+        Calls "sam build"
+        (https://docs.aws.amazon.com/serverless-application-model/latest/developerguide/sam-cli-command-reference-sam-build.html)
+        Args:
+            build_in_container: invokes sam build with the --use-container option
+            container_env_vars: environment variables to pass to the build container
+            incremental: only rebuild functions and layers that changed since
+                the previous build (see build_per_resource)
+            workers: if greater than 1, build functions and layers in up to this
+                many parallel sam build processes
+            size_budget_mb: default maximum total zipped size (function plus
+                layers) of each function; the build fails if a function exceeds
+                its budget. If None (the default), package sizes are only
+                reported
+        """
+        self.logger.info("Starting building phase")
+        if incremental or workers > 1:
+            self.build_per_resource(
+                build_in_container, container_env_vars, incremental, workers
+            )
+        else:
+            self.run_sam_build(build_in_container, container_env_vars)
+        self.cold_start_report(size_budget_mb)
         self.logger.info("Finished building phase")
 
+    def cold_start_report(
+        self, size_budget_mb: Optional[float] = csr.DEFAULT_BUDGET_MB
+    ) -> csr.ColdStartReport:
+        """
+        Prints package sizes of built functions and saves them to
+        .thiscovery/cold_start_report.json (see cold_start_report)
+
+        Args:
+            size_budget_mb: default size budget of each function; if None,
+                package sizes are reported but no budget is enforced
+
+        Raises:
+            SizeBudgetExceededError: if a function exceeds its size budget
+        """
+        built_template = os.path.join(bm.BUILD_DIR, "template.yaml")
+        if not os.path.exists(built_template):
+            built_template = self.parsed_template
+        with open(built_template) as f:
+            template_dict = template_to_dict(f.read())
+        with self.timings.phase("cold_start_report"):
+            report = csr.ColdStartReport(template_dict, budget_mb=size_budget_mb)
+            print(report.table())
+            report_path = report.write()
+        self.logger.info(f"Cold start report saved to {report_path}")
+        if size_budget_mb is not None:
+            report.check_budget()
+        return report
+
     def get_parameter_overrides(self):
         parameters = {
             "StackTagName": self.stack_name,
@@ -214,6 +495,7 @@ class AwsDeployer:
             param_overrides_str += f"ParameterKey={k},ParameterValue={v} "
         return f'"{param_overrides_str.strip()}"'
 
+    @timed_phase("deploy")
     def deploy(self, confirm_cf_changeset, iam_capability_type="CAPABILITY_IAM"):
         self.logger.info("Starting deployment phase")
         deployment_method = os.environ.get("DEPLOYMENT_METHOD")
@@ -262,12 +544,13 @@ class AwsDeployer:
         if confirm_cf_changeset:
             command.append("--confirm-changeset")
         print("command:", command)
-        subprocess.run(
-            command,
-            check=True,
-            stdout=sys.stdout,
-            stderr=sys.stderr,
-        )
+        with self.timings.subprocess("sam deploy"):
+            subprocess.run(
+                command,
+                check=True,
+                stdout=sys.stdout,
+                stderr=sys.stderr,
+            )
         self.logger.info("Finished deployment phase")
 
     def resolve_environment_name(self) -> str:
@@ -278,40 +561,126 @@ class AwsDeployer:
             )
         return self._template_yaml
 
+    def get_provisioned_concurrency(self):
+        if self._provisioned_concurrency is None:
+            self._provisioned_concurrency = self.ssm_client.get_parameter(
+                "lambda/provisioned-concurrency"
+            )
+        return self._provisioned_concurrency
+
+    def provisioned_concurrency_enabled(self) -> bool:
+        return bool(self.get_provisioned_concurrency())
+
     def parse_provisioned_concurrency_setting(self):
         """
         Strips ProvisionedConcurrencyConfig from template globals and resources if
         environment's provisioned-concurrency in AWS parameter store is set to zero
         (eval to False).
         """
-        if not self.ssm_client.get_parameter("lambda/provisioned-concurrency"):
+        if not self.provisioned_concurrency_enabled():
             template_dict = template_to_dict(self._template_yaml)
-            try:
-                del template_dict["Globals"]["Function"]["ProvisionedConcurrencyConfig"]
-            except KeyError:
-                pass
-            for _, v in template_dict["Resources"].items():
-                try:
-                    del v["Properties"]["ProvisionedConcurrencyConfig"]
-                except KeyError:
-                    pass
+            strip_provisioned_concurrency(template_dict)
             self._template_yaml = template_to_yaml(template_dict)
         return self._template_yaml
 
-    def parse_sam_template(self):
-        self.logger.info("Starting template parsing phase")
-        self.parse_provisioned_concurrency_setting()
+    def get_sentry_sample_rate_overrides(self) -> dict:
+        """
+        Returns: Sentry traces sample rates stored in parameter store, keyed by
+            function logical id or "*" (see sentry_sampling); empty if the
+            parameter is not set for this environment
+        """
+        if self._sentry_sample_rate_overrides is None:
+            try:
+                overrides = self.ssm_client.get_parameter(
+                    sentry_sampling.SSM_OVERRIDES_PARAMETER
+                )
+            except ClientError as err:
+                if err.response["Error"]["Code"] != "ParameterNotFound":
+                    raise
+                overrides = dict()
+            if isinstance(overrides, str):
+                overrides = json.loads(overrides)
+            self._sentry_sample_rate_overrides = overrides or dict()
+        return self._sentry_sample_rate_overrides
+
+    def add_sentry_tracing(self, template_dict: dict) -> dict:
         sentry_integration = si.SentryIntegration(
-            template_as_string=self._template_yaml, environment=self.environment
+            template_as_dict=template_dict,
+            environment=self.environment,
+            sample_rate_overrides=self.get_sentry_sample_rate_overrides(),
         )
-        sentry_integration.main()
+        sentry_integration.trace_lambdas()
+        return sentry_integration.t_dict
+
+    def get_template_transforms(self) -> list:
+        """
+        Returns: ordered list of (name, function) pairs applied to the SAM
+            template by parse_sam_template
+        """
+        transforms = list()
+        if not self.provisioned_concurrency_enabled():
+            transforms.append(
+                ("strip_provisioned_concurrency", strip_provisioned_concurrency)
+            )
+        transforms.append(("sentry_tracing", self.add_sentry_tracing))
+        return transforms
+
+    @timed_phase("parse")
+    def parse_sam_template(self, use_cache: bool = True):
+        """
+        Args:
+            use_cache: if True, reuse a previously parsed template when none of
+                its inputs changed (see template_cache.TemplateCache)
+        """
+        self.logger.info("Starting template parsing phase")
+        if use_cache:
+            cache = TemplateCache()
+            cache_components = cache.key_components(
+                source_template_path=self.sam_template,
+                environment=self.environment,
+                provisioned_concurrency=self.get_provisioned_concurrency(),
+                sentry_sample_rate_overrides=self.get_sentry_sample_rate_overrides(),
+            )
+            cached_template = cache.get(cache_components)
+            if cached_template is not None:
+                os.makedirs(os.path.dirname(self.parsed_template), exist_ok=True)
+                with open(self.parsed_template, "w") as f:
+                    f.write(cached_template)
+                self.logger.info("Ended template parsing phase (cached template used)")
+                return
+        pipeline = TemplatePipeline(
+            self._template_yaml, transforms=self.get_template_transforms()
+        )
+        pipeline.run()
+        template_yaml = pipeline.output(self.parsed_template)
+        self.timings.record_detail("template_pipeline", pipeline.timings)
+        if use_cache:
+            cache.put(cache_components, template_yaml)
         self.logger.info("Ended template parsing phase")
 
-    def validate_template(self):
+    @timed_phase("validate")
+    def validate_template(self, remote: bool = False, strict: bool = False):
+        """
+        Validates parsed template offline (see template_validator)
+
+        Args:
+            remote: also validate template using the CloudFormation API
+            strict: raise an error if offline validation finds issues; by
+                default, issues are only logged as warnings
+        """
         with open(self.parsed_template) as f:
             template_body = f.read()
+        issues = validate_template_body(template_body)
+        if issues and strict:
+            raise utils.DetailedValueError(
+                f"Template {self.parsed_template} is not valid", {"issues": issues}
+            )
+        for issue in issues:
+            self.logger.warning(f"Template validation issue: {issue}")
+        if remote:
             self.cf_client.validate_template(TemplateBody=template_body)
 
+    @timed_phase("log_deployment")
     def log_deployment(self):
         """
         Posts deployment event to bus. A lambda in thiscovery-devops is
@@ -332,6 +701,7 @@ class AwsDeployer:
                 "sentry_python_layer_version": self.sentry_python_layer_number,
                 "sentry_node_layer_version": self.sentry_node_layer_number,
                 "thiscovery_lib_revision": self.thiscovery_lib_revision,
+                "timings": self.timings.summary(),
             },
         }
         deployment = eb_utils.ThiscoveryEvent(deployment_dict)
@@ -339,39 +709,170 @@ class AwsDeployer:
         self.logger.info("Finished posting deployment event")
         return response
 
+    def write_performance_report(self) -> str:
+        """
+        Writes timings of all phases run so far to .thiscovery/deploy_performance.json
+        """
+        report_path = self.timings.write_report(
+            extra={
+                "stack": self.stack_name,
+                "environment": self.environment,
+                "revision": self.revision,
+                "branch": self.branch,
+            }
+        )
+        self.logger.info(
+            f"Deployment performance report saved to {report_path}",
+            extra={"phases": self.timings.summary()["phases"]},
+        )
+        return report_path
+
+    def get_deployment_phases(self, **kwargs) -> list:
+        """
+        Describes the deployment as a DAG of phases. Template validation runs
+        alongside the build; the deployment event and Slack notification are
+        sent concurrently once the stack is deployed.
+
+        Args:
+            **kwargs: see main
+        """
+        phases = list()
+        confirmation = list()
+        if not kwargs.get("skip_confirmation", False):
+            phases.append(Phase("confirmation", self.deployment_confirmation))
+            confirmation = ["confirmation"]
+        build_phases = list()
+        if not kwargs.get("skip_build", False):
+            phases.append(
+                Phase("parse", self.parse_sam_template, depends_on=confirmation)
+            )
+            # validation has always been skipped for thiscovery-core
+            if self.stack_name != "thiscovery-core":
+                phases.append(
+                    Phase(
+                        "validate",
+                        functools.partial(
+                            self.validate_template,
+                            kwargs.get("remote_validation", False),
+                            kwargs.get("strict_validation", False),
+                        ),
+                        depends_on=["parse"],
+                    )
+                )
+                build_phases.append("validate")
+            phases.append(
+                Phase(
+                    "build",
+                    functools.partial(
+                        self.build,
+                        kwargs.get("build_in_container", False),
+                        kwargs.get("container_env_var"),
+                        incremental=kwargs.get("incremental_build", False),
+                        workers=kwargs.get("build_workers", 1),
+                        size_budget_mb=kwargs.get(
+                            "size_budget_mb", csr.DEFAULT_BUDGET_MB
+                        ),
+                    ),
+                    depends_on=["parse"],
+                )
+            )
+            build_phases.append("build")
+        phases.append(
+            Phase(
+                "deploy",
+                functools.partial(
+                    self.deploy,
+                    kwargs.get("confirm_cf_changes", False),
+                    kwargs.get("iam_capability_type", "CAPABILITY_IAM"),
+                ),
+                depends_on=confirmation + build_phases,
+            )
+        )
+        phases.append(
+            # not retried: posting the deployment event is not idempotent and
+            # an attempt that timed out may still complete
+            Phase(
+                "log_deployment",
+                self.log_deployment,
+                depends_on=["deploy"],
+                timeout=120,
+            )
+        )
+        if not kwargs.get("skip_slack_notification", False):
+            phases.append(
+                Phase(
+                    "slack_message",
+                    self.slack_message,
+                    depends_on=["deploy"],
+                    timeout=30,
+                    retries=2,
+                    retry_delay=5,
+                )
+            )
+        return phases
+
     def main(self, **kwargs):
         """
         Args:
             **kwargs: confirm_cf_changeset (bool): confirm changes before deployment
                       build_in_container (bool): build in a Docker container
                       container_env_var (dict): environment variables to pass to the Docker container
+                      incremental_build (bool): only rebuild functions that changed
+                      build_workers (int): number of parallel sam build processes
+                      size_budget_mb (float): default package size budget of each function
+                      remote_validation (bool): also validate template using the CloudFormation API
+                      strict_validation (bool): fail if offline template validation finds issues
                       skip_build (bool): skip building phase
                       skip_confirmation (bool): skip deployment confirmation
                       skip_slack_notification (bool): skip slack notification
         Returns:
 
         """
-        if not kwargs.get("skip_confirmation", False):
-            self.deployment_confirmation()
-        if not kwargs.get("skip_build", False):
-            self.parse_sam_template()
-            if self.stack_name != "thiscovery-core":
-                self.validate_template()
-            self.build(
-                kwargs.get("build_in_container", False), kwargs.get("container_env_var")
-            )
-        self.deploy(
-            kwargs.get("confirm_cf_changes", False),
-            kwargs.get("iam_capability_type", "CAPABILITY_IAM"),
-        )
-        self.log_deployment()
-        if not kwargs.get("skip_slack_notification", False):
-            self.slack_message()
+        scheduler = PhaseScheduler(self.get_deployment_phases(**kwargs))
+        try:
+            scheduler.run()
+        finally:
+            self.write_performance_report()
 
 
-def template_to_dict(template_as_string):
-    return json.loads(cfn_flip.to_json(template_as_string))
+def run_with_buffered_output(command: list, label: str, **kwargs) -> str:
+    """
+    Runs command, printing its combined stdout and stderr in one block once
+    it finishes (whether it succeeds or fails)
 
+    Args:
+        **kwargs: passed on to subprocess.run (e.g. cwd)
+    """
+    output = None
+    try:
+        output = subprocess.run(
+            command,
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            **kwargs,
+        ).stdout
+    except subprocess.CalledProcessError as err:
+        output = err.output
+        raise
+    finally:
+        if output:
+            print(f"---------- {label} ----------\n{output}", flush=True)
+    return output
 
-def template_to_yaml(template_dict):
-    return cfn_flip.to_yaml(json.dumps(template_dict))
+
+def strip_provisioned_concurrency(template_dict: dict) -> dict:
+    """
+    Removes ProvisionedConcurrencyConfig from template globals and resources
+    """
+    try:
+        del template_dict["Globals"]["Function"]["ProvisionedConcurrencyConfig"]
+    except KeyError:
+        pass
+    for _, v in template_dict["Resources"].items():
+        try:
+            del v["Properties"]["ProvisionedConcurrencyConfig"]
+        except KeyError:
+            pass
+    return template_dict
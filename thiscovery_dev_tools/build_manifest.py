@@ -0,0 +1,336 @@
+"""
+Build manifest supporting incremental "sam build" runs.
+
+The manifest stores a digest of the sources and build-relevant template
+properties of every function and layer that "sam build" builds from local
+code. Resources whose digest did not change since the last build reuse their
+artifacts in .aws-sam/build; only the others are rebuilt.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import shutil
+from typing import Dict, Iterable, Optional
+
+from thiscovery_dev_tools.template_pipeline import template_to_yaml
+
+BUILD_DIR = os.path.join(".aws-sam", "build")
+# per-resource builds are run in subdirectories of this directory
+STAGING_DIR = os.path.join(".thiscovery", "build-staging")
+DEFAULT_MANIFEST_PATH = os.path.join(".thiscovery", "build_manifest.json")
+MANIFEST_VERSION = 1
+
+IGNORED_DIR_NAMES = {
+    "__pycache__",
+    ".pytest_cache",
+    ".mypy_cache",
+    ".git",
+    ".aws-sam",
+    ".thiscovery",
+}
+IGNORED_FILE_SUFFIXES = (".pyc", ".pyo")
+
+# function/layer properties that affect build artifacts
+BUILD_RELEVANT_PROPERTIES = [
+    "Architectures",
+    "CodeUri",
+    "CompatibleArchitectures",
+    "CompatibleRuntimes",
+    "ContentUri",
+    "PackageType",
+    "Runtime",
+]
+
+# properties holding local paths; sam build rewrites these relative to the
+# build directory, so we have to do the same when generating the build template
+PATH_PROPERTIES = {
+    "AWS::Serverless::Function": ["CodeUri"],
+    "AWS::Serverless::LayerVersion": ["ContentUri"],
+    "AWS::Serverless::Api": ["DefinitionUri"],
+    "AWS::Serverless::HttpApi": ["DefinitionUri"],
+    "AWS::Serverless::StateMachine": ["DefinitionUri"],
+    "AWS::Serverless::Application": ["Location"],
+    "AWS::Lambda::Function": ["Code"],
+    "AWS::Lambda::LayerVersion": ["Content"],
+    "AWS::CloudFormation::Stack": ["TemplateURL"],
+}
+
+
+def tree_digest(path: str) -> str:
+    """
+    Digest of the relative paths and contents of all files under path
+    (or of path itself if it is a file)
+    """
+    h = hashlib.sha256()
+
+    def update_with_file(file_path, rel_path):
+        h.update(rel_path.encode())
+        h.update(b"\0")
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        h.update(b"\0")
+
+    if os.path.isfile(path):
+        update_with_file(path, os.path.basename(path))
+        return h.hexdigest()
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d not in IGNORED_DIR_NAMES)
+        for name in sorted(files):
+            if name.endswith(IGNORED_FILE_SUFFIXES):
+                continue
+            file_path = os.path.join(root, name)
+            update_with_file(file_path, os.path.relpath(file_path, path))
+    return h.hexdigest()
+
+
+def buildable_resources(template_dict: dict) -> Dict[str, dict]:
+    """
+    Returns: build-relevant properties of every function and layer that sam
+        build builds from local sources, keyed by resource logical id
+    """
+    globals_function = template_dict.get("Globals", {}).get("Function", {})
+    resources = dict()
+    for logical_id, resource in template_dict.get("Resources", {}).items():
+        resource_type = resource.get("Type")
+        resource_properties = resource.get("Properties") or dict()
+        if resource_type == "AWS::Serverless::Function":
+            if "InlineCode" in resource_properties:
+                continue
+            properties = {
+                k: v
+                for k, v in {**globals_function, **resource_properties}.items()
+                if k in BUILD_RELEVANT_PROPERTIES
+            }
+            properties.setdefault("PackageType", "Zip")
+            if properties["PackageType"] == "Zip" and not isinstance(
+                properties.get("CodeUri"), str
+            ):
+                continue
+        elif resource_type == "AWS::Serverless::LayerVersion":
+            if not resource.get("Metadata", dict()).get("BuildMethod"):
+                continue
+            properties = {
+                k: v
+                for k, v in resource_properties.items()
+                if k in BUILD_RELEVANT_PROPERTIES
+            }
+            if not isinstance(properties.get("ContentUri"), str):
+                continue
+        else:
+            continue
+        properties["Type"] = resource_type
+        properties["Metadata"] = resource.get("Metadata", dict())
+        resources[logical_id] = properties
+    return resources
+
+
+def resource_source_path(properties: dict, base_dir: str = ".") -> Optional[str]:
+    if properties.get("PackageType") == "Image":
+        docker_context = properties["Metadata"].get("DockerContext")
+        return os.path.join(base_dir, docker_context) if docker_context else None
+    source = properties.get("CodeUri", properties.get("ContentUri"))
+    return os.path.join(base_dir, source)
+
+
+def resource_digests(template_dict: dict, base_dir: str = ".") -> Dict[str, str]:
+    digests = dict()
+    for logical_id, properties in buildable_resources(template_dict).items():
+        h = hashlib.sha256(json.dumps(properties, sort_keys=True).encode())
+        source_path = resource_source_path(properties, base_dir)
+        if source_path and os.path.exists(source_path):
+            h.update(tree_digest(source_path).encode())
+        digests[logical_id] = h.hexdigest()
+    return digests
+
+
+def build_settings(
+    build_in_container: bool, container_env_vars: Optional[dict] = None
+) -> dict:
+    """
+    Build options that affect all artifacts. Container environment variables
+    are hashed so that secrets are not written to the manifest.
+    """
+    env_vars_digest = hashlib.sha256(
+        json.dumps(container_env_vars or dict(), sort_keys=True).encode()
+    ).hexdigest()
+    return {
+        "build_in_container": build_in_container,
+        "container_env_vars": env_vars_digest,
+    }
+
+
+def requires_full_build(template_dict: dict, base_dir: str = ".") -> bool:
+    """
+    Image functions and nested stacks with local templates are built by sam
+    in ways we do not attempt to reproduce incrementally
+    """
+    if any(
+        p.get("PackageType") == "Image"
+        for p in buildable_resources(template_dict).values()
+    ):
+        return True
+    for resource in template_dict.get("Resources", {}).values():
+        if resource.get("Type") in [
+            "AWS::Serverless::Application",
+            "AWS::CloudFormation::Stack",
+        ]:
+            for property_name in PATH_PROPERTIES[resource["Type"]]:
+                value = (resource.get("Properties") or dict()).get(property_name)
+                if _is_local_path(value, base_dir):
+                    return True
+    return False
+
+
+class BuildManifest:
+    def __init__(self, path: str = DEFAULT_MANIFEST_PATH, build_dir: str = BUILD_DIR):
+        self.path = path
+        self.build_dir = build_dir
+        self.data = self._load()
+
+    def _load(self) -> Optional[dict]:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            return None
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+        return data
+
+    def changed_resources(self, digests: dict, settings: dict) -> Optional[list]:
+        """
+        Returns: logical ids of resources that need rebuilding, or None if the
+            manifest cannot be used and a full build is required
+        """
+        if (
+            self.data is None
+            or self.data["build_settings"] != settings
+            or not os.path.isfile(os.path.join(self.build_dir, "template.yaml"))
+        ):
+            return None
+        previous_digests = self.data["resources"]
+        return [
+            logical_id
+            for logical_id, digest in digests.items()
+            if previous_digests.get(logical_id) != digest
+            or not os.path.isdir(os.path.join(self.build_dir, logical_id))
+        ]
+
+    def update(self, digests: dict, settings: dict) -> None:
+        self.data = {
+            "version": MANIFEST_VERSION,
+            "build_settings": settings,
+            "resources": digests,
+        }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump(self.data, f, indent=2, sort_keys=True)
+
+
+def _is_local_path(value, base_dir: str) -> bool:
+    return (
+        isinstance(value, str)
+        and not value.startswith(("s3://", "http://", "https://"))
+        and os.path.exists(os.path.join(base_dir, value))
+    )
+
+
+def without_local_layers(template_dict: dict) -> dict:
+    """
+    Returns: copy of template_dict in which functions do not reference layers
+        built from local sources. "sam build <FunctionId>" also builds the
+        layers of the function, but per-resource builds build each layer once,
+        on its own.
+    """
+    layer_ids = {
+        logical_id
+        for logical_id, properties in buildable_resources(template_dict).items()
+        if properties["Type"] == "AWS::Serverless::LayerVersion"
+    }
+    template = copy.deepcopy(template_dict)
+
+    def remove_layers(properties: dict) -> None:
+        layers = properties.get("Layers")
+        if not isinstance(layers, list):
+            return
+        layers = [
+            x for x in layers if not (isinstance(x, dict) and x.get("Ref") in layer_ids)
+        ]
+        if layers:
+            properties["Layers"] = layers
+        else:
+            del properties["Layers"]
+
+    remove_layers(template.get("Globals", {}).get("Function", {}))
+    for resource in template.get("Resources", {}).values():
+        if resource.get("Type") == "AWS::Serverless::Function":
+            remove_layers(resource.get("Properties") or dict())
+    return template
+
+
+def write_build_template(
+    template_dict: dict,
+    built_resource_ids: Iterable[str],
+    build_dir: str = BUILD_DIR,
+    base_dir: str = ".",
+) -> str:
+    """
+    Writes the template sam deploy/package pick up from the build directory,
+    pointing built resources at their artifacts and rewriting other local
+    paths relative to the build directory (as sam build does).
+
+    Returns: path of build template
+    """
+    built_resource_ids = set(built_resource_ids)
+    template = copy.deepcopy(template_dict)
+
+    def relative_to_build_dir(value):
+        if _is_local_path(value, base_dir):
+            return os.path.relpath(os.path.join(base_dir, value), build_dir)
+        return value
+
+    globals_function = template.get("Globals", {}).get("Function", {})
+    if "CodeUri" in globals_function:
+        globals_function["CodeUri"] = relative_to_build_dir(globals_function["CodeUri"])
+    for logical_id, resource in template.get("Resources", {}).items():
+        resource_type = resource.get("Type")
+        properties = resource.get("Properties")
+        if properties is None:
+            continue
+        if logical_id in built_resource_ids:
+            if resource_type == "AWS::Serverless::LayerVersion":
+                properties["ContentUri"] = logical_id
+            else:
+                properties["CodeUri"] = logical_id
+            continue
+        for property_name in PATH_PROPERTIES.get(resource_type, list()):
+            if property_name in properties:
+                properties[property_name] = relative_to_build_dir(
+                    properties[property_name]
+                )
+
+    template_path = os.path.join(build_dir, "template.yaml")
+    with open(template_path, "w") as f:
+        f.write(template_to_yaml(template))
+    return template_path
+
+
+def remove_stale_artifacts(
+    resource_ids: Iterable[str], build_dir: str = BUILD_DIR
+) -> list:
+    """
+    Deletes artifact directories of resources no longer in the template
+
+    Returns: names of deleted directories
+    """
+    resource_ids = set(resource_ids)
+    removed = list()
+    for name in os.listdir(build_dir):
+        path = os.path.join(build_dir, name)
+        if os.path.isdir(path) and name not in resource_ids:
+            shutil.rmtree(path)
+            removed.append(name)
+    return removed
@@ -0,0 +1,118 @@
+"""
+Process-wide registry of AWS clients.
+
+Creating boto3 sessions and clients is comparatively slow, so tests and
+tooling should get clients from this registry instead of creating their own.
+Clients are created on first use and shared thereafter; boto3 clients are
+thread safe, and creation itself is serialised (boto3 sessions are not
+thread safe).
+
+Two kinds of clients are supported:
+    - boto3 clients, keyed by (service, profile, region): get_client
+    - thiscovery_lib client wrappers (e.g. Dynamodb, SsmClient), keyed by
+      class and constructor arguments: get_instance
+"""
+
+import threading
+import boto3
+import thiscovery_lib.utilities as utils
+from typing import Any, Optional
+
+
+class ClientRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = dict()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key: tuple, factory) -> Any:
+        client = self._clients.get(key)
+        if client is not None:
+            with self._lock:
+                self.hits += 1
+            return client
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                self.misses += 1
+                client = factory()
+                self._clients[key] = client
+            else:
+                self.hits += 1
+            return client
+
+    def get_client(
+        self,
+        service_name: str,
+        profile_name: Optional[str] = None,
+        region_name: Optional[str] = None,
+    ):
+        """
+        Returns: boto3 client for service_name
+        """
+
+        def factory():
+            if region_name is None:
+                return utils.BaseClient(
+                    service_name=service_name, profile_name=profile_name
+                ).client
+            return boto3.Session(profile_name=profile_name).client(
+                service_name, region_name=region_name
+            )
+
+        return self._get(("client", service_name, profile_name, region_name), factory)
+
+    def get_instance(self, client_class, *args, **kwargs):
+        """
+        Returns: shared instance of client_class(*args, **kwargs), e.g.
+            get_instance(Dynamodb, stack_name="thiscovery-core")
+        """
+        key = (
+            "instance",
+            f"{client_class.__module__}.{client_class.__qualname__}",
+            args,
+            tuple(sorted(kwargs.items())),
+        )
+        return self._get(key, lambda: client_class(*args, **kwargs))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "clients": len(self._clients),
+            }
+
+    def reset(self) -> None:
+        """
+        Discards all clients and statistics (e.g. between tests that patch
+        client classes)
+        """
+        with self._lock:
+            self._clients.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+registry = ClientRegistry()
+
+
+def get_client(
+    service_name: str,
+    profile_name: Optional[str] = None,
+    region_name: Optional[str] = None,
+):
+    return registry.get_client(service_name, profile_name, region_name)
+
+
+def get_instance(client_class, *args, **kwargs):
+    return registry.get_instance(client_class, *args, **kwargs)
+
+
+def stats() -> dict:
+    return registry.stats()
+
+
+def reset() -> None:
+    registry.reset()
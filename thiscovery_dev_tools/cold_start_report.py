@@ -0,0 +1,332 @@
+"""
+Package size report for the functions of a built SAM template.
+
+Deployment package size (including layers, such as the Sentry layer added
+by SentryIntegration) is the main driver of lambda cold start time that we
+control. After a build, this module reports for each function its runtime,
+the unzipped and zipped size of its artifacts in .aws-sam/build and the
+layers attached to it. If a budget is given, functions whose total zipped
+size (function plus layers) exceeds it are flagged; by default, sizes are
+only reported (AWS itself only limits the unzipped size of packages deployed
+from S3, to 250 MB).
+
+Sizes of published layers are fetched from the Lambda API and cached in
+.thiscovery/cache/layer_sizes.json (layer versions are immutable, so cached
+sizes never expire). Zipped sizes of build artifacts are cached in
+.thiscovery/cache/zipped_sizes.json, keyed by the names, sizes and
+modification times of their files, so that artifacts reused by incremental
+builds are not compressed again.
+"""
+
+import hashlib
+import json
+import os
+import zipfile
+import thiscovery_lib.utilities as utils
+from prettytable import PrettyTable
+from typing import List, Optional
+
+from thiscovery_dev_tools import client_registry
+from thiscovery_dev_tools.build_manifest import BUILD_DIR, IGNORED_DIR_NAMES
+
+DEFAULT_REPORT_PATH = os.path.join(".thiscovery", "cold_start_report.json")
+DEFAULT_LAYER_SIZE_CACHE_PATH = os.path.join(".thiscovery", "cache", "layer_sizes.json")
+DEFAULT_ZIPPED_SIZE_CACHE_PATH = os.path.join(
+    ".thiscovery", "cache", "zipped_sizes.json"
+)
+# total zipped size (function plus layers) allowed for each function, unless
+# set per function with Metadata: {SizeBudgetMB: ...}; None only reports sizes
+DEFAULT_BUDGET_MB = None
+BUDGET_METADATA_KEY = "SizeBudgetMB"
+MB = 1024 * 1024
+
+
+class SizeBudgetExceededError(utils.DetailedValueError):
+    pass
+
+
+class _ByteCounter:
+    """
+    Write-only stream that counts the bytes written to it
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def write(self, data) -> int:
+        self.count += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def _walk_files(path: str):
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d not in IGNORED_DIR_NAMES)
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            yield file_path, os.path.relpath(file_path, path)
+
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(f) for f, _ in _walk_files(path))
+
+
+def zipped_size(path: str) -> int:
+    """
+    Returns: size in bytes of a zip archive of the contents of path (as
+        created by sam package), without writing the archive to disk
+    """
+    counter = _ByteCounter()
+    with zipfile.ZipFile(counter, "w", zipfile.ZIP_DEFLATED) as archive:
+        for file_path, rel_path in _walk_files(path):
+            archive.write(file_path, rel_path)
+    return counter.count
+
+
+def _tree_signature(path: str) -> str:
+    """
+    Returns: digest of the names, sizes and modification times of the files
+        in path (cheap to compute, unlike a digest of their contents)
+    """
+    digest = hashlib.sha256()
+    for file_path, rel_path in _walk_files(path):
+        stat = os.stat(file_path)
+        digest.update(f"{rel_path}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def _mb(size: Optional[int]) -> str:
+    return "?" if size is None else f"{size / MB:.2f}"
+
+
+class LayerSizeCache:
+    def __init__(self, path: str = DEFAULT_LAYER_SIZE_CACHE_PATH, lambda_client=None):
+        """
+        Args:
+            path: path of json file where layer sizes are cached
+            lambda_client: boto3 lambda client; created when first needed
+        """
+        self.path = path
+        self._lambda_client = lambda_client
+        self.logger = utils.get_logger()
+        try:
+            with open(path) as f:
+                self.sizes = json.load(f)
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            self.sizes = dict()
+
+    @property
+    def lambda_client(self):
+        if self._lambda_client is None:
+            self._lambda_client = client_registry.get_client("lambda")
+        return self._lambda_client
+
+    def get(self, layer_arn: str) -> Optional[int]:
+        """
+        Returns: zipped size in bytes of layer version, or None if it could
+            not be fetched
+        """
+        if layer_arn not in self.sizes:
+            try:
+                response = self.lambda_client.get_layer_version_by_arn(Arn=layer_arn)
+            except Exception as err:
+                self.logger.warning(
+                    f"Could not fetch size of layer {layer_arn}",
+                    extra={"error": repr(err)},
+                )
+                return None
+            self.sizes[layer_arn] = response["Content"]["CodeSize"]
+            self._save()
+        return self.sizes[layer_arn]
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump(self.sizes, f, indent=2)
+
+
+class ZippedSizeCache:
+    def __init__(self, path: str = DEFAULT_ZIPPED_SIZE_CACHE_PATH):
+        """
+        Args:
+            path: path of json file where zipped sizes are cached
+        """
+        self.path = path
+        try:
+            with open(path) as f:
+                self.sizes = json.load(f)
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            self.sizes = dict()
+
+    def get(self, path: str) -> int:
+        """
+        Returns: zipped size in bytes of the contents of path, computed only
+            if its files changed since it was last computed
+        """
+        signature = _tree_signature(path)
+        cached = self.sizes.get(path)
+        if cached is None or cached["signature"] != signature:
+            cached = {"signature": signature, "size": zipped_size(path)}
+            self.sizes[path] = cached
+            self._save()
+        return cached["size"]
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump(self.sizes, f, indent=2)
+
+
+class ColdStartReport:
+    def __init__(
+        self,
+        template_dict: dict,
+        build_dir: str = BUILD_DIR,
+        budget_mb: Optional[float] = DEFAULT_BUDGET_MB,
+        layer_sizes: Optional[LayerSizeCache] = None,
+        zipped_sizes: Optional[ZippedSizeCache] = None,
+    ):
+        """
+        Args:
+            template_dict: built SAM template
+            build_dir: directory containing build artifacts of each function
+                and layer (in subdirectories named after their logical ids)
+            budget_mb: default maximum total zipped size of each function;
+                None to only flag functions with a budget in their Metadata
+            layer_sizes: source of sizes of published layers
+            zipped_sizes: source of zipped sizes of build artifacts
+        """
+        self.template = template_dict
+        self.build_dir = build_dir
+        self.budget_mb = budget_mb
+        self.layer_sizes = layer_sizes or LayerSizeCache()
+        self.zipped_sizes = zipped_sizes or ZippedSizeCache()
+        self._local_sizes = dict()
+        self._rows = None
+
+    def _artifact_sizes(self, logical_id: str):
+        """
+        Returns: (unzipped, zipped) size of artifacts of logical_id, or
+            (None, None) if there are no artifacts (e.g. inline code)
+        """
+        if logical_id not in self._local_sizes:
+            path = os.path.join(self.build_dir, logical_id)
+            if os.path.isdir(path):
+                self._local_sizes[logical_id] = (
+                    directory_size(path),
+                    self.zipped_sizes.get(path),
+                )
+            else:
+                self._local_sizes[logical_id] = (None, None)
+        return self._local_sizes[logical_id]
+
+    def _layer(self, layer) -> dict:
+        if isinstance(layer, dict) and isinstance(layer.get("Ref"), str):
+            name = layer["Ref"]
+            return {"name": name, "zipped_size": self._artifact_sizes(name)[1]}
+        if isinstance(layer, str):
+            return {
+                "name": layer.split(":layer:")[-1],
+                "arn": layer,
+                "zipped_size": self.layer_sizes.get(layer),
+            }
+        # ARN built with intrinsic functions; size cannot be determined offline
+        return {"name": json.dumps(layer), "zipped_size": None}
+
+    def _function_row(self, logical_id: str, resource: dict) -> dict:
+        properties = resource.get("Properties") or dict()
+        globals_ = (self.template.get("Globals") or dict()).get("Function") or dict()
+        # SAM merges global layers with the function's own layers
+        layers = [
+            self._layer(x)
+            for x in (globals_.get("Layers") or list())
+            + (properties.get("Layers") or list())
+        ]
+        unzipped, zipped = self._artifact_sizes(logical_id)
+        layers_size = sum(x["zipped_size"] or 0 for x in layers)
+        total = None if zipped is None else zipped + layers_size
+        budget_mb = (resource.get("Metadata") or dict()).get(
+            BUDGET_METADATA_KEY, self.budget_mb
+        )
+        return {
+            "function": logical_id,
+            "runtime": properties.get("Runtime", globals_.get("Runtime")),
+            "unzipped_size": unzipped,
+            "zipped_size": zipped,
+            "layers": layers,
+            "total_zipped_size": total,
+            "budget_mb": budget_mb,
+            "over_budget": total is not None
+            and budget_mb is not None
+            and total > budget_mb * MB,
+        }
+
+    def rows(self) -> List[dict]:
+        if self._rows is None:
+            self._rows = [
+                self._function_row(k, v)
+                for k, v in sorted(self.template.get("Resources", dict()).items())
+                if v.get("Type") == "AWS::Serverless::Function"
+            ]
+        return self._rows
+
+    def over_budget(self) -> List[dict]:
+        return [x for x in self.rows() if x["over_budget"]]
+
+    def table(self) -> PrettyTable:
+        table = PrettyTable()
+        table.field_names = [
+            "Function",
+            "Runtime",
+            "Unzipped (MB)",
+            "Zipped (MB)",
+            "Layers (MB)",
+            "Total zipped (MB)",
+            "Budget (MB)",
+        ]
+        for row in self.rows():
+            layers = ", ".join(
+                f"{x['name']} ({_mb(x['zipped_size'])})" for x in row["layers"]
+            )
+            table.add_row(
+                [
+                    row["function"] + (" [OVER BUDGET]" if row["over_budget"] else ""),
+                    row["runtime"],
+                    _mb(row["unzipped_size"]),
+                    _mb(row["zipped_size"]),
+                    layers,
+                    _mb(row["total_zipped_size"]),
+                    row["budget_mb"],
+                ]
+            )
+        return table
+
+    def write(self, path: str = DEFAULT_REPORT_PATH) -> str:
+        """
+        Returns: path of report
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"functions": self.rows()}, f, indent=2)
+        return path
+
+    def check_budget(self) -> None:
+        """
+        Raises SizeBudgetExceededError if any function is over budget
+        """
+        over_budget = self.over_budget()
+        if over_budget:
+            raise SizeBudgetExceededError(
+                f"{len(over_budget)} function(s) exceed their package size budget",
+                {
+                    "functions": {
+                        x["function"]: {
+                            "total_zipped_mb": round(x["total_zipped_size"] / MB, 2),
+                            "budget_mb": x["budget_mb"],
+                        }
+                        for x in over_budget
+                    }
+                },
+            )
@@ -3,7 +3,13 @@ Entry points to use some of this module's capabilities from the command line
 """
 
 import argparse
+import sys
 from thiscovery_dev_tools.aws_deployer import AwsDeployer
+from thiscovery_dev_tools.cold_start_report import DEFAULT_BUDGET_MB
+from thiscovery_dev_tools.deploy_orchestrator import (
+    MultiStackDeployer,
+    parse_stack_spec,
+)
 
 
 def parse_container_env_vars(env_vars_list):
@@ -21,14 +27,36 @@ def aws_deployer_build(args):
         if args.container_env_var
         else None
     )
-    deployer.parse_sam_template()
-    deployer.build(build_in_container=True, container_env_vars=container_env_vars)
+    try:
+        deployer.parse_sam_template(use_cache=not args.no_template_cache)
+        deployer.validate_template(
+            remote=args.remote_validation, strict=args.strict_validation
+        )
+        deployer.build(
+            build_in_container=True,
+            container_env_vars=container_env_vars,
+            incremental=args.incremental,
+            workers=args.workers,
+            size_budget_mb=args.size_budget_mb,
+        )
+    finally:
+        deployer.write_performance_report()
 
 
 def aws_deployer_deploy(args):
     deployer = AwsDeployer(stack_name=args.stack_name)
-    deployer.deploy(confirm_cf_changeset=False)
-    deployer.log_deployment()
+    try:
+        deployer.deploy(confirm_cf_changeset=False)
+        deployer.log_deployment()
+    finally:
+        deployer.write_performance_report()
+
+
+def deploy_many(args):
+    stacks = [parse_stack_spec(spec) for spec in args.stacks]
+    deployer = MultiStackDeployer(stacks, max_concurrency=args.max_concurrency)
+    if not deployer.main():
+        sys.exit("Deployment of one or more stacks failed")
 
 
 def main():
@@ -50,6 +78,45 @@ def main():
         metavar="ENV_VAR",
         help="Environment variables to pass to the container, format: KEY=VALUE. Can be used multiple times.",
     )
+    parser_build.add_argument(
+        "--no-template-cache",
+        action="store_true",
+        help="Always rebuild .thiscovery/template.yaml, ignoring cached parsed templates",
+    )
+    parser_build.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only rebuild functions and layers whose sources changed since the last build",
+    )
+    parser_build.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Build functions and layers in up to N parallel sam build processes. "
+        "Defaults to 1 (a single sam build call for the whole template)",
+    )
+    parser_build.add_argument(
+        "--size-budget-mb",
+        type=float,
+        default=DEFAULT_BUDGET_MB,
+        metavar="MB",
+        help="Fail the build if the total zipped size of a function and its layers "
+        "exceeds MB megabytes; functions can set their own budget with "
+        "Metadata: {SizeBudgetMB: ...}. By default, package sizes are only reported",
+    )
+    parser_build.add_argument(
+        "--remote-validation",
+        action="store_true",
+        help="Also validate the parsed template using the CloudFormation API "
+        "(requires AWS credentials). By default, the template is only validated offline",
+    )
+    parser_build.add_argument(
+        "--strict-validation",
+        action="store_true",
+        help="Fail the build if offline template validation finds issues. "
+        "By default, issues are only reported as warnings",
+    )
     parser_build.set_defaults(func=aws_deployer_build)
 
     # create the parser for the "deploy" command
@@ -69,9 +136,38 @@ def main():
     )
     parser_deploy.set_defaults(func=aws_deployer_deploy)
 
+    # create the parser for the "deploy-many" command
+    parser_deploy_many = subparsers.add_parser(
+        "deploy-many",
+        help="deploys several thiscovery stacks, in parallel where dependencies allow",
+    )
+    parser_deploy_many.add_argument(
+        "stacks",
+        nargs="+",
+        metavar="stack",
+        help="Stack to deploy, in the format NAME[=PATH][:DEPENDENCY,...]; e.g. "
+        "thiscovery-crm=../thiscovery-crm:thiscovery-core. PATH is the stack's "
+        "directory and defaults to NAME",
+    )
+    parser_deploy_many.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=2,
+        metavar="N",
+        help="Maximum number of stacks deployed at the same time. Defaults to 2",
+    )
+    parser_deploy_many.set_defaults(func=deploy_many)
+
     args = parser.parse_args()
     try:
         args.func(args)
     except AttributeError:
-        print("ERROR: You must use an available subcommand: build, deploy", "\n")
+        print(
+            "ERROR: You must use an available subcommand: build, deploy, deploy-many",
+            "\n",
+        )
         parser.print_usage()
+
+
+if __name__ == "__main__":
+    main()
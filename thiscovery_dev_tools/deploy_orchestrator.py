@@ -0,0 +1,143 @@
+"""
+Deploys several thiscovery stacks, respecting dependencies between them
+(e.g. thiscovery-core before thiscovery-crm) and deploying independent
+stacks in parallel.
+
+Each stack is deployed by running "thiscovery deploy <stack_name>" (i.e.
+AwsDeployer.deploy followed by AwsDeployer.log_deployment) in the stack's
+own directory. Stacks run in separate processes because AwsDeployer works
+with paths relative to the current working directory. Their output is
+streamed as it is produced, each line prefixed with the stack name. Stack
+processes run non-interactively: deployments that would prompt for
+confirmation fail instead.
+"""
+
+import functools
+import os
+import subprocess
+import sys
+import thiscovery_lib.utilities as utils
+from prettytable import PrettyTable
+from typing import List, NamedTuple
+
+from thiscovery_dev_tools.aws_deployer import NON_INTERACTIVE_ENV_VAR
+from thiscovery_dev_tools.phase_scheduler import Phase, PhaseScheduler
+
+
+class StackSpec(NamedTuple):
+    name: str
+    path: str
+    depends_on: List[str]
+
+
+def run_with_prefixed_output(command: list, prefix: str, **kwargs) -> None:
+    """
+    Runs command, printing each line of its combined stdout and stderr as
+    soon as it is produced, prefixed with "[prefix] "
+
+    Args:
+        **kwargs: passed on to subprocess.Popen (e.g. cwd)
+    """
+    with subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        **kwargs,
+    ) as process:
+        for line in process.stdout:
+            print(f"[{prefix}] {line}", end="", flush=True)
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, command)
+
+
+def parse_stack_spec(spec: str) -> StackSpec:
+    """
+    Parses stack specifications in the format NAME[=PATH][:DEPENDENCY,...],
+    for example "thiscovery-crm=../thiscovery-crm:thiscovery-core". PATH
+    defaults to NAME (i.e. a directory named after the stack in the current
+    working directory)
+    """
+    name_and_path, _, dependencies = spec.partition(":")
+    name, _, path = name_and_path.partition("=")
+    if not name:
+        raise utils.DetailedValueError(
+            f"Invalid stack specification: {spec}", {"spec": spec}
+        )
+    return StackSpec(
+        name=name,
+        path=path or name,
+        depends_on=[d for d in dependencies.split(",") if d],
+    )
+
+
+class MultiStackDeployer:
+    def __init__(self, stacks: List[StackSpec], max_concurrency: int = 2):
+        """
+        Args:
+            stacks: stacks to deploy and their dependencies; dependencies must
+                also be listed as stacks to deploy
+            max_concurrency: maximum number of stacks deployed at the same time
+        """
+        self.stacks = stacks
+        self.max_concurrency = max_concurrency
+        self.logger = utils.get_logger()
+        self.scheduler = PhaseScheduler(
+            [
+                Phase(
+                    s.name,
+                    functools.partial(self.deploy_stack, s),
+                    depends_on=s.depends_on,
+                )
+                for s in stacks
+            ],
+            max_workers=max_concurrency,
+        )
+
+    @staticmethod
+    def deploy_stack(stack: StackSpec) -> None:
+        run_with_prefixed_output(
+            [
+                sys.executable,
+                "-m",
+                "thiscovery_dev_tools.command_line",
+                "deploy",
+                stack.name,
+            ],
+            prefix=stack.name,
+            cwd=stack.path,
+            stdin=subprocess.DEVNULL,
+            env={**os.environ, NON_INTERACTIVE_ENV_VAR: "true"},
+        )
+
+    def summary_table(self) -> PrettyTable:
+        table = PrettyTable()
+        table.field_names = ["Stack", "Status", "Duration (s)"]
+        for stack in self.stacks:
+            duration = self.scheduler.durations.get(stack.name)
+            table.add_row(
+                [
+                    stack.name,
+                    self.scheduler.statuses[stack.name],
+                    "" if duration is None else f"{duration:.1f}",
+                ]
+            )
+        return table
+
+    def main(self) -> bool:
+        """
+        Deploys all stacks. If a deployment fails, no further deployments are
+        started; deployments already in progress are allowed to finish.
+
+        Returns: True if all stacks were deployed successfully
+        """
+        succeeded = False
+        try:
+            self.scheduler.run()
+            succeeded = True
+        except Exception as err:
+            self.logger.error(
+                "Multi-stack deployment failed", extra={"error": repr(err)}
+            )
+        print(self.summary_table())
+        return succeeded
@@ -0,0 +1,110 @@
+"""
+Timing instrumentation for AwsDeployer phases and the external processes
+they start (sam, git). Timings are thread safe, since phases may run
+concurrently (see phase_scheduler).
+"""
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+import thiscovery_lib.utilities as utils
+from typing import Optional
+
+DEFAULT_REPORT_PATH = os.path.join(".thiscovery", "deploy_performance.json")
+
+
+class DeploymentTimings:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self.started = utils.now_with_tz().isoformat()
+        self.phases = dict()
+        self.subprocesses = list()
+        self.details = dict()
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """
+        Context manager recording the duration of a phase; durations of
+        phases entered more than once are added up
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0) + elapsed
+
+    @contextlib.contextmanager
+    def subprocess(self, label: str):
+        """
+        Context manager recording the duration and outcome of an external
+        process. Labels should not include full command lines, which may
+        contain secrets (e.g. --container-env-var values)
+        """
+        start = time.perf_counter()
+        succeeded = False
+        try:
+            yield
+            succeeded = True
+        finally:
+            with self._lock:
+                self.subprocesses.append(
+                    {
+                        "label": label,
+                        "seconds": round(time.perf_counter() - start, 3),
+                        "succeeded": succeeded,
+                    }
+                )
+
+    def record_detail(self, name: str, timings: dict) -> None:
+        """
+        Records finer-grained timings (e.g. of individual template transforms)
+        """
+        with self._lock:
+            self.details[name] = {k: round(v, 3) for k, v in timings.items()}
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "started": self.started,
+                "elapsed_seconds": round(time.perf_counter() - self._start, 3),
+                "phases": {k: round(v, 3) for k, v in self.phases.items()},
+                "subprocesses": list(self.subprocesses),
+                "details": dict(self.details),
+            }
+
+    def write_report(
+        self, path: str = DEFAULT_REPORT_PATH, extra: Optional[dict] = None
+    ) -> str:
+        """
+        Writes summary (plus any extra data) to path as json
+
+        Returns: path of report
+        """
+        report = {**(extra or dict()), **self.summary()}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        return path
+
+
+def timed_phase(phase_name: str):
+    """
+    Decorator for methods of classes with a "timings" (DeploymentTimings)
+    attribute
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.timings.phase(phase_name):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,695 @@
+"""
+Bulk operations on DynamoDB tables, using the low-level boto3 client.
+
+Items are read with parallel segmented scans
+(https://docs.aws.amazon.com/amazondynamodb/latest/developerguide/Scan.html#Scan.ParallelScan)
+and written by BatchWriter, in BatchWriteItem requests of up to 25 items;
+items that DynamoDB returns as unprocessed (e.g. because of throttling) are
+retried with jittered exponential backoff
+(https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/).
+
+reset_table empties a table (or restores it to a baseline of fixture items)
+reading only the key attributes of existing items, which is much faster
+than scanning full items and deleting them one by one.
+
+copy_table copies all items of a table into another (see
+migrate_dynamodb_tables), streaming pages from concurrent segment scans to
+the writer as they arrive. Its progress can be saved to a CopyCheckpoint,
+so that interrupted copies can be resumed.
+
+Both operations can be kept within a capacity budget by passing a
+throughput_governor.ThroughputGovernor. Items copied by copy_table can be
+transformed or filtered on the way (see item_transforms).
+"""
+
+import base64
+import contextlib
+import json
+import os
+import queue
+import random
+import threading
+import time
+import thiscovery_lib.utilities as utils
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from thiscovery_dev_tools.item_transforms import (
+    Transform,
+    TransformStage,
+    serialize_item,
+)
+from thiscovery_dev_tools.throughput_governor import ThroughputGovernor
+
+BATCH_WRITE_MAX_ITEMS = 25
+DEFAULT_TOTAL_SEGMENTS = 4
+# pages scanned ahead of the writer, per segment
+MAX_QUEUED_PAGES_PER_SEGMENT = 2
+_SEGMENT_DONE = object()
+MAX_BATCH_WRITE_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 0.05
+BACKOFF_MAX_SECONDS = 5
+DEFAULT_CHECKPOINT_DIR = os.path.join(".thiscovery", "migrations")
+CHECKPOINT_INTERVAL_SECONDS = 10
+
+
+class BatchWriteError(utils.DetailedValueError):
+    pass
+
+
+def key_attributes(client, table_name: str) -> List[str]:
+    """
+    Returns: names of the key attributes of table_name (partition key first)
+    """
+    response = client.describe_table(TableName=table_name)
+    return [x["AttributeName"] for x in response["Table"]["KeySchema"]]
+
+
+def load_baseline(path: str) -> List[dict]:
+    """
+    Returns: items in json file at path (a list of items in plain python format)
+    """
+    with open(path) as f:
+        return json.load(f)
+
+
+def _key_id(item: dict, key_names: List[str]) -> str:
+    # binary values (bytes) are not json serializable
+    return json.dumps([item[k] for k in key_names], sort_keys=True, default=str)
+
+
+def scan_segment(
+    client, table_name: str, segment: int, total_segments: int, **kwargs
+) -> Iterator[dict]:
+    """
+    Yields: scan response pages of one segment of table_name
+    """
+    kwargs = {
+        "TableName": table_name,
+        "Segment": segment,
+        "TotalSegments": total_segments,
+        **kwargs,
+    }
+    while True:
+        page = client.scan(**kwargs)
+        yield page
+        if "LastEvaluatedKey" not in page:
+            return
+        kwargs["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+
+
+def parallel_scan(
+    client,
+    table_name: str,
+    total_segments: int = DEFAULT_TOTAL_SEGMENTS,
+    segments: Optional[Iterable[int]] = None,
+    start_keys: Optional[dict] = None,
+    **kwargs,
+) -> Iterator[Tuple[int, dict]]:
+    """
+    Scans total_segments segments of table_name concurrently, one worker
+    thread per segment. Pages are passed to the caller through a bounded
+    queue, so workers pause when the caller falls behind and memory use does
+    not depend on table size.
+
+    Args:
+        segments: segments to scan; defaults to all
+        start_keys: ExclusiveStartKey of scans, keyed by segment (to resume
+            segments scanned previously)
+        kwargs: additional scan parameters (e.g. ConsistentRead=True)
+
+    Yields: (segment, scan response page) tuples, in the order pages arrive
+    """
+    segments = list(range(total_segments) if segments is None else segments)
+    start_keys = start_keys or dict()
+    pages = queue.Queue(maxsize=total_segments * MAX_QUEUED_PAGES_PER_SEGMENT)
+    stopped = threading.Event()
+
+    def put(message) -> bool:
+        while not stopped.is_set():
+            try:
+                pages.put(message, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def scan(segment):
+        segment_kwargs = dict(kwargs)
+        if start_keys.get(segment) is not None:
+            segment_kwargs["ExclusiveStartKey"] = start_keys[segment]
+        try:
+            for page in scan_segment(
+                client, table_name, segment, total_segments, **segment_kwargs
+            ):
+                if not put((segment, page)):
+                    return
+        except Exception as err:
+            put((segment, err))
+        else:
+            put((segment, _SEGMENT_DONE))
+
+    workers = [
+        threading.Thread(target=scan, args=(segment,), daemon=True)
+        for segment in segments
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        remaining = len(segments)
+        while remaining:
+            segment, page = pages.get()
+            if page is _SEGMENT_DONE:
+                remaining -= 1
+            elif isinstance(page, Exception):
+                raise page
+            else:
+                yield segment, page
+    finally:
+        # also stops workers if the caller closes the generator early
+        stopped.set()
+        for worker in workers:
+            worker.join()
+
+
+def scan_keys(
+    client,
+    table_name: str,
+    key_names: Optional[List[str]] = None,
+    total_segments: int = DEFAULT_TOTAL_SEGMENTS,
+) -> List[dict]:
+    """
+    Scans total_segments segments of table_name in parallel, projecting only
+    key attributes
+
+    Returns: keys of all items in table_name
+    """
+    if key_names is None:
+        key_names = key_attributes(client, table_name)
+    # placeholders avoid clashes with reserved words (e.g. "key")
+    names = {f"#k{i}": k for i, k in enumerate(key_names)}
+
+    return [
+        item
+        for _, page in parallel_scan(
+            client,
+            table_name,
+            total_segments,
+            ProjectionExpression=", ".join(names),
+            ExpressionAttributeNames=names,
+        )
+        for item in page["Items"]
+    ]
+
+
+class BatchWriter:
+    """
+    Buffers write requests to a table and sends them in BatchWriteItem
+    requests of BATCH_WRITE_MAX_ITEMS. Use as a context manager (or call
+    flush) to make sure the last, partial batch is written.
+
+    BatchWriteItem rejects batches containing two requests for the same key;
+    if key_names are specified, the buffer is flushed before a request for
+    a key already in it is added, so that the later request wins.
+    """
+
+    def __init__(
+        self,
+        client,
+        table_name: str,
+        max_attempts: int = MAX_BATCH_WRITE_ATTEMPTS,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+        key_names: Optional[List[str]] = None,
+    ):
+        """
+        Args:
+            client: boto3 DynamoDB client (or a stand-in)
+            table_name: full table name
+            max_attempts: maximum number of requests sent for each batch
+            backoff_base: maximum delay (in seconds) before the first retry;
+                defaults to BACKOFF_BASE_SECONDS
+            backoff_max: cap on the delay before any retry; defaults to
+                BACKOFF_MAX_SECONDS
+            key_names: key attributes of table; only needed if the same key
+                may be written more than once (see key_attributes)
+        """
+        self.client = client
+        self.table_name = table_name
+        self.max_attempts = max_attempts
+        self.backoff_base = (
+            BACKOFF_BASE_SECONDS if backoff_base is None else backoff_base
+        )
+        self.backoff_max = BACKOFF_MAX_SECONDS if backoff_max is None else backoff_max
+        self.key_names = key_names
+        self._buffer = list()
+        self._buffered_keys = set()
+        self.items_written = 0
+        self.batches = 0
+        self.retries = 0  # BatchWriteItem calls retrying unprocessed items
+        self.retried_items = 0
+        self.backoff_seconds = 0
+        self._start_time = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.flush()
+
+    def write(self, write_request: dict) -> None:
+        """
+        Args:
+            write_request: PutRequest or DeleteRequest dict, as accepted by
+                BatchWriteItem
+        """
+        if self._start_time is None:
+            self._start_time = time.perf_counter()
+        if self.key_names is not None:
+            if "PutRequest" in write_request:
+                key = write_request["PutRequest"]["Item"]
+            else:
+                key = write_request["DeleteRequest"]["Key"]
+            key_id = _key_id(key, self.key_names)
+            if key_id in self._buffered_keys:
+                self.flush()
+            self._buffered_keys.add(key_id)
+        self._buffer.append(write_request)
+        if len(self._buffer) >= BATCH_WRITE_MAX_ITEMS:
+            self.flush()
+
+    def put(self, item: dict) -> None:
+        self.write({"PutRequest": {"Item": item}})
+
+    def delete(self, key: dict) -> None:
+        self.write({"DeleteRequest": {"Key": key}})
+
+    def flush(self) -> None:
+        while self._buffer:
+            self._write_batch(self._buffer[:BATCH_WRITE_MAX_ITEMS])
+            del self._buffer[:BATCH_WRITE_MAX_ITEMS]
+        self._buffered_keys.clear()
+
+    def _backoff(self, attempt: int) -> float:
+        """
+        Returns: delay before retry number attempt ("full jitter")
+        """
+        return random.uniform(
+            0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        )
+
+    def _write_batch(self, batch: list) -> None:
+        pending = batch
+        attempt = 0
+        while pending:
+            if attempt >= self.max_attempts:
+                raise BatchWriteError(
+                    f"Failed to write {len(pending)} items to {self.table_name}",
+                    {"attempts": attempt, "unprocessed": pending},
+                )
+            if attempt:
+                delay = self._backoff(attempt)
+                self.backoff_seconds += delay
+                time.sleep(delay)
+                self.retries += 1
+                self.retried_items += len(pending)
+            response = self.client.batch_write_item(
+                RequestItems={self.table_name: pending}
+            )
+            self.batches += 1
+            unprocessed = (response.get("UnprocessedItems") or dict()).get(
+                self.table_name, list()
+            )
+            self.items_written += len(pending) - len(unprocessed)
+            pending = unprocessed
+            attempt += 1
+
+    @property
+    def elapsed_seconds(self) -> float:
+        if self._start_time is None:
+            return 0
+        return time.perf_counter() - self._start_time
+
+    @property
+    def items_per_second(self) -> float:
+        elapsed = self.elapsed_seconds
+        return self.items_written / elapsed if elapsed else 0
+
+    def metrics(self) -> dict:
+        return {
+            "items_written": self.items_written,
+            "batches": self.batches,
+            "retries": self.retries,
+            "retried_items": self.retried_items,
+            "backoff_seconds": round(self.backoff_seconds, 3),
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "items_per_second": round(self.items_per_second, 1),
+        }
+
+
+def batch_write(client, table_name: str, write_requests: list) -> int:
+    """
+    Args:
+        write_requests: PutRequest and/or DeleteRequest dicts, as accepted
+            by BatchWriteItem
+
+    Returns: number of write requests processed
+    """
+    with BatchWriter(client, table_name) as writer:
+        for write_request in write_requests:
+            writer.write(write_request)
+    return writer.items_written
+
+
+def delete_items(client, table_name: str, keys: List[dict]) -> int:
+    return batch_write(
+        client, table_name, [{"DeleteRequest": {"Key": k}} for k in keys]
+    )
+
+
+def put_items(client, table_name: str, items: List[dict]) -> int:
+    """
+    Args:
+        items: items in DynamoDB attribute value format (see serialize_item)
+    """
+    return batch_write(client, table_name, [{"PutRequest": {"Item": x}} for x in items])
+
+
+def reset_table(
+    client,
+    table_name: str,
+    baseline: Optional[List[dict]] = None,
+    total_segments: int = DEFAULT_TOTAL_SEGMENTS,
+    governor: Optional[ThroughputGovernor] = None,
+) -> dict:
+    """
+    Deletes all items in table_name or, if baseline is specified, restores
+    table_name to contain only the baseline items
+
+    Args:
+        client: boto3 DynamoDB client (or a stand-in, such as
+            dynamodb_stub.InMemoryDynamodbClient)
+        table_name: full table name
+        baseline: items in plain python format
+        total_segments: number of segments scanned in parallel
+        governor: if specified, limits capacity used by scans and writes
+
+    Returns: counts of deleted and restored items
+    """
+    if governor is not None:
+        client = governor.wrap(client)
+    key_names = key_attributes(client, table_name)
+    baseline_items = [serialize_item(x) for x in baseline or list()]
+    baseline_keys = {_key_id(x, key_names) for x in baseline_items}
+    # baseline items are overwritten below, so there is no need to delete them
+    stale_keys = [
+        k
+        for k in scan_keys(client, table_name, key_names, total_segments)
+        if _key_id(k, key_names) not in baseline_keys
+    ]
+    return {
+        "deleted": delete_items(client, table_name, stale_keys),
+        "restored": put_items(client, table_name, baseline_items),
+    }
+
+
+def default_checkpoint_path(source_table_name: str, target_table_name: str) -> str:
+    return os.path.join(
+        DEFAULT_CHECKPOINT_DIR, f"{source_table_name}--{target_table_name}.json"
+    )
+
+
+def _encode_binary_values(key: Optional[dict]) -> Optional[dict]:
+    """
+    Returns: copy of key (in DynamoDB attribute value format) with binary
+        values base64 encoded, so that it can be saved as json
+    """
+    if key is None:
+        return None
+    encoded = dict()
+    for name, value in key.items():
+        if "B" in value:
+            value = {"B": base64.b64encode(value["B"]).decode("ascii")}
+        elif "BS" in value:
+            value = {"BS": [base64.b64encode(x).decode("ascii") for x in value["BS"]]}
+        encoded[name] = value
+    return encoded
+
+
+def _decode_binary_values(key: Optional[dict]) -> Optional[dict]:
+    """
+    Reverses _encode_binary_values
+    """
+    if key is None:
+        return None
+    decoded = dict()
+    for name, value in key.items():
+        if "B" in value:
+            value = {"B": base64.b64decode(value["B"])}
+        elif "BS" in value:
+            value = {"BS": [base64.b64decode(x) for x in value["BS"]]}
+        decoded[name] = value
+    return decoded
+
+
+class CopyCheckpoint:
+    """
+    Progress of copy_table, saved to a local json file: for each segment,
+    the LastEvaluatedKey of the last page copied, the numbers of items
+    scanned and copied (these differ if transforms drop items) and whether
+    the segment is done.
+
+    Pages are recorded as they are handed to the writer, but only committed
+    (and saved) after the writer is flushed, so a saved checkpoint never
+    refers to items that were not written.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        source_table_name: str,
+        target_table_name: str,
+        total_segments: int,
+        save_interval: float = CHECKPOINT_INTERVAL_SECONDS,
+    ):
+        """
+        Args:
+            path: path of state file
+            save_interval: minimum number of seconds between saves
+        """
+        self.path = path
+        self.save_interval = save_interval
+        self.state = {
+            "source_table": source_table_name,
+            "target_table": target_table_name,
+            "total_segments": total_segments,
+            "segments": {
+                str(segment): {
+                    "last_evaluated_key": None,
+                    "items_scanned": 0,
+                    "items_copied": 0,
+                    "done": False,
+                }
+                for segment in range(total_segments)
+            },
+        }
+        self._pending = dict()
+        self._last_save = time.monotonic()
+
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        source_table_name: str,
+        target_table_name: str,
+        total_segments: int,
+        **kwargs,
+    ) -> "CopyCheckpoint":
+        """
+        Returns: checkpoint saved at path, or a new checkpoint if there is none
+        """
+        checkpoint = cls(
+            path, source_table_name, target_table_name, total_segments, **kwargs
+        )
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return checkpoint
+        saved = (state["source_table"], state["target_table"], state["total_segments"])
+        if saved != (source_table_name, target_table_name, total_segments):
+            raise utils.DetailedValueError(
+                "Checkpoint does not match migration (resume with the same number "
+                "of workers or delete the checkpoint)",
+                {
+                    "path": path,
+                    "checkpoint": saved,
+                    "migration": (
+                        source_table_name,
+                        target_table_name,
+                        total_segments,
+                    ),
+                },
+            )
+        for segment_state in state["segments"].values():
+            segment_state["last_evaluated_key"] = _decode_binary_values(
+                segment_state["last_evaluated_key"]
+            )
+        checkpoint.state = state
+        return checkpoint
+
+    def segment(self, segment: int) -> dict:
+        return self.state["segments"][str(segment)]
+
+    @property
+    def items_scanned(self) -> int:
+        return sum(x["items_scanned"] for x in self.state["segments"].values())
+
+    @property
+    def items_copied(self) -> int:
+        return sum(x["items_copied"] for x in self.state["segments"].values())
+
+    def pending_segments(self) -> List[int]:
+        return [
+            segment
+            for segment in range(self.state["total_segments"])
+            if not self.segment(segment)["done"]
+        ]
+
+    def start_keys(self) -> dict:
+        return {
+            segment: self.segment(segment)["last_evaluated_key"]
+            for segment in self.pending_segments()
+        }
+
+    def record_page(self, segment: int, page: dict, items_copied: int) -> None:
+        """
+        Args:
+            page: scan response
+            items_copied: number of items of page handed to the writer
+        """
+        pending = self._pending.setdefault(
+            segment, {"items_scanned": 0, "items_copied": 0}
+        )
+        pending["items_scanned"] += len(page["Items"])
+        pending["items_copied"] += items_copied
+        pending["last_evaluated_key"] = page.get("LastEvaluatedKey")
+
+    def is_due(self) -> bool:
+        return time.monotonic() - self._last_save >= self.save_interval
+
+    def commit(self) -> None:
+        """
+        Marks recorded pages as copied and saves the checkpoint. Only call
+        after writes of all recorded pages have been flushed.
+        """
+        for segment, pending in self._pending.items():
+            state = self.segment(segment)
+            state["items_scanned"] += pending["items_scanned"]
+            state["items_copied"] += pending["items_copied"]
+            state["last_evaluated_key"] = pending["last_evaluated_key"]
+            state["done"] = pending["last_evaluated_key"] is None
+        self._pending.clear()
+        self.save()
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # write to a temporary file first, so that an interruption never
+        # leaves a truncated checkpoint
+        temp_path = f"{self.path}.tmp"
+        state = {
+            **self.state,
+            "segments": {
+                segment: {
+                    **segment_state,
+                    "last_evaluated_key": _encode_binary_values(
+                        segment_state["last_evaluated_key"]
+                    ),
+                }
+                for segment, segment_state in self.state["segments"].items()
+            },
+        }
+        with open(temp_path, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(temp_path, self.path)
+        self._last_save = time.monotonic()
+
+
+def copy_table(
+    source_client,
+    target_client,
+    source_table_name: str,
+    target_table_name: str,
+    workers: int = DEFAULT_TOTAL_SEGMENTS,
+    checkpoint: Optional[CopyCheckpoint] = None,
+    governor: Optional[ThroughputGovernor] = None,
+    transforms: Optional[List[Transform]] = None,
+) -> dict:
+    """
+    Copies all items in source_table_name to target_table_name
+
+    Args:
+        source_client: boto3 DynamoDB client with access to source table
+        target_client: boto3 DynamoDB client with access to target table
+        workers: number of segments scanned concurrently
+        checkpoint: if specified, progress is saved to it and segments it
+            records as done are skipped; other segments resume from their
+            last saved LastEvaluatedKey
+        governor: if specified, limits capacity used by scans of source
+            table and writes to target table
+        transforms: functions applied to each item before it is written
+            (see item_transforms)
+
+    Returns: numbers of items copied and scanned in this call (these differ
+        if transforms drop items), items scanned per segment, and writer,
+        governor and transform metrics
+    """
+    if governor is not None:
+        source_client = governor.wrap(source_client)
+        target_client = governor.wrap(target_client)
+    segments = list(range(workers))
+    start_keys = dict()
+    if checkpoint is not None:
+        segments = checkpoint.pending_segments()
+        start_keys = checkpoint.start_keys()
+    segment_counts = {segment: 0 for segment in segments}
+    stage = TransformStage(transforms) if transforms else None
+    # transforms may map different source items to the same target key
+    key_names = None
+    if stage is not None:
+        key_names = key_attributes(target_client, target_table_name)
+    with BatchWriter(target_client, target_table_name, key_names=key_names) as writer:
+        pages = parallel_scan(
+            source_client,
+            source_table_name,
+            total_segments=workers,
+            segments=segments,
+            start_keys=start_keys,
+            Select="ALL_ATTRIBUTES",
+            ConsistentRead=True,
+        )
+        with contextlib.closing(pages):
+            for segment, page in pages:
+                items = page["Items"]
+                if stage is not None:
+                    items = stage.apply(items)
+                items_copied = 0
+                for item in items:
+                    writer.put(item)
+                    items_copied += 1
+                segment_counts[segment] += len(page["Items"])
+                if checkpoint is not None:
+                    checkpoint.record_page(segment, page, items_copied)
+                    if checkpoint.is_due():
+                        writer.flush()
+                        checkpoint.commit()
+    if checkpoint is not None:
+        checkpoint.commit()
+    return {
+        "items_copied": writer.items_written,
+        "items_scanned": sum(segment_counts.values()),
+        "segments": segment_counts,
+        "writer": writer.metrics(),
+        "governor": None if governor is None else governor.metrics(),
+        "transforms": None if stage is None else stage.metrics(),
+    }
@@ -4,17 +4,22 @@ import sys
 import thiscovery_lib.utilities as utils
 from thiscovery_lib.dynamodb_utilities import Dynamodb
 
+from thiscovery_dev_tools import client_registry, dynamodb_bulk
+
 
 class DynamodbRestore:
-    def __init__(self, stack_name, table_name, restore_datetime=None):
+    def __init__(self, stack_name, table_name, restore_datetime=None, governor=None):
         """
         Args:
             restore_datetime (datetime): Point in time table should be restored to (e.g. datetime(2015, 1, 1)).
                     If None, latest backup will be used.
+            governor (throughput_governor.ThroughputGovernor): If specified, restored data is copied
+                    to the original table within the governor's capacity budget (instead of using dynamodump)
         """
         self.stack_name = stack_name
         self.table_name = table_name
         self.restore_datetime = restore_datetime
+        self.governor = governor
         self.full_table_name = "-".join(
             [
                 self.stack_name,
@@ -28,8 +33,8 @@ class DynamodbRestore:
                 os.getenv("RESTORE_NAME_POSFIX", "Restored"),
             ]
         )
-        self.ddb_client = Dynamodb(stack_name=stack_name)
-        self.ddb_low_level = utils.BaseClient("dynamodb")
+        self.ddb_client = client_registry.get_instance(Dynamodb, stack_name=stack_name)
+        self.ddb_low_level = client_registry.get_instance(utils.BaseClient, "dynamodb")
 
     def create_aws_restored_table(self, **kwargs):
         if kwargs.get("RestoreDateTime") is None:
@@ -75,6 +80,8 @@ class DynamodbRestore:
         Dynamodump was removed as a dependency in setup.py to prevent conflicts with
         recent version of boto3. To install it, use "pip install dynamodump"
         """
+        if self.governor is not None:
+            return self.copy_aws_restored_table_to_original_table()
         subprocess.run(
             [
                 "dynamodump",
@@ -93,6 +100,15 @@ class DynamodbRestore:
             check=True,
         )
 
+    def copy_aws_restored_table_to_original_table(self):
+        return dynamodb_bulk.copy_table(
+            source_client=self.ddb_low_level.client,
+            target_client=self.ddb_low_level.client,
+            source_table_name=self.aws_restored_table,
+            target_table_name=self.full_table_name,
+            governor=self.governor,
+        )
+
     def delete_aws_restored_table(self):
         return self.ddb_low_level.client.delete_table(TableName=self.aws_restored_table)
 
@@ -104,7 +120,8 @@ class DynamodbRestore:
         """
         self.create_aws_restored_table(**kwargs)
         self.wait_for_aws_restored_table_ready()
-        self.create_local_dump_of_aws_restored_table()
+        if self.governor is None:
+            self.create_local_dump_of_aws_restored_table()
         self.update_original_table_with_restored_data()
         if utils.running_unit_tests():
             self.delete_aws_restored_table()
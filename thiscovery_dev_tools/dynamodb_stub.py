@@ -0,0 +1,169 @@
+"""
+In-memory stand-in for the subset of the boto3 DynamoDB client used by
+dynamodb_bulk (describe_table, scan, batch_write_item and put_item), for
+testing bulk operations without AWS or DynamoDB Local.
+
+Items are stored in low-level attribute value format (e.g. {"id": {"S": "1"}}).
+Throttling can be simulated with unprocessed_rate: the fraction of the
+requests of each BatchWriteItem call returned as UnprocessedItems.
+"""
+
+import hashlib
+import json
+import threading
+from typing import List, Optional
+
+
+class InMemoryDynamodbClient:
+    def __init__(
+        self,
+        tables: Optional[dict] = None,
+        page_size: int = 100,
+        unprocessed_rate: float = 0,
+    ):
+        """
+        Args:
+            tables: key attribute names keyed by table name,
+                e.g. {"notifications": ["id"]}
+            page_size: maximum number of items in each scan page
+            unprocessed_rate: fraction of write requests of each
+                batch_write_item call returned as unprocessed
+        """
+        self.page_size = page_size
+        self.unprocessed_rate = unprocessed_rate
+        self.key_schemas = dict()
+        self.tables = dict()
+        self.calls = dict()
+        self._lock = threading.Lock()
+        for name, key_names in (tables or dict()).items():
+            self.create_table(name, key_names)
+
+    def create_table(self, table_name: str, key_names: List[str]) -> None:
+        self.key_schemas[table_name] = key_names
+        self.tables[table_name] = dict()
+
+    def _count(self, operation: str) -> None:
+        self.calls[operation] = self.calls.get(operation, 0) + 1
+
+    def _key_id(self, table_name: str, item: dict) -> str:
+        return json.dumps(
+            [item[k] for k in self.key_schemas[table_name]], sort_keys=True, default=str
+        )
+
+    @staticmethod
+    def _segment(key_id: str, total_segments: int) -> int:
+        return int(hashlib.md5(key_id.encode()).hexdigest(), 16) % total_segments
+
+    def items(self, table_name: str) -> List[dict]:
+        with self._lock:
+            return list(self.tables[table_name].values())
+
+    def describe_table(self, TableName):
+        with self._lock:
+            self._count("describe_table")
+            return {
+                "Table": {
+                    "TableName": TableName,
+                    "KeySchema": [
+                        {"AttributeName": k, "KeyType": "HASH" if i == 0 else "RANGE"}
+                        for i, k in enumerate(self.key_schemas[TableName])
+                    ],
+                    "ItemCount": len(self.tables[TableName]),
+                }
+            }
+
+    def scan(
+        self,
+        TableName,
+        Segment=0,
+        TotalSegments=1,
+        ExclusiveStartKey=None,
+        Limit=None,
+        ProjectionExpression=None,
+        ExpressionAttributeNames=None,
+        ReturnConsumedCapacity="NONE",
+        **kwargs,
+    ):
+        with self._lock:
+            self._count("scan")
+            key_ids = sorted(
+                k
+                for k in self.tables[TableName]
+                if self._segment(k, TotalSegments) == Segment
+            )
+            if ExclusiveStartKey is not None:
+                start = self._key_id(TableName, ExclusiveStartKey)
+                key_ids = [k for k in key_ids if k > start]
+            limit = min(Limit or self.page_size, self.page_size)
+            page_ids = key_ids[:limit]
+            items = [self.tables[TableName][k] for k in page_ids]
+            if ProjectionExpression is not None:
+                names = ExpressionAttributeNames or dict()
+                attributes = [
+                    names.get(x.strip(), x.strip())
+                    for x in ProjectionExpression.split(",")
+                ]
+                items = [
+                    {a: item[a] for a in attributes if a in item} for item in items
+                ]
+            response = {"Items": items, "Count": len(items), "ScannedCount": len(items)}
+            if len(key_ids) > limit:
+                last = self.tables[TableName][page_ids[-1]]
+                response["LastEvaluatedKey"] = {
+                    k: last[k] for k in self.key_schemas[TableName]
+                }
+            if ReturnConsumedCapacity != "NONE":
+                # eventually consistent reads of items up to 4KB
+                response["ConsumedCapacity"] = {
+                    "TableName": TableName,
+                    "CapacityUnits": max(len(items), 1) * 0.5,
+                }
+            return response
+
+    def put_item(self, TableName, Item, **kwargs):
+        with self._lock:
+            self._count("put_item")
+            self.tables[TableName][self._key_id(TableName, Item)] = Item
+            return dict()
+
+    def batch_write_item(self, RequestItems, ReturnConsumedCapacity="NONE", **kwargs):
+        with self._lock:
+            self._count("batch_write_item")
+            unprocessed = dict()
+            consumed = list()
+            for table_name, requests in RequestItems.items():
+                if len(requests) > 25:
+                    raise ValueError(
+                        "Too many items requested for the BatchWriteItem call"
+                    )
+                keys = [
+                    self._key_id(
+                        table_name,
+                        (
+                            x["PutRequest"]["Item"]
+                            if "PutRequest" in x
+                            else x["DeleteRequest"]["Key"]
+                        ),
+                    )
+                    for x in requests
+                ]
+                if len(set(keys)) < len(keys):
+                    raise ValueError("Provided list of item keys contains duplicates")
+                n_unprocessed = int(len(requests) * self.unprocessed_rate)
+                processed = requests[: len(requests) - n_unprocessed]
+                for request in processed:
+                    if "PutRequest" in request:
+                        item = request["PutRequest"]["Item"]
+                        self.tables[table_name][self._key_id(table_name, item)] = item
+                    else:
+                        key = request["DeleteRequest"]["Key"]
+                        self.tables[table_name].pop(self._key_id(table_name, key), None)
+                if n_unprocessed:
+                    unprocessed[table_name] = requests[len(processed) :]
+                consumed.append(
+                    {"TableName": table_name, "CapacityUnits": float(len(processed))}
+                )
+            response = {"UnprocessedItems": unprocessed}
+            if ReturnConsumedCapacity != "NONE":
+                response["ConsumedCapacity"] = consumed
+            return response
@@ -0,0 +1,247 @@
+"""
+In-process emulation of EventBridge routing, for testing locally that events
+reach the lambdas they are meant to trigger.
+
+Rules are read from the EventBridgeRule events of AWS::Serverless::Function
+resources and from AWS::Events::Rule resources targeting functions in a
+stack's template. Event patterns are compiled once and indexed by
+detail-type, so that each event is only matched against rules that could
+apply to it. Event bus names are not emulated: all rules are treated as
+belonging to the same bus.
+
+Supported pattern syntax: exact values, prefix, suffix, anything-but,
+numeric, exists, equals-ignore-case and wildcard matching
+(https://docs.aws.amazon.com/eventbridge/latest/userguide/eb-event-patterns-content-based-filtering.html)
+"""
+
+import fnmatch
+import operator
+import thiscovery_lib.utilities as utils
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from thiscovery_dev_tools.testing_tools import eventbridge_event, load_template
+
+# values used in the envelope of emulated events
+ACCOUNT_ID = "000000000000"
+REGION = "eu-west-1"
+_MISSING = object()
+NUMERIC_OPERATORS = {
+    "=": operator.eq,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def _compile_value_matcher(matcher) -> Callable[[Any], bool]:
+    """
+    Returns: function testing a single (non-missing) value against an element
+        of a pattern list
+    """
+    if not isinstance(matcher, dict):
+        return lambda v: v == matcher
+    kind, arg = next(iter(matcher.items()))
+    if kind == "prefix":
+        if isinstance(arg, dict):  # {"prefix": {"equals-ignore-case": ...}}
+            prefix = arg["equals-ignore-case"].lower()
+            return lambda v: isinstance(v, str) and v.lower().startswith(prefix)
+        return lambda v: isinstance(v, str) and v.startswith(arg)
+    if kind == "suffix":
+        if isinstance(arg, dict):
+            suffix = arg["equals-ignore-case"].lower()
+            return lambda v: isinstance(v, str) and v.lower().endswith(suffix)
+        return lambda v: isinstance(v, str) and v.endswith(arg)
+    if kind == "equals-ignore-case":
+        return lambda v: isinstance(v, str) and v.lower() == arg.lower()
+    if kind == "wildcard":
+        return lambda v: isinstance(v, str) and fnmatch.fnmatchcase(v, arg)
+    if kind == "anything-but":
+        if isinstance(arg, dict):
+            inner = _compile_value_matcher(arg)
+            return lambda v: not inner(v)
+        excluded = arg if isinstance(arg, list) else [arg]
+        return lambda v: v not in excluded
+    if kind == "numeric":
+        conditions = [
+            (NUMERIC_OPERATORS[arg[i]], arg[i + 1]) for i in range(0, len(arg), 2)
+        ]
+        return lambda v: (
+            isinstance(v, (int, float))
+            and not isinstance(v, bool)
+            and all(op(v, x) for op, x in conditions)
+        )
+    raise utils.DetailedValueError(
+        f"Unsupported event pattern matcher: {kind}", {"matcher": matcher}
+    )
+
+
+def _compile_field_matcher(matchers: list) -> Callable[[Any], bool]:
+    """
+    Returns: function testing the value of an event field (or _MISSING)
+        against a pattern list; arrays in events match if any element matches
+    """
+    exists = None
+    value_matchers = list()
+    for m in matchers:
+        if isinstance(m, dict) and "exists" in m:
+            exists = m["exists"]
+        else:
+            value_matchers.append(_compile_value_matcher(m))
+
+    def match(value) -> bool:
+        if value is _MISSING:
+            return exists is False
+        if exists is False:
+            return False
+        if not value_matchers:
+            return True  # {"exists": true}
+        values = value if isinstance(value, list) else [value]
+        return any(vm(v) for vm in value_matchers for v in values)
+
+    return match
+
+
+def _compile_pattern(pattern: dict, path: Tuple[str, ...] = ()) -> list:
+    """
+    Returns: list of (field path, field matcher) pairs
+    """
+    compiled = list()
+    for key, value in pattern.items():
+        if isinstance(value, dict):
+            compiled.extend(_compile_pattern(value, path + (key,)))
+        else:
+            compiled.append((path + (key,), _compile_field_matcher(value)))
+    return compiled
+
+
+def _get_field(event: dict, path: Tuple[str, ...]):
+    value = event
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return _MISSING
+        value = value[key]
+    return value
+
+
+class EventRule(NamedTuple):
+    name: str
+    function: str  # logical id of target function
+    pattern: dict
+    matchers: list
+
+    def matches(self, event: dict) -> bool:
+        return all(m(_get_field(event, path)) for path, m in self.matchers)
+
+
+def _literal_detail_types(pattern: dict) -> Optional[List[str]]:
+    """
+    Returns: detail-types matched by pattern if pattern only matches exact
+        detail-type values; None otherwise
+    """
+    detail_types = pattern.get("detail-type")
+    if not isinstance(detail_types, list) or not all(
+        isinstance(x, str) for x in detail_types
+    ):
+        return None
+    return detail_types
+
+
+class EventBusEmulator:
+    def __init__(self, template_dict: dict):
+        """
+        Args:
+            template_dict: parsed SAM template (see from_template_file)
+        """
+        self.rules = list()
+        self.handlers = dict()
+        self._rules_by_detail_type = dict()
+        self._unindexed_rules = list()
+        for name, function, pattern in self._rules_in_template(template_dict):
+            self.add_rule(name, function, pattern)
+
+    @classmethod
+    def from_template_file(cls, template_file_path: str) -> "EventBusEmulator":
+        return cls(load_template(template_file_path))
+
+    @staticmethod
+    def _rules_in_template(template_dict: dict) -> List[Tuple[str, str, dict]]:
+        """
+        Returns: (rule name, target function logical id, event pattern) tuples
+        """
+        rules = list()
+        resources = template_dict.get("Resources") or dict()
+        for name, resource in resources.items():
+            properties = resource.get("Properties") or dict()
+            if resource.get("Type") == "AWS::Serverless::Function":
+                for event_name, event in (properties.get("Events") or dict()).items():
+                    if event.get("Type") != "EventBridgeRule":
+                        continue
+                    pattern = (event.get("Properties") or dict()).get("Pattern")
+                    rules.append((f"{name}.{event_name}", name, pattern))
+            elif resource.get("Type") == "AWS::Events::Rule":
+                for target in properties.get("Targets") or list():
+                    arn = target.get("Arn")
+                    # targets are usually specified as !GetAtt Function.Arn
+                    function = getattr(arn, "val", None)
+                    if isinstance(arn, dict):
+                        function = arn.get("Fn::GetAtt")
+                    if isinstance(function, str):
+                        function = function.split(".")[0]
+                    elif isinstance(function, list):
+                        function = function[0]
+                    if function in resources:
+                        rules.append((name, function, properties.get("EventPattern")))
+        return rules
+
+    def add_rule(self, name: str, function: str, pattern: dict) -> EventRule:
+        rule = EventRule(name, function, pattern, _compile_pattern(pattern))
+        self.rules.append(rule)
+        detail_types = _literal_detail_types(pattern)
+        if detail_types is None:
+            self._unindexed_rules.append(rule)
+        else:
+            for detail_type in detail_types:
+                self._rules_by_detail_type.setdefault(detail_type, list()).append(rule)
+        return rule
+
+    def register_handler(self, function: str, handler: Callable) -> None:
+        """
+        Args:
+            function: logical id of function in template (e.g. "PersistEvent")
+            handler: local lambda handler, called with (event, context)
+        """
+        self.handlers[function] = handler
+
+    @staticmethod
+    def envelope(event: dict) -> dict:
+        """
+        Wraps event (in the format posted by ThiscoveryEvent) in the envelope
+        EventBridge delivers to targets, unless it already is
+        """
+        if "id" in event and "version" in event:
+            return event
+        return eventbridge_event(event, region=REGION, account=ACCOUNT_ID)
+
+    def matching_rules(self, event: dict) -> List[EventRule]:
+        event = self.envelope(event)
+        candidates = self._rules_by_detail_type.get(event.get("detail-type"), list())
+        return [r for r in candidates + self._unindexed_rules if r.matches(event)]
+
+    def put_event(self, event: dict) -> Dict[str, Any]:
+        """
+        Dispatches event to the handlers of all functions it is routed to.
+        Functions without a registered handler are skipped.
+
+        Returns: handler return values keyed by function logical id
+        """
+        event = self.envelope(event)
+        results = dict()
+        for rule in self.matching_rules(event):
+            handler = self.handlers.get(rule.function)
+            if handler is not None and rule.function not in results:
+                results[rule.function] = handler(event, dict())
+        return results
+
+    def put_events(self, events: List[dict]) -> List[Dict[str, Any]]:
+        return [self.put_event(e) for e in events]
@@ -0,0 +1,176 @@
+"""
+Checks that API endpoints defined in a template reject requests without a
+valid API key, probing all endpoints concurrently over a pooled HTTP session.
+
+Only endpoints that require security (see testing_tools.EndpointSecurityIndex)
+are probed: API Gateway rejects requests with blank or invalid keys before
+they reach the backend, whereas requests to public endpoints would be
+processed (with potential side effects).
+"""
+
+import concurrent.futures
+import re
+import time
+import requests
+from http import HTTPStatus
+from prettytable import PrettyTable
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, NamedTuple, Optional
+
+BLANK_API_KEY = ""
+INVALID_API_KEY = "3c907908-44a7-490a-9661-3866b3732d22"
+DEFAULT_API_KEYS = {"blank": BLANK_API_KEY, "invalid": INVALID_API_KEY}
+# value used for path parameters not specified by callers
+DEFAULT_PATH_PARAMETER_VALUE = "00000000-0000-0000-0000-000000000000"
+PATH_PARAMETER_RE = re.compile(r"\{([^}/]+?)\+?\}")
+# method used to probe x-amazon-apigateway-any-method (ANY) routes
+ANY_METHOD_PROBE = "GET"
+
+
+class Probe(NamedTuple):
+    endpoint: str  # e.g. "CoreAPI GET /v1/user/{id}"
+    method: str
+    url: str
+    key_name: str
+    api_key: str
+    expected_status: int
+
+
+class ProbeResult(NamedTuple):
+    endpoint: str
+    key_name: str
+    status: Optional[int]
+    latency: float  # seconds
+    expected_status: int
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == self.expected_status
+
+
+def fill_path_parameters(path: str, path_parameters: Optional[dict] = None) -> str:
+    path_parameters = path_parameters or dict()
+    return PATH_PARAMETER_RE.sub(
+        lambda m: str(path_parameters.get(m.group(1), DEFAULT_PATH_PARAMETER_VALUE)),
+        path,
+    )
+
+
+class EndpointSweeper:
+    def __init__(
+        self,
+        base_url: str,
+        endpoints: list,
+        api_keys: Optional[Dict[str, str]] = None,
+        expected_status: int = HTTPStatus.FORBIDDEN,
+        path_parameters: Optional[dict] = None,
+        max_concurrency: int = 10,
+        timeout: float = 10,
+    ):
+        """
+        Args:
+            base_url: url of deployed API (e.g. https://api.thiscovery.org)
+            endpoints: EndpointSecurity tuples (from testing_tools.EndpointSecurityIndex);
+                endpoints without security requirements are not probed
+            api_keys: keys to send, keyed by a name used in results
+            expected_status: status every probe should receive
+            path_parameters: values of path parameters (e.g. {"id": "..."})
+            max_concurrency: maximum number of requests in flight
+            timeout: seconds to wait for each response
+        """
+        self.base_url = base_url.rstrip("/")
+        self.endpoints = endpoints
+        self.api_keys = DEFAULT_API_KEYS if api_keys is None else api_keys
+        self.expected_status = expected_status
+        self.path_parameters = path_parameters
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.results = list()
+
+    def probes(self) -> List[Probe]:
+        return [
+            Probe(
+                endpoint=f"{e.api_resource} {e.method} {e.path}",
+                method=ANY_METHOD_PROBE if e.method == "ANY" else e.method,
+                url=self.base_url + fill_path_parameters(e.path, self.path_parameters),
+                key_name=key_name,
+                api_key=api_key,
+                expected_status=self.expected_status,
+            )
+            for e in self.endpoints
+            if e.effective_security
+            for key_name, api_key in self.api_keys.items()
+        ]
+
+    def _session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.max_concurrency, pool_maxsize=self.max_concurrency
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _send(self, session: requests.Session, probe: Probe) -> ProbeResult:
+        start = time.perf_counter()
+        try:
+            response = session.request(
+                probe.method,
+                probe.url,
+                headers={
+                    "Content-Type": "application/json",
+                    "x-api-key": probe.api_key,
+                },
+                timeout=self.timeout,
+            )
+        except requests.RequestException as err:
+            return ProbeResult(
+                endpoint=probe.endpoint,
+                key_name=probe.key_name,
+                status=None,
+                latency=time.perf_counter() - start,
+                expected_status=probe.expected_status,
+                error=repr(err),
+            )
+        return ProbeResult(
+            endpoint=probe.endpoint,
+            key_name=probe.key_name,
+            status=response.status_code,
+            latency=time.perf_counter() - start,
+            expected_status=probe.expected_status,
+        )
+
+    def run(self) -> List[ProbeResult]:
+        """
+        Returns: results in the same order as probes()
+        """
+        probes = self.probes()
+        with self._session() as session:
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_concurrency
+            ) as executor:
+                self.results = list(
+                    executor.map(lambda p: self._send(session, p), probes)
+                )
+        return self.results
+
+    def failures(self) -> List[ProbeResult]:
+        return [x for x in self.results if not x.ok]
+
+    def table(self) -> PrettyTable:
+        table = PrettyTable()
+        table.field_names = ["Endpoint", "Key", "Status", "Latency (ms)"]
+        for result in self.results:
+            status = result.status if result.error is None else result.error
+            if not result.ok:
+                status = f"{status} (expected {result.expected_status})"
+            table.add_row(
+                [
+                    result.endpoint,
+                    result.key_name,
+                    status,
+                    f"{result.latency * 1000:.0f}",
+                ]
+            )
+        return table
@@ -0,0 +1,124 @@
+"""
+Repository metadata (revision, branch, ahead/behind counts and dirty state)
+obtained from a single "git status --porcelain=v2 --branch" call.
+
+Porcelain output is stable across git versions and locales, unlike the human
+readable "git status" output. Results are memoized per process and working
+directory, so that all tools in a process share one git call.
+"""
+
+import functools
+import os
+import subprocess
+from typing import NamedTuple, Optional
+
+
+class RepositoryMetadata(NamedTuple):
+    revision: Optional[str]
+    branch: str
+    upstream: Optional[str]
+    ahead: int
+    behind: int
+    staged_changes: int
+    unstaged_changes: int
+    unmerged_changes: int
+
+    @property
+    def is_dirty(self) -> bool:
+        return bool(self.staged_changes + self.unstaged_changes + self.unmerged_changes)
+
+    @property
+    def out_of_sync(self) -> bool:
+        """
+        True if local branch has commits that were not pushed or changes that
+        were not staged for commit
+        """
+        return bool(self.ahead or self.unstaged_changes)
+
+
+def parse_porcelain_v2(output: str) -> RepositoryMetadata:
+    """
+    Parses output of "git status --porcelain=v2 --branch"
+    (https://git-scm.com/docs/git-status#_porcelain_format_version_2)
+    """
+    revision = None
+    branch = "HEAD"
+    upstream = None
+    ahead = behind = 0
+    staged = unstaged = unmerged = 0
+    for line in output.splitlines():
+        if line.startswith("# branch.oid "):
+            oid = line[len("# branch.oid ") :]
+            revision = None if oid == "(initial)" else oid
+        elif line.startswith("# branch.head "):
+            head = line[len("# branch.head ") :]
+            # "git rev-parse --abbrev-ref HEAD" returns "HEAD" when detached
+            branch = "HEAD" if head == "(detached)" else head
+        elif line.startswith("# branch.upstream "):
+            upstream = line[len("# branch.upstream ") :]
+        elif line.startswith("# branch.ab "):
+            ahead_str, behind_str = line[len("# branch.ab ") :].split()
+            ahead = int(ahead_str)
+            behind = -int(behind_str)
+        elif line.startswith(("1 ", "2 ")):
+            xy = line.split(" ", 2)[1]
+            staged += xy[0] != "."
+            unstaged += xy[1] != "."
+        elif line.startswith("u "):
+            unmerged += 1
+    return RepositoryMetadata(
+        revision=revision,
+        branch=branch,
+        upstream=upstream,
+        ahead=ahead,
+        behind=behind,
+        staged_changes=staged,
+        unstaged_changes=unstaged,
+        unmerged_changes=unmerged,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _get_repository_metadata(repo_path: str) -> RepositoryMetadata:
+    output = subprocess.run(
+        [
+            "git",
+            "status",
+            "--porcelain=v2",
+            "--branch",
+            "--untracked-files=no",
+            "--ignore-submodules=all",
+        ],
+        capture_output=True,
+        check=True,
+        text=True,
+        cwd=repo_path,
+    ).stdout
+    return parse_porcelain_v2(output)
+
+
+def get_repository_metadata(repo_path: str = ".") -> RepositoryMetadata:
+    """
+    Args:
+        repo_path: path to any directory in the git working tree
+
+    Returns: metadata of repository, memoized per process
+    """
+    return _get_repository_metadata(os.path.abspath(repo_path))
+
+
+def clear_cache() -> None:
+    _get_repository_metadata.cache_clear()
+
+
+def human_readable_status(repo_path: str = ".") -> str:
+    """
+    Output of plain "git status", for displaying to users only
+    """
+    return subprocess.run(
+        ["git", "status"],
+        capture_output=True,
+        check=True,
+        text=True,
+        cwd=repo_path,
+    ).stdout.strip()
@@ -0,0 +1,157 @@
+"""
+Streaming transformation of DynamoDB items copied between tables (see
+dynamodb_bulk.copy_table and migrate_dynamodb_tables).
+
+A transform is a function taking an item in plain python format (e.g.
+{"id": "1", "count": Decimal("2")}) and returning the transformed item, or
+None to drop the item. TransformStage applies a chain of transforms to
+items as they stream from the scan to the writer, one page at a time, so
+tables are never held in memory.
+
+Factories of common transforms:
+    rename_attributes({"old_name": "new_name"})
+    drop_attributes("obsolete", ...)
+    substitute_in_values("test-afs25", "dev-afs25")
+    filter_items(lambda item: item["status"] != "deleted")
+"""
+
+import time
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from decimal import Decimal
+from typing import Callable, Iterable, Iterator, List, Optional
+
+Transform = Callable[[dict], Optional[dict]]
+
+
+def _floats_to_decimals(value):
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {k: _floats_to_decimals(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_floats_to_decimals(v) for v in value]
+    if isinstance(value, set):
+        return {_floats_to_decimals(v) for v in value}
+    return value
+
+
+def serialize_item(item: dict) -> dict:
+    """
+    Converts an item in plain python format (e.g. {"id": "1", "count": 2.5})
+    to DynamoDB attribute value format (e.g. {"id": {"S": "1"}, ...})
+    """
+    serializer = TypeSerializer()
+    # floats are not accepted by the serializer
+    return {k: serializer.serialize(_floats_to_decimals(v)) for k, v in item.items()}
+
+
+def deserialize_item(item: dict) -> dict:
+    deserializer = TypeDeserializer()
+    return {k: deserializer.deserialize(v) for k, v in item.items()}
+
+
+def rename_attributes(renames: dict) -> Transform:
+    """
+    Args:
+        renames: new attribute names keyed by current names
+    """
+
+    def transform(item: dict) -> dict:
+        return {renames.get(k, k): v for k, v in item.items()}
+
+    return transform
+
+
+def drop_attributes(*names: str) -> Transform:
+    def transform(item: dict) -> dict:
+        return {k: v for k, v in item.items() if k not in names}
+
+    return transform
+
+
+def _substitute(value, old: str, new: str):
+    if isinstance(value, str):
+        return value.replace(old, new)
+    if isinstance(value, dict):
+        return {k: _substitute(v, old, new) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_substitute(v, old, new) for v in value]
+    if isinstance(value, set) and all(isinstance(v, str) for v in value):
+        return {v.replace(old, new) for v in value}
+    return value
+
+
+def substitute_in_values(old: str, new: str) -> Transform:
+    """
+    Replaces old with new in all string values, including those nested in
+    maps, lists and string sets (e.g. to replace environment names). Key
+    attributes are also modified, so items may be written with new keys
+    (if several items end up with the same key, the last one written wins).
+    """
+
+    def transform(item: dict) -> dict:
+        return _substitute(item, old, new)
+
+    return transform
+
+
+def filter_items(predicate: Callable[[dict], bool]) -> Transform:
+    """
+    Returns: transform dropping items for which predicate is False
+    """
+
+    def transform(item: dict) -> Optional[dict]:
+        return item if predicate(item) else None
+
+    return transform
+
+
+class TransformStage:
+    def __init__(self, transforms: List[Transform]):
+        """
+        Args:
+            transforms: functions applied to each item, in order
+        """
+        self.transforms = transforms
+        self.items_in = 0
+        self.items_out = 0
+        self.seconds = 0  # time spent transforming
+
+    def apply(self, items: Iterable[dict]) -> Iterator[dict]:
+        """
+        Args:
+            items: items in DynamoDB attribute value format (as returned by scan)
+
+        Yields: transformed items in DynamoDB attribute value format
+        """
+        for item in items:
+            start = time.perf_counter()
+            self.items_in += 1
+            transformed = deserialize_item(item)
+            for transform in self.transforms:
+                transformed = transform(transformed)
+                if transformed is None:
+                    break
+            if transformed is not None:
+                transformed = serialize_item(transformed)
+                self.items_out += 1
+            self.seconds += time.perf_counter() - start
+            if transformed is not None:
+                yield transformed
+
+    @property
+    def dropped(self) -> int:
+        return self.items_in - self.items_out
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items_in / self.seconds if self.seconds else 0
+
+    def metrics(self) -> dict:
+        return {
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "dropped": self.dropped,
+            "seconds": round(self.seconds, 3),
+            "items_per_second": round(self.items_per_second, 1),
+        }
@@ -1,7 +1,10 @@
+import argparse
 import thiscovery_lib.utilities as utils
 
 import local.dev_config as conf
 import local.secrets as secrets
+from thiscovery_dev_tools import client_registry, dynamodb_bulk
+from thiscovery_dev_tools.throughput_governor import ThroughputGovernor
 
 """
 Use this script to copy ALL data from a Dynamodb table into another 
@@ -9,6 +12,34 @@ Use this script to copy ALL data from a Dynamodb table into another
 particular useful when setting up a new thiscovery environment or
 migrating a table to a different stack).
 
+The source table is read by parallel scans of "workers" segments (default:
+dynamodb_bulk.DEFAULT_TOTAL_SEGMENTS); use more workers for large tables.
+Progress is saved to a checkpoint in .thiscovery/migrations; run this script
+with --resume to continue interrupted migrations from their checkpoints
+(with the same number of workers) instead of starting over.
+
+To limit the load on source and target tables (e.g. tables shared with
+production traffic), set a budget of "read_capacity_units" and/or
+"write_capacity_units" per second in a migration entry; see
+throughput_governor.
+
+Items can be modified or filtered on their way to the target table by
+listing "transforms" in a migration entry (see item_transforms), e.g.:
+
+from thiscovery_dev_tools import item_transforms as it
+migrations = [
+    {
+        "source": {...},
+        "target": {...},
+        "transforms": [
+            it.rename_attributes({"details": "item_details"}),
+            it.substitute_in_values(source_env, target_env),
+            it.drop_attributes("obsolete_attribute"),
+            it.filter_items(lambda item: item["item_type"] != "test data"),
+        ],
+    },
+]
+
 Example configuration in dev_config.py:
 
 # Dynamodb data migration settings
@@ -38,6 +69,9 @@ migrations = [
             "env": target_env,
             "table": "tokens",
         },
+        "workers": 8,
+        "read_capacity_units": 200,
+        "write_capacity_units": 100,
     },
     {
         "source": {
@@ -60,34 +94,77 @@ def main(
     target_account_profile_name,
     source_table_name,
     target_table_name=None,
+    workers=dynamodb_bulk.DEFAULT_TOTAL_SEGMENTS,
+    resume=False,
+    checkpoint_path=None,
+    read_capacity_units=None,
+    write_capacity_units=None,
+    transforms=None,
 ):
     """
     Modified from https://stackoverflow.com/a/43612035
-    """
 
-    source_db_client = utils.BaseClient(
-        service_name="dynamodb", profile_name=source_account_profile_name
+    Args:
+        resume: if True, continue from the checkpoint at checkpoint_path
+        checkpoint_path: defaults to dynamodb_bulk.default_checkpoint_path
+        read_capacity_units: budget of read capacity units per second used
+            to scan source table (no limit if None)
+        write_capacity_units: budget of write capacity units per second used
+            to write to target table (no limit if None)
+        transforms: item transform and filter functions (see item_transforms)
+    """
+    source_db_client = client_registry.get_client(
+        "dynamodb", profile_name=source_account_profile_name
     )
-    target_db_client = utils.BaseClient(
-        service_name="dynamodb", profile_name=target_account_profile_name
+    target_db_client = client_registry.get_client(
+        "dynamodb", profile_name=target_account_profile_name
     )
 
     if target_table_name is None:
         target_table_name = source_table_name
 
-    source_paginator = source_db_client.client.get_paginator("scan")
-    source_response = source_paginator.paginate(
-        TableName=source_table_name,
-        Select="ALL_ATTRIBUTES",
-        ReturnConsumedCapacity="NONE",
-        ConsistentRead=True,
+    if checkpoint_path is None:
+        checkpoint_path = dynamodb_bulk.default_checkpoint_path(
+            source_table_name, target_table_name
+        )
+    checkpoint_args = (checkpoint_path, source_table_name, target_table_name, workers)
+    if resume:
+        checkpoint = dynamodb_bulk.CopyCheckpoint.load(*checkpoint_args)
+        print(
+            f"Resuming from checkpoint {checkpoint_path} "
+            f"({checkpoint.items_copied} items already copied)."
+        )
+    else:
+        checkpoint = dynamodb_bulk.CopyCheckpoint(*checkpoint_args)
+
+    governor = None
+    if read_capacity_units is not None or write_capacity_units is not None:
+        governor = ThroughputGovernor(
+            read_capacity_units=read_capacity_units,
+            write_capacity_units=write_capacity_units,
+        )
+
+    return dynamodb_bulk.copy_table(
+        source_client=source_db_client,
+        target_client=target_db_client,
+        source_table_name=source_table_name,
+        target_table_name=target_table_name,
+        workers=workers,
+        checkpoint=checkpoint,
+        governor=governor,
+        transforms=transforms,
     )
-    for page in source_response:
-        for item in page["Items"]:
-            target_db_client.client.put_item(TableName=target_table_name, Item=item)
 
 
-def process_migration(migration: dict):
+def process_migration(migration: dict, resume=False, transforms=None):
+    """
+    Args:
+        migration: migration entry (see example configuration above)
+        resume: if True, continue from checkpoint of a previous run
+        transforms: item transform and filter functions; defaults to the
+            "transforms" of migration entry
+    """
+
     def unpack_migration_component(component: dict):
         stack = component["stack"]
         env = component["env"]
@@ -111,15 +188,48 @@ def process_migration(migration: dict):
     print(
         f"Copying data from Dynamodb table {source_full_table_name} to {target_full_table_name}."
     )
-    main(
+    result = main(
         source_account_profile_name=source_profile,
         target_account_profile_name=target_profile,
         source_table_name=source_full_table_name,
         target_table_name=target_full_table_name,
+        workers=migration.get("workers", dynamodb_bulk.DEFAULT_TOTAL_SEGMENTS),
+        resume=resume,
+        read_capacity_units=migration.get("read_capacity_units"),
+        write_capacity_units=migration.get("write_capacity_units"),
+        transforms=migration.get("transforms") if transforms is None else transforms,
     )
-    print(f"Done.")
+    writer = result["writer"]
+    print(
+        f"Done. Copied {result['items_copied']} of {result['items_scanned']} "
+        f"items scanned "
+        f"({writer['items_per_second']} items/s, {writer['retries']} retries)."
+    )
+    if result["transforms"] is not None:
+        stage = result["transforms"]
+        print(
+            f"Transformed {stage['items_in']} items "
+            f"({stage['items_per_second']} items/s); {stage['dropped']} dropped."
+        )
+    if result["governor"] is not None:
+        governor = result["governor"]
+        print(
+            f"Consumed {governor['read']['consumed_units']} RCUs and "
+            f"{governor['write']['consumed_units']} WCUs "
+            f"({governor['read']['throttles'] + governor['write']['throttles']} "
+            f"throttled requests)."
+        )
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Copy data between the Dynamodb tables in dev_config.migrations"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue interrupted migrations from their checkpoints",
+    )
+    args = parser.parse_args()
     for m in conf.migrations:
-        process_migration(m)
+        process_migration(m, resume=args.resume)
@@ -0,0 +1,200 @@
+"""
+Runs a small DAG of phases (e.g. the build and deployment phases of
+AwsDeployer), starting each phase as soon as all phases it depends on have
+finished, so that independent phases run concurrently.
+"""
+
+import concurrent.futures
+import threading
+import time
+import thiscovery_lib.utilities as utils
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+class PhaseTimeoutError(utils.DetailedValueError):
+    pass
+
+
+class Phase:
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], Any],
+        depends_on: Iterable[str] = (),
+        timeout: Optional[float] = None,
+        retries: int = 0,
+        retry_delay: float = 0,
+    ):
+        """
+        Args:
+            name: unique name of phase
+            func: callable taking no arguments
+            depends_on: names of phases that must complete before this one starts
+            timeout: seconds after which an attempt to run this phase is abandoned
+                and PhaseTimeoutError raised. Python threads cannot be killed, so
+                the abandoned attempt may keep running in the background; for
+                that reason timed out attempts are never retried
+            retries: number of times to retry this phase if it raises an exception
+            retry_delay: seconds to wait between attempts
+        """
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on)
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+    def __repr__(self):
+        return f"Phase({self.name!r}, depends_on={self.depends_on!r})"
+
+
+class PhaseScheduler:
+    def __init__(self, phases: List[Phase], max_workers: int = 4):
+        self.phases = {p.name: p for p in phases}
+        self.max_workers = max_workers
+        self.logger = utils.get_logger()
+        self.results = dict()
+        self.durations = dict()
+        self.attempts = dict()
+        self.statuses = {p.name: "not started" for p in phases}
+        self._validate(phases)
+
+    def _validate(self, phases: List[Phase]) -> None:
+        if len(self.phases) != len(phases):
+            raise utils.DetailedValueError(
+                "Phase names must be unique", {"phases": [p.name for p in phases]}
+            )
+        for phase in phases:
+            unknown = [d for d in phase.depends_on if d not in self.phases]
+            if unknown:
+                raise utils.DetailedValueError(
+                    f"Phase {phase.name} depends on unknown phases",
+                    {"unknown_phases": unknown},
+                )
+        # Kahn's algorithm; any phase left unsorted is part of a cycle
+        remaining = {name: set(p.depends_on) for name, p in self.phases.items()}
+        while True:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                break
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        if remaining:
+            raise utils.DetailedValueError(
+                "Phase dependencies contain a cycle",
+                {"phases": sorted(remaining.keys())},
+            )
+
+    @staticmethod
+    def _call_with_timeout(phase: Phase) -> Any:
+        if phase.timeout is None:
+            return phase.func()
+        outcome = dict()
+
+        def target():
+            try:
+                outcome["result"] = phase.func()
+            except BaseException as err:
+                outcome["error"] = err
+
+        thread = threading.Thread(
+            target=target, name=f"phase-{phase.name}", daemon=True
+        )
+        thread.start()
+        thread.join(phase.timeout)
+        if thread.is_alive():
+            raise PhaseTimeoutError(
+                f"Phase {phase.name} did not finish within {phase.timeout} seconds",
+                dict(),
+            )
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome.get("result")
+
+    def _run_phase(self, phase: Phase) -> Any:
+        attempt = 0
+        while True:
+            attempt += 1
+            self.attempts[phase.name] = attempt
+            try:
+                return self._call_with_timeout(phase)
+            except PhaseTimeoutError:
+                raise
+            except Exception as err:
+                if attempt > phase.retries:
+                    raise
+                self.logger.warning(
+                    f"Phase {phase.name} failed (attempt {attempt}); retrying",
+                    extra={"error": repr(err)},
+                )
+                time.sleep(phase.retry_delay)
+
+    def _timed_run_phase(self, phase: Phase) -> Any:
+        self.logger.info(f"Starting phase {phase.name}")
+        start = time.perf_counter()
+        try:
+            return self._run_phase(phase)
+        finally:
+            self.durations[phase.name] = time.perf_counter() - start
+            self.logger.info(
+                f"Phase {phase.name} ended after {self.durations[phase.name]:.1f}s"
+            )
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Runs all phases. If a phase fails, no further phases are started; the
+        error is raised once phases already running have finished.
+
+        Returns: dictionary of phase return values keyed by phase name
+        """
+        pending = dict(self.phases)
+        completed = set()
+        running = dict()
+        error = None
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while pending or running:
+                if error is None:
+                    for name, phase in list(pending.items()):
+                        # only submit what can start now, so that phases queued
+                        # in the executor are not run after a failure
+                        if len(running) >= self.max_workers:
+                            break
+                        if all(d in completed for d in phase.depends_on):
+                            del pending[name]
+                            self.statuses[name] = "running"
+                            future = executor.submit(self._timed_run_phase, phase)
+                            running[future] = name
+                if not running:
+                    break
+                done, _ = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except BaseException as err:
+                        self.statuses[name] = "failed"
+                        self.logger.error(
+                            f"Phase {name} failed", extra={"error": repr(err)}
+                        )
+                        if error is None:
+                            error = err
+                    else:
+                        self.statuses[name] = "succeeded"
+                        completed.add(name)
+        finally:
+            # abandoned (timed out) attempts run in daemon threads, so we never
+            # block on them here
+            executor.shutdown(wait=False)
+        if error is not None:
+            if pending:
+                self.logger.info(
+                    "Phases not started due to earlier failure",
+                    extra={"phases": sorted(pending.keys())},
+                )
+            raise error
+        return self.results
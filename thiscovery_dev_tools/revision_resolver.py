@@ -0,0 +1,129 @@
+"""
+Resolves the current revision of a remote git repository (by default the
+master branch of thiscovery-lib) without making every deployment depend on
+GitHub being fast and reachable.
+
+Resolution order:
+    1. revision cached on disk less than ttl seconds ago
+    2. git ls-remote against the configured remote
+    3. stale revision cached on disk (if the remote cannot be reached)
+    4. commit recorded by pip when the package was installed from git
+       (direct_url.json; https://packaging.python.org/en/latest/specifications/direct-url/)
+"""
+
+import json
+import os
+import subprocess
+import time
+import thiscovery_lib.utilities as utils
+from typing import Optional
+
+THISCOVERY_LIB_REMOTE = "https://github.com/THIS-Labs/thiscovery-lib"
+REMOTE_ENV_VAR = "THISCOVERY_LIB_REMOTE"
+DEFAULT_CACHE_PATH = os.path.join(".thiscovery", "cache", "revisions.json")
+DEFAULT_TTL_SECONDS = 3600
+DEFAULT_TIMEOUT_SECONDS = 10
+
+
+def installed_package_revision(package_name: str) -> Optional[str]:
+    """
+    Returns: commit id pip recorded when package_name was installed from a
+        git repository, or None if not available
+    """
+    try:
+        from importlib import metadata
+    except ImportError:  # python < 3.8
+        return None
+    try:
+        direct_url = metadata.distribution(package_name).read_text("direct_url.json")
+    except metadata.PackageNotFoundError:
+        return None
+    if not direct_url:
+        return None
+    return json.loads(direct_url).get("vcs_info", dict()).get("commit_id")
+
+
+class RevisionResolver:
+    def __init__(
+        self,
+        remote: Optional[str] = None,
+        ref: str = "HEAD",
+        package_name: str = "thiscovery-lib",
+        ttl: int = DEFAULT_TTL_SECONDS,
+        cache_path: str = DEFAULT_CACHE_PATH,
+        timeout: int = DEFAULT_TIMEOUT_SECONDS,
+    ):
+        """
+        Args:
+            remote: url or path of git repository; defaults to the value of
+                environment variable THISCOVERY_LIB_REMOTE or, if that is not
+                set, to thiscovery-lib on GitHub
+            ref: ref to resolve in remote
+            package_name: distribution name of installed package to fall back to
+            ttl: seconds for which a revision fetched from remote is reused
+            cache_path: path of json file where fetched revisions are saved
+            timeout: seconds to wait for git ls-remote
+        """
+        self.remote = remote or os.environ.get(REMOTE_ENV_VAR, THISCOVERY_LIB_REMOTE)
+        self.ref = ref
+        self.package_name = package_name
+        self.ttl = ttl
+        self.cache_path = cache_path
+        self.timeout = timeout
+        self.logger = utils.get_logger()
+        self.source = None  # how the last revision was resolved
+
+    @property
+    def cache_key(self) -> str:
+        return f"{self.remote}#{self.ref}"
+
+    def _load_cache(self) -> dict:
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            return dict()
+
+    def _save_to_cache(self, revision: str) -> None:
+        cache = self._load_cache()
+        cache[self.cache_key] = {"revision": revision, "fetched": time.time()}
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_path, self.cache_path)
+
+    def ls_remote(self) -> Optional[str]:
+        output = subprocess.run(
+            ["git", "ls-remote", self.remote, self.ref],
+            capture_output=True,
+            check=True,
+            text=True,
+            timeout=self.timeout,
+        ).stdout.strip()
+        return output.split()[0] if output else None
+
+    def resolve(self) -> Optional[str]:
+        cached = self._load_cache().get(self.cache_key)
+        if cached and time.time() - cached["fetched"] < self.ttl:
+            self.source = "cache"
+            return cached["revision"]
+
+        try:
+            revision = self.ls_remote()
+        except (subprocess.SubprocessError, OSError) as err:
+            self.logger.warning(
+                f"Could not fetch revision of {self.remote}",
+                extra={"error": repr(err)},
+            )
+        else:
+            if revision:
+                self._save_to_cache(revision)
+                self.source = "remote"
+                return revision
+
+        if cached:
+            self.source = "stale_cache"
+            return cached["revision"]
+        self.source = "installed_package"
+        return installed_package_revision(self.package_name)
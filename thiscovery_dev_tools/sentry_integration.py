@@ -6,18 +6,50 @@ from thiscovery_dev_tools.constants import (
     SENTRY_PYTHON_LAYER_ARN,
     SENTRY_NODE_LAYER_ARN,
 )
-from typing import Any, Dict
+from thiscovery_dev_tools.sentry_sampling import SamplingPolicy
+from typing import Any, Dict, Optional
 
 
 class SentryIntegration:
-    def __init__(self, template_as_string, environment):
-        self.t_dict = json.loads(cfn_flip.to_json(template_as_string))
+    def __init__(
+        self,
+        template_as_string=None,
+        environment=None,
+        template_as_dict=None,
+        sample_rate_overrides: Optional[dict] = None,
+    ):
+        """
+        Args:
+            template_as_string: SAM template in yaml or json format
+            environment: name of environment the template will be deployed to
+            template_as_dict: already parsed SAM template; if passed,
+                template_as_string is ignored and this dictionary is
+                modified in place
+            sample_rate_overrides: Sentry traces sample rates keyed by function
+                logical id or "*", taking precedence over rates defined in the
+                template (see sentry_sampling)
+        """
+        if template_as_dict is None:
+            template_as_dict = json.loads(cfn_flip.to_json(template_as_string))
+        self.t_dict = template_as_dict
         self.sentry_node_layer = SENTRY_NODE_LAYER_ARN
         self.sentry_python_layer = SENTRY_PYTHON_LAYER_ARN
         self.environment = environment
+        self.sample_rate_overrides = sample_rate_overrides
+
+    @property
+    def sampling_policy(self) -> SamplingPolicy:
+        return SamplingPolicy(
+            self.environment,
+            template_metadata=self.t_dict.get("Metadata"),
+            overrides=self.sample_rate_overrides,
+        )
 
     def add_tracing_to_lambda(
-        self, lambda_definition: Dict[str, Any], global_runtime: str
+        self,
+        lambda_definition: Dict[str, Any],
+        global_runtime: str,
+        function_name: Optional[str] = None,
     ) -> Dict[str, Any]:
         """
         Add Sentry layer and Sentry environment variables to lambda
@@ -26,6 +58,9 @@ class SentryIntegration:
         Args:
             lambda_definition: SAM lambda definition in dict format
                 (converted from yaml using cfn_flip)
+            global_runtime: runtime defined in the Globals section of template
+            function_name: logical id of function, used to resolve its
+                traces sample rate
 
         Returns: modified lambda_definition with Sentry layer and variables
             appended
@@ -65,7 +100,9 @@ class SentryIntegration:
             # node sentry SDK layer. See here:
             # https://docs.sentry.io/platforms/node/guides/aws-lambda/layer/
             prop["Layers"] = prop.get("Layers", list()) + [self.sentry_node_layer]
-        env_variables["SENTRY_TRACES_SAMPLE_RATE"] = 1
+        env_variables["SENTRY_TRACES_SAMPLE_RATE"] = self.sampling_policy.sample_rate(
+            function_name, lambda_definition
+        )
         env_variables[
             "SENTRY_DSN"
         ] = f"{{{{resolve:secretsmanager:/{self.environment}/sentry-connection:SecretString:dsn}}}}"
@@ -88,7 +125,9 @@ class SentryIntegration:
 
         for k, v in resources.items():
             if v.get("Type") == "AWS::Serverless::Function":
-                resources[k] = self.add_tracing_to_lambda(v, global_runtime)
+                resources[k] = self.add_tracing_to_lambda(
+                    v, global_runtime, function_name=k
+                )
 
     def output_template(self):
         self.sentry_yaml = cfn_flip.to_yaml(json.dumps(self.t_dict))
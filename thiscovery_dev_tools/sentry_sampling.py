@@ -0,0 +1,99 @@
+"""
+Resolves the Sentry traces sample rate (SENTRY_TRACES_SAMPLE_RATE) of each
+lambda function added to a SAM template by SentryIntegration.
+
+Rates are resolved in the following order (first match wins):
+    1. SSM override for the function (logical id), e.g. {"MyFunction": 0.1}
+    2. SSM override for all functions, e.g. {"*": 0.5}
+    3. Function Metadata, e.g.
+        Metadata:
+          SentryTracesSampleRate: 0.1
+       or, per environment:
+        Metadata:
+          SentryTracesSampleRate:
+            prod: 0.05
+            default: 0.5
+    4. Template Metadata (same format as function Metadata); use this to
+       set per-environment defaults for all functions
+    5. DEFAULT_SAMPLE_RATE
+"""
+
+import thiscovery_lib.utilities as utils
+from typing import Optional, Union
+
+METADATA_KEY = "SentryTracesSampleRate"
+SSM_OVERRIDES_PARAMETER = "sentry/traces-sample-rates"
+ALL_FUNCTIONS = "*"
+DEFAULT_SAMPLE_RATE = 1
+
+
+def validate_sample_rate(rate, source: str) -> Union[int, float]:
+    if isinstance(rate, bool) or not isinstance(rate, (int, float)):
+        try:
+            rate = float(rate)
+        except (TypeError, ValueError):
+            rate = None
+    if rate is None or not 0 <= rate <= 1:
+        raise utils.DetailedValueError(
+            "Sentry traces sample rate must be a number between 0 and 1",
+            {"source": source, "rate": rate},
+        )
+    return rate
+
+
+class SamplingPolicy:
+    def __init__(
+        self,
+        environment: Optional[str],
+        template_metadata: Optional[dict] = None,
+        overrides: Optional[dict] = None,
+    ):
+        """
+        Args:
+            environment: name of environment the template will be deployed to
+            template_metadata: Metadata section of SAM template
+            overrides: sample rates keyed by function logical id or "*"
+                (typically the value of SSM parameter SSM_OVERRIDES_PARAMETER)
+        """
+        self.environment = environment
+        self.template_metadata = template_metadata or dict()
+        self.overrides = overrides or dict()
+
+    def _rate_from_metadata(self, metadata: dict, source: str):
+        """
+        Returns: rate defined in metadata for this environment, or None
+        """
+        setting = metadata.get(METADATA_KEY)
+        if isinstance(setting, dict):
+            setting = setting.get(self.environment, setting.get("default"))
+        if setting is None:
+            return None
+        return validate_sample_rate(setting, source)
+
+    def sample_rate(
+        self, function_name: Optional[str], lambda_definition: Optional[dict] = None
+    ) -> Union[int, float]:
+        """
+        Args:
+            function_name: logical id of function in SAM template
+            lambda_definition: SAM lambda definition in dict format
+
+        Returns: traces sample rate for function
+        """
+        if function_name in self.overrides:
+            return validate_sample_rate(
+                self.overrides[function_name], f"override for {function_name}"
+            )
+        if ALL_FUNCTIONS in self.overrides:
+            return validate_sample_rate(
+                self.overrides[ALL_FUNCTIONS], "override for all functions"
+            )
+        function_metadata = (lambda_definition or dict()).get("Metadata") or dict()
+        for metadata, source in [
+            (function_metadata, f"Metadata of {function_name}"),
+            (self.template_metadata, "template Metadata"),
+        ]:
+            rate = self._rate_from_metadata(metadata, source)
+            if rate is not None:
+                return rate
+        return DEFAULT_SAMPLE_RATE
@@ -0,0 +1,182 @@
+"""
+Content-addressed cache for parsed SAM templates (.thiscovery/template.yaml).
+
+Cache keys are derived from everything that affects the output of
+AwsDeployer.parse_sam_template: the source template, the environment name,
+the Sentry layer ARNs, the lambda/provisioned-concurrency and Sentry sample
+rate SSM values and the source code of the modules implementing the template
+transforms.
+"""
+
+import hashlib
+import json
+import os
+import time
+import thiscovery_lib.utilities as utils
+from typing import Optional
+
+from thiscovery_dev_tools.constants import (
+    SENTRY_PYTHON_LAYER_ARN,
+    SENTRY_NODE_LAYER_ARN,
+)
+
+DEFAULT_CACHE_DIR = os.path.join(".thiscovery", "cache", "templates")
+DEFAULT_MAX_ENTRIES = 10
+MAX_RECORDED_MISSES = 50
+
+# modules whose code determines the content of a parsed template
+TRANSFORM_MODULES = [
+    "aws_deployer.py",
+    "sentry_integration.py",
+    "sentry_sampling.py",
+    "template_pipeline.py",
+]
+
+
+def sha256_of_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def transforms_digest() -> str:
+    h = hashlib.sha256()
+    package_dir = os.path.dirname(__file__)
+    for module in TRANSFORM_MODULES:
+        h.update(sha256_of_file(os.path.join(package_dir, module)).encode())
+    return h.hexdigest()
+
+
+class TemplateCache:
+    def __init__(
+        self,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        """
+        Args:
+            cache_dir: directory where cached templates and the cache index are saved
+            max_entries: maximum number of templates kept in cache; least recently
+                used entries are evicted first
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.logger = utils.get_logger()
+        self.index = self._load_index()
+
+    @staticmethod
+    def key_components(
+        source_template_path: str,
+        environment: str,
+        provisioned_concurrency,
+        sentry_sample_rate_overrides: Optional[dict] = None,
+    ) -> dict:
+        return {
+            "source_template": sha256_of_file(source_template_path),
+            "environment": environment,
+            "sentry_python_layer": SENTRY_PYTHON_LAYER_ARN,
+            "sentry_node_layer": SENTRY_NODE_LAYER_ARN,
+            "provisioned_concurrency": json.dumps(
+                provisioned_concurrency, sort_keys=True, default=str
+            ),
+            "sentry_sample_rate_overrides": json.dumps(
+                sentry_sample_rate_overrides or dict(), sort_keys=True
+            ),
+            "transforms": transforms_digest(),
+        }
+
+    @staticmethod
+    def cache_key(components: dict) -> str:
+        return hashlib.sha256(
+            json.dumps(components, sort_keys=True).encode()
+        ).hexdigest()
+
+    def _load_index(self) -> dict:
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            return {"entries": dict(), "misses": list()}
+
+    def _save_index(self) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._atomic_write(self.index_path, json.dumps(self.index, indent=2))
+
+    @staticmethod
+    def _atomic_write(path: str, content: str) -> None:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.yaml")
+
+    def _miss_reason(self, key: str, components: dict) -> str:
+        entries = self.index["entries"]
+        if key in entries:
+            return "cached template file missing"
+        if not entries:
+            return "cache empty"
+        latest = max(entries.values(), key=lambda x: x["last_used"])
+        changed = [k for k, v in components.items() if latest["components"].get(k) != v]
+        return f"changed since last cached template: {', '.join(changed)}"
+
+    def _record_miss(self, key: str, reason: str) -> None:
+        self.index["misses"].append(
+            {"time": utils.now_with_tz().isoformat(), "key": key, "reason": reason}
+        )
+        self.index["misses"] = self.index["misses"][-MAX_RECORDED_MISSES:]
+        self.logger.info(f"Template cache miss ({reason})")
+
+    def get(self, components: dict) -> Optional[str]:
+        """
+        Returns: cached template in yaml format or None if there is no entry
+            matching components
+        """
+        key = self.cache_key(components)
+        if key not in self.index["entries"]:
+            # e.g. index.json was deleted or corrupted; any orphaned template
+            # file is overwritten by put
+            self._record_miss(key, self._miss_reason(key, components))
+            self._save_index()
+            return None
+        try:
+            with open(self._entry_path(key)) as f:
+                template_yaml = f.read()
+        except FileNotFoundError:
+            self._record_miss(key, self._miss_reason(key, components))
+            self.index["entries"].pop(key)
+            self._save_index()
+            return None
+        self.index["entries"][key]["last_used"] = time.time()
+        self._save_index()
+        self.logger.info(f"Template cache hit ({key})")
+        return template_yaml
+
+    def put(self, components: dict, template_yaml: str) -> str:
+        key = self.cache_key(components)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._atomic_write(self._entry_path(key), template_yaml)
+        now = time.time()
+        self.index["entries"][key] = {
+            "components": components,
+            "created": now,
+            "last_used": now,
+        }
+        self._evict()
+        self._save_index()
+        return key
+
+    def _evict(self) -> None:
+        entries = self.index["entries"]
+        while len(entries) > self.max_entries:
+            oldest_key = min(entries, key=lambda k: entries[k]["last_used"])
+            del entries[oldest_key]
+            try:
+                os.remove(self._entry_path(oldest_key))
+            except FileNotFoundError:
+                pass
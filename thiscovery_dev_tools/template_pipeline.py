@@ -0,0 +1,99 @@
+"""
+Single-parse transformation pipeline for SAM templates.
+
+The template is parsed into a dictionary once, an ordered list of transforms
+is applied to that dictionary in memory and the result is serialised once
+at the end. Each step is timed so that slow transforms are easy to spot.
+"""
+
+import cfn_flip
+import json
+import os
+import time
+import thiscovery_lib.utilities as utils
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+TemplateTransform = Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+
+def template_to_dict(template_as_string):
+    return json.loads(cfn_flip.to_json(template_as_string))
+
+
+def template_to_yaml(template_dict):
+    return cfn_flip.to_yaml(json.dumps(template_dict))
+
+
+class TemplatePipeline:
+    def __init__(
+        self,
+        template_as_string: str,
+        transforms: Optional[Iterable[Tuple[str, TemplateTransform]]] = None,
+    ):
+        """
+        Args:
+            template_as_string: SAM template in yaml or json format
+            transforms: ordered (name, function) pairs. Each function receives
+                the template dictionary and may either modify it in place
+                (returning None) or return a replacement dictionary
+        """
+        self.logger = utils.get_logger()
+        self.timings = dict()
+        self.transforms = list()
+        for name, transform in transforms or list():
+            self.add_transform(name, transform)
+        start = time.perf_counter()
+        self.template_dict = template_to_dict(template_as_string)
+        self._record_timing("parse", start)
+
+    def _record_timing(self, step_name, start):
+        elapsed = time.perf_counter() - start
+        self.timings[step_name] = elapsed
+        self.logger.debug(f"Template pipeline step {step_name} took {elapsed:.3f}s")
+        return elapsed
+
+    def add_transform(self, name: str, transform: TemplateTransform) -> None:
+        if name in [n for n, _ in self.transforms]:
+            raise utils.DetailedValueError(
+                f"Template transform {name} is already part of this pipeline", dict()
+            )
+        self.transforms.append((name, transform))
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Applies all transforms, in the order they were added, to the parsed
+        template.
+
+        Returns: transformed template dictionary
+        """
+        for name, transform in self.transforms:
+            start = time.perf_counter()
+            result = transform(self.template_dict)
+            if result is not None:
+                self.template_dict = result
+            self._record_timing(name, start)
+        return self.template_dict
+
+    def to_yaml(self) -> str:
+        start = time.perf_counter()
+        template_yaml = template_to_yaml(self.template_dict)
+        self._record_timing("serialise", start)
+        return template_yaml
+
+    def output(self, output_path: str) -> str:
+        """
+        Serialises the transformed template and writes it to output_path
+
+        Returns: transformed template in yaml format
+        """
+        template_yaml = self.to_yaml()
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        with open(output_path, "w") as f:
+            f.write(template_yaml)
+        self.logger.info(
+            f"Template pipeline finished in {sum(self.timings.values()):.3f}s",
+            extra={"timings": self.timings},
+        )
+        return template_yaml
@@ -0,0 +1,365 @@
+"""
+Offline validator for SAM/CloudFormation templates.
+
+Checks template structure, the shape of intrinsic functions, Ref/GetAtt/Sub
+targets and references to parameters, conditions and mappings in a single
+pass over the template, without calling the CloudFormation API. Results are
+cached by template hash.
+"""
+
+import hashlib
+import json
+import os
+import re
+from typing import Any, List, NamedTuple, Optional
+
+from thiscovery_dev_tools.template_pipeline import template_to_dict
+
+# bump when validation rules change, to invalidate cached results
+VALIDATOR_VERSION = 2
+DEFAULT_CACHE_PATH = os.path.join(".thiscovery", "cache", "validation.json")
+MAX_CACHED_RESULTS = 20
+
+TOP_LEVEL_KEYS = {
+    "AWSTemplateFormatVersion",
+    "Conditions",
+    "Description",
+    "Globals",
+    "Mappings",
+    "Metadata",
+    "Outputs",
+    "Parameters",
+    "Resources",
+    "Rules",
+    "Transform",
+}
+RESOURCE_KEYS = {
+    "Condition",
+    "Connectors",  # SAM connectors
+    "CreationPolicy",
+    "DeletionPolicy",
+    "DependsOn",
+    "Metadata",
+    "Properties",
+    "Type",
+    "UpdatePolicy",
+    "UpdateReplacePolicy",
+    "Version",  # custom resources
+}
+PSEUDO_PARAMETERS = {
+    "AWS::AccountId",
+    "AWS::NotificationARNs",
+    "AWS::NoValue",
+    "AWS::Partition",
+    "AWS::Region",
+    "AWS::StackId",
+    "AWS::StackName",
+    "AWS::URLSuffix",
+}
+# resources SAM generates without a prefix derived from a template resource
+SAM_GLOBAL_IMPLICIT_RESOURCES = {
+    "ServerlessDeploymentApplication",
+    "ServerlessHttpApi",
+    "ServerlessRestApi",
+}
+INTRINSIC_FUNCTIONS = {
+    "Fn::And",
+    "Fn::Base64",
+    "Fn::Cidr",
+    "Fn::Equals",
+    "Fn::FindInMap",
+    "Fn::GetAtt",
+    "Fn::GetAZs",
+    "Fn::If",
+    "Fn::ImportValue",
+    "Fn::Join",
+    "Fn::Length",
+    "Fn::Not",
+    "Fn::Or",
+    "Fn::Select",
+    "Fn::Split",
+    "Fn::Sub",
+    "Fn::ToJsonString",
+    "Fn::Transform",
+    "Ref",
+}
+SUB_VARIABLE_RE = re.compile(r"\$\{([^}]*)\}")
+
+
+class ValidationIssue(NamedTuple):
+    path: str
+    message: str
+
+    def __str__(self):
+        return f"{self.path}: {self.message}"
+
+
+def _is_intrinsic(node) -> bool:
+    return (
+        isinstance(node, dict)
+        and len(node) == 1
+        and next(iter(node)) in (INTRINSIC_FUNCTIONS)
+    )
+
+
+class TemplateValidator:
+    def __init__(self, template_dict: dict):
+        self.template = template_dict
+        self.issues = list()
+        self.parameters = set()
+        self.resources = dict()
+        self.conditions = set()
+        self.mappings = set()
+        self.serverless = False
+
+    def _error(self, path: str, message: str) -> None:
+        self.issues.append(ValidationIssue(path, message))
+
+    # region structure
+    def _check_structure(self) -> bool:
+        if not isinstance(self.template, dict):
+            self._error("/", "template must be a mapping")
+            return False
+        for key in self.template:
+            if key not in TOP_LEVEL_KEYS:
+                self._error(f"/{key}", "unknown top-level section")
+        resources = self.template.get("Resources")
+        if not isinstance(resources, dict) or not resources:
+            self._error("/Resources", "template must define at least one resource")
+            return False
+        for section in ["Parameters", "Mappings", "Conditions", "Outputs"]:
+            if not isinstance(self.template.get(section, dict()), dict):
+                self._error(f"/{section}", "section must be a mapping")
+        transform = self.template.get("Transform", list())
+        transforms = transform if isinstance(transform, list) else [transform]
+        self.serverless = any(
+            isinstance(t, str) and t.startswith("AWS::Serverless") for t in transforms
+        )
+        self.parameters = set(self._section("Parameters"))
+        self.conditions = set(self._section("Conditions"))
+        self.mappings = set(self._section("Mappings"))
+        self.resources = resources
+        for name, parameter in self._section("Parameters").items():
+            if not isinstance(parameter, dict) or "Type" not in parameter:
+                self._error(f"/Parameters/{name}", "parameter must declare a Type")
+        for name, resource in resources.items():
+            path = f"/Resources/{name}"
+            if not isinstance(resource, dict):
+                self._error(path, "resource must be a mapping")
+                continue
+            if not isinstance(resource.get("Type"), str):
+                self._error(path, "resource must declare a Type")
+            for key in resource:
+                if key not in RESOURCE_KEYS:
+                    self._error(f"{path}/{key}", "unknown resource attribute")
+            if not isinstance(resource.get("Properties", dict()), dict):
+                self._error(f"{path}/Properties", "Properties must be a mapping")
+            depends_on = resource.get("DependsOn", list())
+            for target in depends_on if isinstance(depends_on, list) else [depends_on]:
+                if not self._resource_exists(target):
+                    self._error(
+                        f"{path}/DependsOn", f"DependsOn target {target} not found"
+                    )
+            self._check_condition_name(resource.get("Condition"), f"{path}/Condition")
+        for name, output in self._section("Outputs").items():
+            path = f"/Outputs/{name}"
+            if not isinstance(output, dict) or "Value" not in output:
+                self._error(path, "output must declare a Value")
+                continue
+            self._check_condition_name(output.get("Condition"), f"{path}/Condition")
+        return True
+
+    def _section(self, name: str) -> dict:
+        section = self.template.get(name)
+        return section if isinstance(section, dict) else dict()
+
+    def _check_condition_name(self, condition, path: str) -> None:
+        if condition is not None and condition not in self.conditions:
+            self._error(path, f"condition {condition} not found")
+
+    # endregion
+
+    # region references
+    def _resource_exists(self, name: str) -> bool:
+        if name in self.resources:
+            return True
+        if not self.serverless:
+            return False
+        if name in SAM_GLOBAL_IMPLICIT_RESOURCES:
+            return True
+        # implicit resources generated by SAM (e.g. MyFunctionRole,
+        # MyApiProdStage) are named after the resource that generates them
+        return any(
+            name.startswith(r)
+            for r, v in self.resources.items()
+            if isinstance(v, dict)
+            and str(v.get("Type", "")).startswith("AWS::Serverless::")
+        )
+
+    def _check_ref(self, target, path: str) -> None:
+        if not isinstance(target, str):
+            self._error(path, "Ref must be a string")
+            return
+        if target in self.parameters or target in PSEUDO_PARAMETERS:
+            return
+        # SAM supports references to generated resources such as MyApi.Stage
+        resource_name = target.split(".", 1)[0] if self.serverless else target
+        if not self._resource_exists(resource_name):
+            self._error(path, f"Ref target {target} not found")
+
+    def _check_get_att(self, args, path: str) -> None:
+        if isinstance(args, str):
+            if "." not in args:
+                self._error(
+                    path, "Fn::GetAtt string must be in the format Resource.Attribute"
+                )
+                return
+            args = args.split(".", 1)
+        if (
+            not isinstance(args, list)
+            or len(args) != 2
+            or not isinstance(args[0], str)
+            or not (isinstance(args[1], str) or _is_intrinsic(args[1]))
+        ):
+            self._error(path, "Fn::GetAtt takes [resource, attribute]")
+            return
+        if not self._resource_exists(args[0]):
+            self._error(path, f"Fn::GetAtt target {args[0]} not found")
+
+    def _check_sub(self, args, path: str) -> None:
+        variables = dict()
+        if isinstance(args, list):
+            if len(args) != 2 or not isinstance(args[1], dict):
+                self._error(path, "Fn::Sub takes a string or [string, variables]")
+                return
+            args, variables = args
+        if not isinstance(args, str):
+            self._error(path, "Fn::Sub template must be a string")
+            return
+        for match in SUB_VARIABLE_RE.finditer(args):
+            variable = match.group(1)
+            if variable.startswith("!") or variable in variables:
+                continue
+            if variable in self.parameters or variable in PSEUDO_PARAMETERS:
+                continue
+            resource_name = variable.split(".", 1)[0]
+            if not self._resource_exists(resource_name):
+                self._error(path, f"Fn::Sub variable {variable} not found")
+
+    def _check_list_args(self, function, args, path, min_len, max_len=None) -> bool:
+        max_len = max_len or min_len
+        if not isinstance(args, list) or not min_len <= len(args) <= max_len:
+            expected = f"{min_len}" if min_len == max_len else f"{min_len} to {max_len}"
+            self._error(path, f"{function} takes a list of {expected} arguments")
+            return False
+        return True
+
+    def _check_intrinsic(self, function: str, args, path: str) -> None:
+        if function == "Ref":
+            self._check_ref(args, path)
+        elif function == "Fn::GetAtt":
+            self._check_get_att(args, path)
+        elif function == "Fn::Sub":
+            self._check_sub(args, path)
+        elif function == "Fn::Join":
+            if self._check_list_args(function, args, path, 2):
+                if not isinstance(args[0], str):
+                    self._error(path, "Fn::Join delimiter must be a string")
+                if not (isinstance(args[1], list) or _is_intrinsic(args[1])):
+                    self._error(path, "Fn::Join values must be a list")
+        elif function == "Fn::Select":
+            if self._check_list_args(function, args, path, 2):
+                if not (isinstance(args[1], list) or _is_intrinsic(args[1])):
+                    self._error(path, "Fn::Select objects must be a list")
+        elif function == "Fn::Split":
+            if self._check_list_args(function, args, path, 2):
+                if not isinstance(args[0], str):
+                    self._error(path, "Fn::Split delimiter must be a string")
+        elif function == "Fn::If":
+            if self._check_list_args(function, args, path, 3):
+                self._check_condition_name(args[0], path)
+        elif function == "Fn::FindInMap":
+            if self._check_list_args(function, args, path, 3, 4):
+                if isinstance(args[0], str) and args[0] not in self.mappings:
+                    self._error(path, f"mapping {args[0]} not found")
+        elif function == "Fn::Equals":
+            self._check_list_args(function, args, path, 2)
+        elif function == "Fn::Not":
+            self._check_list_args(function, args, path, 1)
+        elif function in ["Fn::And", "Fn::Or"]:
+            self._check_list_args(function, args, path, 2, 10)
+        elif function == "Fn::Cidr":
+            self._check_list_args(function, args, path, 3)
+        elif function == "Fn::Transform":
+            if not isinstance(args, dict) or "Name" not in args:
+                self._error(path, "Fn::Transform takes a mapping with a Name")
+
+    # endregion
+
+    def _walk(self, node: Any, path: str, in_condition: bool = False) -> None:
+        if isinstance(node, dict):
+            if len(node) == 1:
+                key, value = next(iter(node.items()))
+                if key in INTRINSIC_FUNCTIONS:
+                    self._check_intrinsic(key, value, path)
+                    self._walk(value, f"{path}/{key}", in_condition=True)
+                    return
+                if in_condition and key == "Condition" and isinstance(value, str):
+                    self._check_condition_name(value, path)
+                    return
+            for key, value in node.items():
+                self._walk(value, f"{path}/{key}", in_condition)
+        elif isinstance(node, list):
+            for i, value in enumerate(node):
+                self._walk(value, f"{path}/{i}", in_condition)
+
+    def validate(self) -> List[ValidationIssue]:
+        """
+        Returns: list of problems found; empty if template is valid
+        """
+        self.issues = list()
+        if not self._check_structure():
+            return self.issues
+        for section in ["Conditions", "Resources", "Outputs", "Globals"]:
+            self._walk(
+                self._section(section),
+                f"/{section}",
+                in_condition=section == "Conditions",
+            )
+        return self.issues
+
+
+def validate_template_body(
+    template_body: str, cache_path: Optional[str] = DEFAULT_CACHE_PATH
+) -> List[str]:
+    """
+    Validates template (yaml or json), reusing cached results for templates
+    with the same content
+
+    Args:
+        template_body: template content
+        cache_path: path of json file where results are cached; None disables caching
+
+    Returns: list of problems found, as strings
+    """
+    key = hashlib.sha256(f"{VALIDATOR_VERSION}:{template_body}".encode()).hexdigest()
+    cache = dict()
+    if cache_path:
+        try:
+            with open(cache_path) as f:
+                cache = json.load(f)
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            pass
+        if key in cache:
+            return cache[key]
+    issues = [
+        str(x) for x in TemplateValidator(template_to_dict(template_body)).validate()
+    ]
+    if cache_path:
+        cache.pop(key, None)
+        cache[key] = issues
+        cache = dict(list(cache.items())[-MAX_CACHED_RESULTS:])
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        with open(cache_path, "w") as f:
+            json.dump(cache, f, indent=2)
+    return issues
@@ -1,3 +1,6 @@
+import concurrent.futures
+import copy
+import functools
 import json
 import os
 import re
@@ -8,25 +11,72 @@ import warnings
 import yaml
 from dateutil import parser
 from http import HTTPStatus
-from typing import Union
+from typing import Any, Dict, List, NamedTuple, Optional, Union
 
 import thiscovery_lib.utilities as utils
 from thiscovery_lib.cloudwatch_utilities import CloudWatchLogsClient
 from thiscovery_lib.dynamodb_utilities import Dynamodb
 from thiscovery_lib.eb_utilities import ThiscoveryEvent
 
+from thiscovery_dev_tools import client_registry, dynamodb_bulk, endpoint_sweeper
+
 
 # region yaml constructors for cloudformation tags
+class CloudFormationLoader(getattr(yaml, "CSafeLoader", yaml.SafeLoader)):
+    """
+    Safe yaml loader (using the libyaml C bindings if available) supporting
+    all CloudFormation intrinsic function tags
+    """
+
+
 class CloudFormationTag(yaml.YAMLObject):
+    yaml_loader = [
+        yaml.Loader,
+        yaml.FullLoader,
+        yaml.UnsafeLoader,
+        CloudFormationLoader,
+    ]
+
     def __init__(self, val):
         self.val = val
 
     def __repr__(self):
         return f"{self.yaml_tag} {self.val}"
 
+    def __eq__(self, other):
+        return type(self) is type(other) and self.val == other.val
+
     @classmethod
     def from_yaml(cls, loader, node):
-        return cls(node.value)
+        if isinstance(node, yaml.SequenceNode):
+            return cls(loader.construct_sequence(node, deep=True))
+        if isinstance(node, yaml.MappingNode):
+            return cls(loader.construct_mapping(node, deep=True))
+        return cls(loader.construct_scalar(node))
+
+
+class And(CloudFormationTag):
+    yaml_tag = "!And"
+
+
+class Base64(CloudFormationTag):
+    yaml_tag = "!Base64"
+
+
+class Cidr(CloudFormationTag):
+    yaml_tag = "!Cidr"
+
+
+class Condition(CloudFormationTag):
+    yaml_tag = "!Condition"
+
+
+class FindInMap(CloudFormationTag):
+    yaml_tag = "!FindInMap"
+
+
+class GetAZs(CloudFormationTag):
+    yaml_tag = "!GetAZs"
 
 
 class GetAtt(CloudFormationTag):
@@ -41,6 +91,10 @@ class If(CloudFormationTag):
     yaml_tag = "!If"
 
 
+class ImportValue(CloudFormationTag):
+    yaml_tag = "!ImportValue"
+
+
 class Join(CloudFormationTag):
     yaml_tag = "!Join"
 
@@ -49,6 +103,14 @@ class Not(CloudFormationTag):
     yaml_tag = "!Not"
 
 
+class Or(CloudFormationTag):
+    yaml_tag = "!Or"
+
+
+class Split(CloudFormationTag):
+    yaml_tag = "!Split"
+
+
 class Sub(CloudFormationTag):
     yaml_tag = "!Sub"
 
@@ -61,9 +123,36 @@ class Ref(CloudFormationTag):
     yaml_tag = "!Ref"
 
 
+class Transform(CloudFormationTag):
+    yaml_tag = "!Transform"
+
+
 # endregion
 
 
+# parsed templates keyed by (absolute path, modification time), so that test
+# classes reading the same template only parse it once per process
+_parsed_templates = dict()
+
+
+def load_template(template_file_path: str) -> dict:
+    """
+    Loads a SAM/CloudFormation template using CloudFormationLoader
+
+    Returns: a copy of the parsed template, which callers can safely modify
+    """
+    path = os.path.abspath(template_file_path)
+    key = (path, os.stat(path).st_mtime_ns)
+    if key not in _parsed_templates:
+        with open(path) as f:
+            _parsed_templates[key] = yaml.load(f, Loader=CloudFormationLoader)
+    return copy.deepcopy(_parsed_templates[key])
+
+
+def clear_template_cache() -> None:
+    _parsed_templates.clear()
+
+
 def tests_running_on_aws():
     """
     Checks if tests are calling AWS API endpoints
@@ -98,7 +187,17 @@ class BaseDdbMixin:
         try:
             cls.ddb_client
         except AttributeError:
-            cls.ddb_client = Dynamodb(stack_name=stack_name)
+            cls.ddb_client = client_registry.get_instance(
+                Dynamodb, stack_name=stack_name
+            )
+
+    @classmethod
+    def _get_notifications_ddb_client(cls):
+        try:
+            return cls.ddb_client
+        except AttributeError:
+            cls.ddb_client = client_registry.get_instance(Dynamodb)
+            return cls.ddb_client
 
     @classmethod
     def set_notifications_table(cls):
@@ -109,30 +208,32 @@ class BaseDdbMixin:
             cls.notifications_table = f"thiscovery-crm-{cls.env_name}-notifications"
 
     @classmethod
-    def clear_notifications_table(cls):
+    def _get_notifications_ddb_low_level_client(cls):
+        """
+        Override to reset a local DynamoDB stand-in instead
+        """
+        return client_registry.get_client("dynamodb")
+
+    @classmethod
+    def clear_notifications_table(cls, baseline: Optional[List[dict]] = None):
+        """
+        Args:
+            baseline: items (in plain python format) the table should contain
+                after it is cleared; if None, the table is emptied
+        """
         cls.set_notifications_table()
-        try:
-            cls.ddb_client.delete_all(
-                table_name=cls.notifications_table, table_name_verbatim=True
-            )
-        except AttributeError:
-            cls.ddb_client = Dynamodb()
-            cls.ddb_client.delete_all(
-                table_name=cls.notifications_table, table_name_verbatim=True
-            )
+        return dynamodb_bulk.reset_table(
+            cls._get_notifications_ddb_low_level_client(),
+            cls.notifications_table,
+            baseline=baseline,
+        )
 
     @classmethod
     def scan_notifications_table(cls):
         cls.set_notifications_table()
-        try:
-            return cls.ddb_client.scan(
-                table_name=cls.notifications_table, table_name_verbatim=True
-            )
-        except AttributeError:
-            cls.ddb_client = Dynamodb()
-            return cls.ddb_client.scan(
-                table_name=cls.notifications_table, table_name_verbatim=True
-            )
+        return cls._get_notifications_ddb_client().scan(
+            table_name=cls.notifications_table, table_name_verbatim=True
+        )
 
 
 class BaseTestCase(unittest.TestCase):
@@ -212,8 +313,8 @@ class BaseTestCase(unittest.TestCase):
     "Running tests using local methods and this test only makes sense if calling an AWS API endpoint",
 )
 class TestApiEndpoints(BaseTestCase):
-    blank_api_key = ""
-    invalid_api_key = "3c907908-44a7-490a-9661-3866b3732d22"
+    blank_api_key = endpoint_sweeper.BLANK_API_KEY
+    invalid_api_key = endpoint_sweeper.INVALID_API_KEY
 
     def _common_assertion(
         self,
@@ -273,53 +374,267 @@ class TestApiEndpoints(BaseTestCase):
             request_body=request_body,
         )
 
+    def check_template_endpoints_are_restricted(
+        self,
+        template_file_path,
+        base_url=None,
+        api_resource_names=None,
+        path_parameters=None,
+        max_concurrency=10,
+    ):
+        """
+        Sends requests with blank and invalid API keys to all secured
+        endpoints defined in template concurrently (see endpoint_sweeper),
+        checking that all of them are rejected
+
+        Args:
+            template_file_path: path of template.yaml
+            base_url: url of deployed API; defaults to env variable AWS_TEST_API
+            api_resource_names: only check endpoints of these API resources
+            path_parameters: values of path parameters (e.g. {"id": "..."})
+            max_concurrency: maximum number of requests in flight
+        """
+        if base_url is None:
+            try:
+                base_url = os.environ["AWS_TEST_API"]
+            except KeyError as err:
+                raise utils.DetailedValueError(
+                    "Environment variable AWS_TEST_API not set and no base_url "
+                    "provided",
+                    {"KeyError": err.__repr__()},
+                )
+        index = load_endpoint_security_index(template_file_path)
+        endpoints = [
+            v
+            for v in index.endpoints.values()
+            if v.verb in SECURED_HTTP_VERBS
+            and (api_resource_names is None or v.api_resource in api_resource_names)
+        ]
+        for api_resource in index.apis_without_definition_body:
+            if api_resource_names is None or api_resource in api_resource_names:
+                self.logger.warning(
+                    f"{api_resource} has no inline DefinitionBody; "
+                    f"its endpoints were not swept"
+                )
+        sweeper = endpoint_sweeper.EndpointSweeper(
+            base_url=base_url,
+            endpoints=endpoints,
+            api_keys={"blank": self.blank_api_key, "invalid": self.invalid_api_key},
+            path_parameters=path_parameters,
+            max_concurrency=max_concurrency,
+        )
+        sweeper.run()
+        self.logger.info(f"Endpoint sweep results:\n{sweeper.table()}")
+        self.assertEqual([], sweeper.failures())
+        return sweeper.results
+
+
+# region endpoint security
+API_RESOURCE_TYPES = ["AWS::Serverless::Api", "AWS::Serverless::HttpApi"]
+ANY_METHOD_VERB = "x-amazon-apigateway-any-method"
+# verbs checked by TestSecurityOfEndpointsDefinedInTemplateYaml
+SECURED_HTTP_VERBS = ["delete", "get", "head", "patch", "post", "put", ANY_METHOD_VERB]
+INDEXED_HTTP_VERBS = SECURED_HTTP_VERBS + ["options", "trace"]
+
+
+class EndpointSecurity(NamedTuple):
+    api_resource: str
+    path: str
+    verb: str
+    security: Optional[list]  # security requirements defined in operation
+    effective_security: Optional[list]  # operation or, if not defined, API default
+    config: dict
+
+    @property
+    def method(self) -> str:
+        """
+        HTTP method of endpoint as displayed in reports ("ANY" for
+        x-amazon-apigateway-any-method routes)
+        """
+        return "ANY" if self.verb == ANY_METHOD_VERB else self.verb.upper()
+
+
+class EndpointSecurityIndex:
+    """
+    Maps every (api_resource, path, verb) defined in the DefinitionBody of
+    the AWS::Serverless::Api and AWS::Serverless::HttpApi resources of a
+    template to its security configuration. Both Swagger 2
+    (securityDefinitions) and OpenAPI 3 (components.securitySchemes)
+    definitions are supported.
+    """
+
+    def __init__(self, t_dict: dict):
+        self.endpoints = dict()
+        self.security_schemes = dict()
+        self.apis_without_definition_body = list()
+        for name, resource in (t_dict.get("Resources") or dict()).items():
+            if resource.get("Type") not in API_RESOURCE_TYPES:
+                continue
+            body = (resource.get("Properties") or dict()).get("DefinitionBody")
+            if not isinstance(body, dict):
+                # DefinitionUri, implicit APIs and included definitions
+                self.apis_without_definition_body.append(name)
+                continue
+            self._index_api(name, body)
+
+    def _index_api(self, api_resource: str, body: dict) -> None:
+        if "openapi" in body:
+            schemes = (body.get("components") or dict()).get("securitySchemes")
+        else:
+            schemes = body.get("securityDefinitions")
+        self.security_schemes[api_resource] = schemes or dict()
+        default_security = body.get("security")
+        for path, path_item in (body.get("paths") or dict()).items():
+            for verb in INDEXED_HTTP_VERBS:
+                config = path_item.get(verb)
+                if config is None:
+                    continue
+                security = config.get("security")
+                self.endpoints[(api_resource, path, verb)] = EndpointSecurity(
+                    api_resource=api_resource,
+                    path=path,
+                    verb=verb,
+                    security=security,
+                    effective_security=(
+                        default_security if security is None else security
+                    ),
+                    config=config,
+                )
+
+    @property
+    def api_resources(self) -> List[str]:
+        return list(self.security_schemes.keys())
+
+    def for_api(
+        self, api_resource: str, verbs: Optional[List[str]] = None
+    ) -> List[EndpointSecurity]:
+        return [
+            v
+            for (api, _, verb), v in self.endpoints.items()
+            if api == api_resource and (verbs is None or verb in verbs)
+        ]
+
+    def undefined_schemes(self, endpoint: EndpointSecurity) -> List[str]:
+        """
+        Returns: names of security schemes required by endpoint that are not
+            defined in its API
+        """
+        schemes = self.security_schemes[endpoint.api_resource]
+        return [
+            name
+            for requirement in endpoint.effective_security or list()
+            for name in requirement
+            if name not in schemes
+        ]
+
+
+# indexes keyed by (absolute path, modification time) of template file
+_security_indexes = dict()
+
+
+def load_endpoint_security_index(template_file_path: str) -> EndpointSecurityIndex:
+    path = os.path.abspath(template_file_path)
+    key = (path, os.stat(path).st_mtime_ns)
+    if key not in _security_indexes:
+        _security_indexes[key] = EndpointSecurityIndex(load_template(path))
+    return _security_indexes[key]
+
 
 class TestSecurityOfEndpointsDefinedInTemplateYaml(BaseTestCase):
+    # (url, verb) or (api_resource, url, verb) tuples
     public_endpoints = list()
+    expected_security_definitions = {
+        "api_key": {"in": "header", "name": "x-api-key", "type": "apiKey"}
+    }
 
     @classmethod
     def setUpClass(cls, template_file_path, api_resource_name="CoreAPI"):
         super().setUpClass()
-        with open(template_file_path) as f:
-            cls.t_dict = yaml.load(f, Loader=yaml.Loader)
+        cls.t_dict = load_template(template_file_path)
+        cls.security_index = load_endpoint_security_index(template_file_path)
         cls.api_resource_name = api_resource_name
 
-    def _check_security_definitions(self, api_definition_body):
-        self.assertIn("securityDefinitions", api_definition_body.keys())
-        expected_security_definitions = {
-            "api_key": {"in": "header", "name": "x-api-key", "type": "apiKey"}
-        }
+    def _check_security_definitions(self, api_resource_name):
+        self.assertIn(api_resource_name, self.security_index.security_schemes)
         self.assertEqual(
-            expected_security_definitions, api_definition_body["securityDefinitions"]
+            self.expected_security_definitions,
+            self.security_index.security_schemes[api_resource_name],
         )
 
+    def _is_public(self, endpoint: EndpointSecurity) -> bool:
+        return (endpoint.path, endpoint.verb) in self.public_endpoints or (
+            endpoint.api_resource,
+            endpoint.path,
+            endpoint.verb,
+        ) in self.public_endpoints
+
     def check_defined_endpoints_are_secure(self):
-        endpoint_counter = 0
-        api_definition_body = self.t_dict["Resources"][self.api_resource_name][
-            "Properties"
-        ]["DefinitionBody"]
-        self._check_security_definitions(api_definition_body=api_definition_body)
-        api_paths = api_definition_body["paths"]
-        for url, value in api_paths.items():
-            for verb in ["delete", "get", "head", "patch", "post", "put"]:
-                endpoint_config = value.get(verb)
-                if endpoint_config:
-                    endpoint_counter += 1
-                    self.logger.info(
-                        f"Found endpoint {verb.upper()} {url} in template.yaml. Checking if it is secure",
-                        extra={"endpoint_config": endpoint_config},
+        self._check_security_definitions(api_resource_name=self.api_resource_name)
+        endpoints = self.security_index.for_api(
+            self.api_resource_name, verbs=SECURED_HTTP_VERBS
+        )
+        for endpoint in endpoints:
+            self.logger.info(
+                f"Found endpoint {endpoint.method} {endpoint.path} in template.yaml. Checking if it is secure",
+                extra={"endpoint_config": endpoint.config},
+            )
+            if self._is_public(endpoint):
+                self.assertIsNone(endpoint.security)
+            else:
+                self.assertEqual([{"api_key": []}], endpoint.security)
+        self.logger.info(
+            f"The configuration of {len(endpoints)} endpoints in template.yaml is as expected"
+        )
+
+    def check_all_defined_endpoints_are_secure(self, expected_security=None):
+        """
+        Checks endpoints of all APIs in template in one pass, reporting all
+        misconfigured endpoints at once. APIs without an inline
+        DefinitionBody cannot be checked and are reported as problems
+
+        Args:
+            expected_security: security requirements every non-public endpoint
+                must have (e.g. [{"api_key": []}]); if None, endpoints must
+                require at least one security scheme defined in their API
+        """
+        problems = list()
+        endpoints = [
+            v
+            for v in self.security_index.endpoints.values()
+            if v.verb in SECURED_HTTP_VERBS
+        ]
+        for endpoint in endpoints:
+            name = f"{endpoint.api_resource} {endpoint.method} {endpoint.path}"
+            if self._is_public(endpoint):
+                if endpoint.effective_security:
+                    problems.append(f"{name}: expected public endpoint")
+            elif expected_security is not None:
+                if endpoint.effective_security != expected_security:
+                    problems.append(
+                        f"{name}: security {endpoint.effective_security} "
+                        f"!= {expected_security}"
                     )
-                    if (url, verb) in self.public_endpoints:
-                        self.assertIsNone(endpoint_config.get("security"))
-                    else:
-                        self.assertEqual(
-                            [{"api_key": []}], endpoint_config.get("security")
-                        )
+            elif not endpoint.effective_security:
+                problems.append(f"{name}: no security requirements")
+            else:
+                undefined = self.security_index.undefined_schemes(endpoint)
+                if undefined:
+                    problems.append(f"{name}: undefined security schemes {undefined}")
+        for api_resource in self.security_index.apis_without_definition_body:
+            problems.append(
+                f"{api_resource}: no inline DefinitionBody, so its endpoints "
+                f"cannot be checked"
+            )
+        self.assertEqual([], problems)
         self.logger.info(
-            f"The configuration of {endpoint_counter} endpoints in template.yaml is as expected"
+            f"The configuration of {len(endpoints)} endpoints in "
+            f"{len(self.security_index.api_resources)} APIs is as expected"
         )
 
 
+# endregion
+
+
 def _aws_request(method, url, params=None, data=None, aws_api_key=None):
     return utils.aws_request(
         method,
@@ -357,6 +672,66 @@ def test_eb_request(local_method, aws_eb_event, aws_processing_delay=0):
         return local_method(aws_eb_event, dict())
 
 
+def lambda_function_name(lambda_name: str, stack_name: str) -> str:
+    """
+    Returns: name of deployed function, e.g. "thiscovery-crm-test-afs25-UserConsent"
+    """
+    return "-".join([stack_name, utils.get_environment_name(), lambda_name])
+
+
+@functools.lru_cache(maxsize=None)
+def _aws_account_id() -> str:
+    return client_registry.get_client("sts").get_caller_identity()["Account"]
+
+
+def eventbridge_event(
+    aws_eb_event: dict, region: str, account: Optional[str] = None
+) -> dict:
+    """
+    Wraps aws_eb_event (in the format posted by ThiscoveryEvent) in the
+    envelope EventBridge delivers to lambda targets
+
+    Args:
+        account: AWS account id; defaults to account of current credentials
+    """
+    return {
+        "version": "0",
+        "id": str(uuid.uuid4()),
+        "detail-type": aws_eb_event.get("detail-type"),
+        "source": aws_eb_event.get("source", "thiscovery"),
+        "account": account or _aws_account_id(),
+        "time": utils.now_with_tz().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "region": region,
+        "resources": list(),
+        "detail": aws_eb_event.get("detail", dict()),
+    }
+
+
+def invoke_lambda_with_eb_event(aws_eb_event: dict, lambda_name: str, stack_name: str):
+    """
+    Synchronously invokes deployed lambda with an EventBridge-shaped event
+
+    Returns:
+        Return value of lambda
+    """
+    lambda_client = client_registry.get_client("lambda")
+    function_name = lambda_function_name(lambda_name, stack_name)
+    event = eventbridge_event(aws_eb_event, region=lambda_client.meta.region_name)
+    response = lambda_client.invoke(
+        FunctionName=function_name,
+        InvocationType="RequestResponse",
+        Payload=json.dumps(event).encode(),
+    )
+    payload = response["Payload"].read()
+    result = json.loads(payload) if payload else None
+    if response.get("FunctionError"):
+        raise utils.DetailedValueError(
+            f"Lambda {function_name} raised an error",
+            {"function_error": response["FunctionError"], "payload": result},
+        )
+    return result
+
+
 def test_eb_request_v2(
     local_method,
     aws_eb_event: dict,
@@ -377,8 +752,13 @@ def test_eb_request_v2(
             that says the lambda finished executing.
         - if the log is not there, check the whole log group for the log.
             This is a time-consuming process
+    If running on AWS with direct_invoke=True:
+        - invoke the lambda synchronously with the event EventBridge would
+            deliver to it and return its result. This is much faster, but does
+            not test event routing (event bus rules), so tests of routing
+            should not use it
     If using local method:
-        - run local method
+        - run local method (via eb_emulator if specified)
 
     Args:
         local_method: function to be called when testing locally
@@ -392,6 +772,11 @@ def test_eb_request_v2(
                 will be used even if quicker method of finding target message in latest log stream
                 is successful. This option is intended for use only in unittests, so that the
                 fallback option can be tested.
+            direct_invoke (bool): if True, invoke lambda directly instead of posting
+                event to event bus and searching logs for its result.
+            eb_emulator (eb_emulator.EventBusEmulator): when testing locally, route
+                event through this emulator of the event bus, checking that it
+                reaches lambda_name (whose handler is local_method)
 
     Returns:
         Return value of local_method or AWS Lambda, which are the same because
@@ -400,6 +785,8 @@ def test_eb_request_v2(
     if tests_running_on_aws():
         test_run_id = str(utils.new_correlation_id())
         aws_eb_event["detail"]["debug_test_run_id"] = test_run_id
+        if kwargs.get("direct_invoke"):
+            return invoke_lambda_with_eb_event(aws_eb_event, lambda_name, stack_name)
         te = ThiscoveryEvent(event=aws_eb_event)
         earliest_log_time = int(utils.utc_now_timestamp() * 1000)  # milliseconds
         result = te.put_event(event_bus_name)
@@ -407,7 +794,7 @@ def test_eb_request_v2(
             result["ResponseMetadata"]["HTTPStatusCode"] == HTTPStatus.OK
         ), "Failed to post event to event bus"
         time.sleep(aws_processing_delay)
-        logs_client = CloudWatchLogsClient()
+        logs_client = client_registry.get_instance(CloudWatchLogsClient)
         query_list = [test_run_id, utils.FUNCTION_RESULT_STR]
         log_message = logs_client.find_in_log_message(
             log_group_name=lambda_name,
@@ -455,7 +842,154 @@ def test_eb_request_v2(
         log_dict = json.loads(m.group())
         return log_dict["result"]
     else:
-        return local_method(aws_eb_event, dict())
+        eb_emulator = kwargs.get("eb_emulator")
+        if eb_emulator is None:
+            return local_method(aws_eb_event, dict())
+        eb_emulator.register_handler(lambda_name, local_method)
+        results = eb_emulator.put_event(aws_eb_event)
+        if lambda_name not in results:
+            raise utils.DetailedValueError(
+                f"Event is not routed to {lambda_name} by any rule in template",
+                {"event": aws_eb_event, "routed_to": list(results.keys())},
+            )
+        return results[lambda_name]
+
+
+class EbTestRequest(NamedTuple):
+    local_method: Any
+    aws_eb_event: dict
+    lambda_name: str
+    stack_name: str
+
+
+# maximum number of events posted concurrently by test_eb_requests_batch
+PUT_EVENTS_CONCURRENCY = 10
+# CloudWatch filter patterns are limited to 1024 characters
+FILTER_PATTERN_MAX_IDS = 20
+
+
+def _put_event(aws_eb_event: dict, event_bus_name: str) -> None:
+    result = ThiscoveryEvent(event=aws_eb_event).put_event(event_bus_name)
+    assert (
+        result["ResponseMetadata"]["HTTPStatusCode"] == HTTPStatus.OK
+    ), "Failed to post event to event bus"
+
+
+def _put_events(events: List[dict], event_bus_name: str) -> None:
+    """
+    Posts events concurrently, each through ThiscoveryEvent (as
+    test_eb_request_v2 does), so that batched and single test requests post
+    identical events
+    """
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=PUT_EVENTS_CONCURRENCY
+    ) as executor:
+        futures = [executor.submit(_put_event, e, event_bus_name) for e in events]
+        for future in futures:
+            future.result()
+
+
+def _find_results_in_log_group(
+    logs_client, log_group_name: str, test_run_ids: List[str], start_time: int
+) -> Dict[str, Any]:
+    """
+    Returns: results found in log_group_name, keyed by test run id
+    """
+    log_message_re = re.compile(r"\{.+", re.DOTALL)
+    found = dict()
+    for i in range(0, len(test_run_ids), FILTER_PATTERN_MAX_IDS):
+        ids = test_run_ids[i : i + FILTER_PATTERN_MAX_IDS]
+        paginator = logs_client.get_paginator("filter_log_events")
+        for page in paginator.paginate(
+            logGroupName=log_group_name,
+            startTime=start_time,
+            filterPattern=" ".join(f'?"{x}"' for x in ids),
+        ):
+            for log_event in page["events"]:
+                message = log_event["message"]
+                if utils.FUNCTION_RESULT_STR not in message:
+                    continue
+                m = log_message_re.search(message)
+                if m is None:
+                    continue
+                for test_run_id in ids:
+                    if test_run_id in message:
+                        found[test_run_id] = json.loads(m.group())["result"]
+    return found
+
+
+def test_eb_requests_batch(
+    eb_requests: List[EbTestRequest],
+    aws_processing_delay: int = 5,
+    event_bus_name: str = "thiscovery-event-bus",
+    timeout: int = 180,
+    poll_interval: int = 5,
+) -> Dict[str, Any]:
+    """
+    Batch version of test_eb_request_v2.
+
+    If running on AWS:
+        - post all events to EventBus concurrently
+        - poll the log group of each lambda under test with a single
+            filter_log_events search for the results of all events it should
+            process, until all results are found or timeout is reached
+    If using local method:
+        - run local method of each request
+
+    Args:
+        eb_requests: events to test and the lambdas that should process them
+        aws_processing_delay: time in seconds to wait before first searching logs
+        event_bus_name: name of event bus events are posted to
+        timeout: time in seconds after posting events to stop searching logs
+        poll_interval: time in seconds between log searches
+
+    Returns:
+        Return values of local methods or AWS lambdas keyed by the
+        debug_test_run_id added to the detail of each event
+    """
+    test_run_ids = list()
+    for r in eb_requests:
+        test_run_id = str(utils.new_correlation_id())
+        r.aws_eb_event["detail"]["debug_test_run_id"] = test_run_id
+        test_run_ids.append(test_run_id)
+    if not tests_running_on_aws():
+        return {
+            test_run_id: r.local_method(r.aws_eb_event, dict())
+            for test_run_id, r in zip(test_run_ids, eb_requests)
+        }
+
+    pending = dict()  # log group name: test run ids
+    for test_run_id, r in zip(test_run_ids, eb_requests):
+        log_group_name = (
+            f"/aws/lambda/{lambda_function_name(r.lambda_name, r.stack_name)}"
+        )
+        pending.setdefault(log_group_name, list()).append(test_run_id)
+    start_time = int(utils.utc_now_timestamp() * 1000)  # milliseconds
+    _put_events([r.aws_eb_event for r in eb_requests], event_bus_name)
+    time.sleep(aws_processing_delay)
+    logs_client = client_registry.get_client("logs")
+    results = dict()
+    deadline = time.monotonic() + timeout
+    while True:
+        for log_group_name, ids in list(pending.items()):
+            results.update(
+                _find_results_in_log_group(logs_client, log_group_name, ids, start_time)
+            )
+            ids = [x for x in ids if x not in results]
+            if ids:
+                pending[log_group_name] = ids
+            else:
+                del pending[log_group_name]
+        if not pending or time.monotonic() >= deadline:
+            break
+        time.sleep(poll_interval)
+    if pending:
+        raise utils.ObjectDoesNotExistError(
+            f"Log messages matching '{utils.FUNCTION_RESULT_STR}' not found for "
+            f"{sum(len(x) for x in pending.values())} test run ids",
+            details={"missing": pending},
+        )
+    return {x: results[x] for x in test_run_ids}
 
 
 def _test_request(
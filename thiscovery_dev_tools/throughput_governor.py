@@ -0,0 +1,272 @@
+"""
+Keeps bulk DynamoDB operations (see dynamodb_bulk and DynamodbRestore)
+within a budget of read and write capacity units per second, so that they
+neither get throttled by provisioned tables nor starve other traffic using
+the same tables.
+
+Requests are sent through ThroughputGovernor.wrap(client), which requests
+ConsumedCapacity in every response and charges it to a token bucket
+refilled at the budgeted rate: when a bucket is in debt, further requests
+wait until it has been paid off. The governor also limits the number of
+requests in flight, adjusting it (and the rate of each bucket) to the
+responses it sees: throttling halves both, while requests that complete
+without throttling recover them gradually up to their configured limits.
+"""
+
+import random
+import threading
+import time
+from botocore.exceptions import ClientError
+from typing import Callable, Optional
+
+THROTTLING_ERROR_CODES = [
+    "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded",
+    "ThrottlingException",
+]
+DEFAULT_MAX_CONCURRENCY = 8
+MAX_THROTTLED_ATTEMPTS = 8
+THROTTLED_BACKOFF_SECONDS = 0.1
+# lowest rate buckets are slowed down to, as a fraction of budget
+MIN_RATE_FRACTION = 0.1
+# fraction of budget recovered after each request completed without throttling
+RECOVERY_FRACTION = 0.05
+READ_OPERATIONS = ["get_item", "query", "scan"]
+WRITE_OPERATIONS = ["batch_write_item", "delete_item", "put_item", "update_item"]
+
+
+def consumed_capacity_units(response: dict) -> float:
+    """
+    Returns: capacity units reported in response (a dict for single-table
+        operations, a list for batch operations)
+    """
+    consumed = response.get("ConsumedCapacity") or list()
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    return sum(x.get("CapacityUnits", 0) for x in consumed)
+
+
+class TokenBucket:
+    """
+    Token bucket that may go into debt: the cost of a DynamoDB request is
+    only known from its response, so requests wait until the bucket is not
+    in debt and their consumed capacity is deducted afterwards
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Args:
+            rate: tokens added per second
+            capacity: maximum number of tokens (burst); defaults to rate
+        """
+        self.rate = rate
+        self.capacity = rate if capacity is None else capacity
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.consumed = 0
+        self.waited_seconds = 0
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def wait(self) -> None:
+        """
+        Blocks until the bucket is not in debt
+        """
+        while True:
+            with self._lock:
+                self._refill()
+                # tolerance for rounding errors in refills
+                if self.tokens >= -1e-9:
+                    return
+                delay = -self.tokens / self.rate
+                self.waited_seconds += delay
+            self.sleep(delay)
+
+    def consume(self, tokens: float) -> None:
+        with self._lock:
+            self._refill()
+            self.tokens -= tokens
+            self.consumed += tokens
+
+    def set_rate(self, rate: float) -> None:
+        with self._lock:
+            self._refill()
+            self.rate = rate
+
+    def debt(self) -> float:
+        """
+        Returns: seconds it would take to pay off the bucket's debt at its
+            current rate (0 if it is not in debt)
+        """
+        with self._lock:
+            self._refill()
+            return max(0, -self.tokens) / self.rate
+
+
+class GovernedClient:
+    """
+    Proxy of a boto3 DynamoDB client sending read and write requests through
+    a ThroughputGovernor; other attributes are those of the client
+    """
+
+    def __init__(self, client, governor: "ThroughputGovernor"):
+        self._client = client
+        self._governor = governor
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if name in READ_OPERATIONS:
+            return lambda **kwargs: self._governor.call("read", attribute, **kwargs)
+        if name in WRITE_OPERATIONS:
+            return lambda **kwargs: self._governor.call("write", attribute, **kwargs)
+        return attribute
+
+
+class ThroughputGovernor:
+    def __init__(
+        self,
+        read_capacity_units: Optional[float] = None,
+        write_capacity_units: Optional[float] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Args:
+            read_capacity_units: budget of read capacity units per second;
+                reads are not rate limited if None
+            write_capacity_units: budget of write capacity units per second;
+                writes are not rate limited if None
+            max_concurrency: maximum number of requests in flight
+            clock, sleep: time functions (replaceable in tests)
+        """
+        self.budgets = {"read": read_capacity_units, "write": write_capacity_units}
+        self.buckets = {
+            kind: TokenBucket(budget, clock=clock, sleep=sleep)
+            for kind, budget in self.budgets.items()
+            if budget is not None
+        }
+        self.max_concurrency = max_concurrency
+        self.concurrency = max_concurrency
+        self.sleep = sleep
+        self.throttles = {"read": 0, "write": 0}
+        self.requests = {"read": 0, "write": 0}
+        self._active = 0
+        self._condition = threading.Condition()
+
+    def wrap(self, client) -> GovernedClient:
+        return GovernedClient(client, self)
+
+    def _acquire_slot(self, kind: str) -> None:
+        with self._condition:
+            while self._active >= self.concurrency:
+                self._condition.wait()
+            self._active += 1
+            self.requests[kind] += 1
+
+    def _release_slot(self) -> None:
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def _set_concurrency(self, concurrency: int) -> None:
+        with self._condition:
+            self.concurrency = max(1, min(self.max_concurrency, concurrency))
+            self._condition.notify_all()
+
+    def _on_throttled(self, kind: str) -> None:
+        with self._condition:
+            self.throttles[kind] += 1
+        self._set_concurrency(self.concurrency // 2)
+        bucket = self.buckets.get(kind)
+        if bucket is not None:
+            bucket.set_rate(
+                max(self.budgets[kind] * MIN_RATE_FRACTION, bucket.rate / 2)
+            )
+
+    def _on_completed(self, kind: str) -> None:
+        bucket = self.buckets.get(kind)
+        if bucket is None:
+            self._set_concurrency(self.concurrency + 1)
+            return
+        budget = self.budgets[kind]
+        bucket.set_rate(min(budget, bucket.rate + budget * RECOVERY_FRACTION))
+        debt = bucket.debt()
+        if debt > 1:
+            # over a second of debt: extra requests in flight would only wait
+            self._set_concurrency(self.concurrency - 1)
+        elif debt == 0:
+            self._set_concurrency(self.concurrency + 1)
+
+    def call(self, kind: str, operation: Callable, **kwargs) -> dict:
+        """
+        Sends a request, waiting for capacity and retrying it if throttled
+
+        Args:
+            kind: "read" or "write"
+            operation: boto3 client method (e.g. client.scan)
+            kwargs: request parameters
+
+        Returns: response of operation
+        """
+        kwargs["ReturnConsumedCapacity"] = "TOTAL"
+        bucket = self.buckets.get(kind)
+        attempt = 0
+        while True:
+            attempt += 1
+            if bucket is not None:
+                bucket.wait()
+            self._acquire_slot(kind)
+            try:
+                response = operation(**kwargs)
+            except ClientError as err:
+                if err.response["Error"]["Code"] not in THROTTLING_ERROR_CODES:
+                    raise
+                self._on_throttled(kind)
+                if attempt >= MAX_THROTTLED_ATTEMPTS:
+                    raise
+                self.sleep(
+                    random.uniform(0, THROTTLED_BACKOFF_SECONDS * 2 ** (attempt - 1))
+                )
+                continue
+            finally:
+                self._release_slot()
+            break
+        if bucket is not None:
+            bucket.consume(consumed_capacity_units(response))
+        if response.get("UnprocessedItems") or response.get("UnprocessedKeys"):
+            # partially throttled batch; unprocessed items are retried by caller
+            self._on_throttled(kind)
+        else:
+            self._on_completed(kind)
+        return response
+
+    def metrics(self) -> dict:
+        metrics = {"concurrency": self.concurrency}
+        for kind in ["read", "write"]:
+            bucket = self.buckets.get(kind)
+            metrics[kind] = {
+                "requests": self.requests[kind],
+                "throttles": self.throttles[kind],
+                "budget_units_per_second": self.budgets[kind],
+                "rate_units_per_second": None if bucket is None else bucket.rate,
+                "consumed_units": None if bucket is None else bucket.consumed,
+                "waited_seconds": (
+                    None if bucket is None else round(bucket.waited_seconds, 3)
+                ),
+            }
+        return metrics